@@ -0,0 +1,156 @@
+"""resume content
+
+Revision ID: 3c9e51b07d2f
+Revises: ff01d94c0a1a
+Create Date: 2026-10-18 16:52:10.418236
+
+"""
+
+import hashlib
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+import zstandard
+
+# revision identifiers, used by Alembic.
+revision: str = "3c9e51b07d2f"
+down_revision: Union[str, None] = "ff01d94c0a1a"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 500
+COMPRESSION_LEVEL = 3
+
+resume = sa.table(
+    "resume",
+    sa.column("id", sa.Integer()),
+    sa.column("resume_html", sa.String()),
+    sa.column("revised_html", sa.String()),
+    sa.column("revised_html_hash", sa.String()),
+)
+resume_content = sa.table(
+    "resume_content",
+    sa.column("resume_id", sa.Integer()),
+    sa.column("resume_html", sa.LargeBinary()),
+    sa.column("revised_html", sa.LargeBinary()),
+)
+
+
+def compress(text):
+    if text is None:
+        return None
+    return zstandard.ZstdCompressor(level=COMPRESSION_LEVEL).compress(
+        text.encode("utf-8")
+    )
+
+
+def decompress(blob):
+    if blob is None:
+        return None
+    return zstandard.ZstdDecompressor().decompress(blob).decode("utf-8")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "resume_content",
+        sa.Column("resume_id", sa.Integer(), nullable=False),
+        sa.Column("resume_html", sa.LargeBinary(), nullable=True),
+        sa.Column("revised_html", sa.LargeBinary(), nullable=True),
+        sa.ForeignKeyConstraint(["resume_id"], ["resume.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("resume_id"),
+    )
+    op.add_column(
+        "resume",
+        sa.Column(
+            "revised_html_hash", sqlmodel.sql.sqltypes.AutoString(), nullable=True
+        ),
+    )
+
+    # Backfill in batches of ids, so the html of the whole table is never in memory.
+    connection = op.get_bind()
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.select(resume.c.id, resume.c.resume_html, resume.c.revised_html)
+            .where(resume.c.id > last_id)
+            .where(
+                sa.or_(
+                    resume.c.resume_html.is_not(None),
+                    resume.c.revised_html.is_not(None),
+                )
+            )
+            .order_by(resume.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        connection.execute(
+            resume_content.insert(),
+            [
+                {
+                    "resume_id": row.id,
+                    "resume_html": compress(row.resume_html),
+                    "revised_html": compress(row.revised_html),
+                }
+                for row in rows
+            ],
+        )
+        for row in rows:
+            if row.revised_html is not None:
+                connection.execute(
+                    resume.update()
+                    .where(resume.c.id == row.id)
+                    .values(
+                        revised_html_hash=hashlib.sha256(
+                            row.revised_html.encode("utf-8")
+                        ).hexdigest()
+                    )
+                )
+        last_id = rows[-1].id
+
+    op.drop_column("resume", "revised_html")
+    op.drop_column("resume", "resume_html")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.add_column(
+        "resume",
+        sa.Column("resume_html", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    )
+    op.add_column(
+        "resume",
+        sa.Column("revised_html", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    )
+
+    connection = op.get_bind()
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.select(
+                resume_content.c.resume_id,
+                resume_content.c.resume_html,
+                resume_content.c.revised_html,
+            )
+            .where(resume_content.c.resume_id > last_id)
+            .order_by(resume_content.c.resume_id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        for row in rows:
+            connection.execute(
+                resume.update()
+                .where(resume.c.id == row.resume_id)
+                .values(
+                    resume_html=decompress(row.resume_html),
+                    revised_html=decompress(row.revised_html),
+                )
+            )
+        last_id = rows[-1].resume_id
+
+    op.drop_column("resume", "revised_html_hash")
+    op.drop_table("resume_content")
@@ -0,0 +1,34 @@
+"""resume extractor
+
+Revision ID: 5f3c8a1d2b70
+Revises: e2a94f17c6b8
+Create Date: 2026-10-18 19:12:05.418327
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+# revision identifiers, used by Alembic.
+revision: str = "5f3c8a1d2b70"
+down_revision: Union[str, None] = "e2a94f17c6b8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "resume",
+        sa.Column("extractor", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    )
+    op.add_column("resume", sa.Column("extraction_seconds", sa.Float(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("resume", "extraction_seconds")
+    op.drop_column("resume", "extractor")
@@ -0,0 +1,39 @@
+"""resume history indexes
+
+Revision ID: 8d4f2a6c1e93
+Revises: 3c9e51b07d2f
+Create Date: 2026-10-18 17:05:32.772104
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "8d4f2a6c1e93"
+down_revision: Union[str, None] = "3c9e51b07d2f"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        "ix_resume_created_at_id",
+        "resume",
+        ["created_at", "id"],
+        postgresql_include=["original_filename", "job_title", "status"],
+    )
+    op.create_index(
+        "ix_resume_job_title_created_at_id",
+        "resume",
+        ["job_title", "created_at", "id"],
+        postgresql_include=["original_filename", "status"],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_resume_job_title_created_at_id", table_name="resume")
+    op.drop_index("ix_resume_created_at_id", table_name="resume")
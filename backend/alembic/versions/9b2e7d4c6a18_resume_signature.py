@@ -0,0 +1,74 @@
+"""resume signature
+
+Revision ID: 9b2e7d4c6a18
+Revises: 5f3c8a1d2b70
+Create Date: 2026-10-18 20:41:37.205914
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+# revision identifiers, used by Alembic.
+revision: str = "9b2e7d4c6a18"
+down_revision: Union[str, None] = "5f3c8a1d2b70"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # The resumes processed before have no signature: the lookups only find the ones
+    # generated from now on.
+    op.create_table(
+        "resume_signature",
+        sa.Column("resume_id", sa.Integer(), nullable=False),
+        sa.Column("job_title", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("signature", sa.LargeBinary(), nullable=False),
+        sa.ForeignKeyConstraint(["resume_id"], ["resume.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("resume_id"),
+    )
+    op.create_table(
+        "resume_signature_band",
+        sa.Column("resume_id", sa.Integer(), nullable=False),
+        sa.Column("band", sa.Integer(), nullable=False),
+        sa.Column("job_title", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("bucket", sa.BigInteger(), nullable=False),
+        sa.ForeignKeyConstraint(["resume_id"], ["resume.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("resume_id", "band"),
+    )
+    op.create_index(
+        "ix_resume_signature_band_job_title_bucket",
+        "resume_signature_band",
+        ["job_title", "bucket"],
+        unique=False,
+    )
+    op.add_column("resume", sa.Column("similar_to_id", sa.Integer(), nullable=True))
+    op.create_foreign_key(
+        "fk_resume_similar_to_id_resume", "resume", "resume", ["similar_to_id"], ["id"]
+    )
+    op.add_column("resume", sa.Column("similarity", sa.Float(), nullable=True))
+    op.add_column(
+        "resume",
+        sa.Column(
+            "feedback_reused", sa.Boolean(), nullable=False, server_default=sa.false()
+        ),
+    )
+    op.alter_column("resume", "feedback_reused", server_default=None)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("resume", "feedback_reused")
+    op.drop_column("resume", "similarity")
+    op.drop_constraint("fk_resume_similar_to_id_resume", "resume", type_="foreignkey")
+    op.drop_column("resume", "similar_to_id")
+    op.drop_index(
+        "ix_resume_signature_band_job_title_bucket", table_name="resume_signature_band"
+    )
+    op.drop_table("resume_signature_band")
+    op.drop_table("resume_signature")
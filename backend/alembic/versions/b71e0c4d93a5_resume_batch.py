@@ -0,0 +1,45 @@
+"""resume batch
+
+Revision ID: b71e0c4d93a5
+Revises: 8d4f2a6c1e93
+Create Date: 2026-10-18 17:31:08.145927
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "b71e0c4d93a5"
+down_revision: Union[str, None] = "8d4f2a6c1e93"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "resume_batch",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.add_column("resume", sa.Column("batch_id", sa.Integer(), nullable=True))
+    op.create_index(op.f("ix_resume_batch_id"), "resume", ["batch_id"], unique=False)
+    op.create_foreign_key(
+        "fk_resume_batch_id_resume_batch",
+        "resume",
+        "resume_batch",
+        ["batch_id"],
+        ["id"],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint("fk_resume_batch_id_resume_batch", "resume", type_="foreignkey")
+    op.drop_index(op.f("ix_resume_batch_id"), table_name="resume")
+    op.drop_column("resume", "batch_id")
+    op.drop_table("resume_batch")
@@ -0,0 +1,34 @@
+"""resume source
+
+Revision ID: e2a94f17c6b8
+Revises: b71e0c4d93a5
+Create Date: 2026-10-18 17:58:46.930215
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "e2a94f17c6b8"
+down_revision: Union[str, None] = "b71e0c4d93a5"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("resume", sa.Column("source_id", sa.Integer(), nullable=True))
+    op.create_index(op.f("ix_resume_source_id"), "resume", ["source_id"], unique=False)
+    op.create_foreign_key(
+        "fk_resume_source_id_resume", "resume", "resume", ["source_id"], ["id"]
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint("fk_resume_source_id_resume", "resume", type_="foreignkey")
+    op.drop_index(op.f("ix_resume_source_id"), table_name="resume")
+    op.drop_column("resume", "source_id")
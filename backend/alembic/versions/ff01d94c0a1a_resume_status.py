@@ -0,0 +1,46 @@
+"""resume status
+
+Revision ID: ff01d94c0a1a
+Revises: 57a85f2a473b
+Create Date: 2026-10-18 09:12:44.301522
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = "ff01d94c0a1a"
+down_revision: Union[str, None] = "57a85f2a473b"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Rows created before the pipeline existed were processed inline, so they
+    # are considered done.
+    op.add_column(
+        "resume",
+        sa.Column(
+            "status",
+            sqlmodel.sql.sqltypes.AutoString(),
+            nullable=False,
+            server_default="done",
+        ),
+    )
+    op.alter_column("resume", "status", server_default=None)
+    op.add_column(
+        "resume",
+        sa.Column("error", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("resume", "error")
+    op.drop_column("resume", "status")
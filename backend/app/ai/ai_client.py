@@ -1,15 +1,56 @@
-from typing import Protocol
+import asyncio
+from dataclasses import dataclass
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional, Protocol
 import textwrap
+from app.ai.rate_limit import RateLimiter, estimate_tokens, retry_delay
 from app.config import Settings
+import httpx
 import openai
 
+# Errors worth retrying: rate limiting, server errors and connection failures.
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.InternalServerError,
+    openai.APIConnectionError,
+)
+
+# Bump whenever the prompt changes, so cached feedback from the old prompt is not reused.
+PROMPT_VERSION = "1"
+# Separates the critique of a section from its rewrite in the section answers. The
+# numbered markers of the whole-resume answer could appear in a critique.
+SECTION_MARKER = "=== REVISED SECTION ==="
+# The retries of a section cut at its completion budget, each with twice the budget,
+# before giving up on it.
+SECTION_TRUNCATION_RETRIES = 1
+
+
+class TruncatedCompletionError(Exception):
+    """
+    Raised when a completion is still cut at its token limit after the retries.
+    """
+
+
+@dataclass
+class FeedbackSections:
+    """
+    The two parts of a feedback, generated by separate requests.
+    @attribute feedback_text: The analysis of the resume and the suggestions.
+    @attribute revised_html: The revised resume, as a complete HTML document.
+    """
+
+    feedback_text: str
+    revised_html: str
+
 
 class IAIClient(Protocol):
     """
     Interface for AI clients.
+    @attribute model: The name of the model generating the feedback.
     """
 
-    def generate_feedback(self, resume_html: str, job_title: str) -> str:
+    model: str
+
+    async def generate_feedback(self, resume_html: str, job_title: str) -> str:
         """
         Generate feedback for a resume.
         @param resume_html: The HTML extracted from the resume uploaded by the user.
@@ -20,21 +61,53 @@ class IAIClient(Protocol):
         """
         ...
 
+    def stream_feedback(self, resume_html: str, job_title: str) -> AsyncIterator[str]:
+        """
+        Generate feedback for a resume, yielding the text as it is generated.
+        @param resume_html: The HTML extracted from the resume uploaded by the user.
+        @param job_title: The job title the user is applying for.
+        @return: An async iterator over the chunks of the feedback, formatted as in
+                 generate_feedback.
+        """
+        ...
 
-class OpenAIClient(IAIClient):
-    """
-    Concrete implementation of IAIClient using OpenAI.
-    """
-
-    def __init__(self, settings: Settings):
-        openai.api_key = settings.OPENAI_API_KEY
+    async def generate_sections(
+        self, resume_html: str, job_title: str
+    ) -> FeedbackSections:
+        """
+        Generate the analysis and the revised HTML of a resume with two concurrent
+        requests, each with its own focused prompt, instead of one completion holding
+        both in turn.
+        @param resume_html: The HTML extracted from the resume uploaded by the user.
+        @param job_title: The job title the user is applying for.
+        @return: The analysis and the revised HTML.
+        """
+        ...
 
-    def generate_feedback(self, resume_html: str, job_title: str) -> str:
+    async def revise_section(
+        self, section_html: str, job_title: str, max_tokens: Optional[int] = None
+    ) -> FeedbackSections:
         """
-        Generate feedback and the revised html for a resume.
+        Critique and rewrite one section of a resume, for the resumes too long to be
+        revised in one completion.
+        @param section_html: The HTML of the section, its heading included.
+        @param job_title: The job title the user is applying for.
+        @param max_tokens: The completion budget of the section, or None for no limit.
+        @return: The critique of the section and its revised HTML fragment.
+        @raise TruncatedCompletionError: If the rewrite does not fit the budget.
         """
-        prompt = textwrap.dedent(
-            f"""You are an expert recruiter and career coach. Below are the inputs:
+        ...
+
+
+def build_feedback_prompt(resume_html: str, job_title: str) -> str:
+    """
+    Build the prompt asking for the analysis and the revised HTML of a resume.
+    @param resume_html: The HTML extracted from the resume uploaded by the user.
+    @param job_title: The job title the user is applying for.
+    @return: The prompt.
+    """
+    return textwrap.dedent(
+        f"""You are an expert recruiter and career coach. Below are the inputs:
                 - [[{resume_html}]]: the candidate's current resume in raw HTML form.
                 - [[{job_title}]]: the role the candidate is applying for.
 
@@ -71,10 +144,302 @@ class OpenAIClient(IAIClient):
                     <!-- Complete revised resume content with all sections -->
                 </body>
                 </html>
+    """
+    )
+
+
+def build_analysis_prompt(resume_html: str, job_title: str) -> str:
+    """
+    Build the prompt asking for the analysis of a resume only.
+    @param resume_html: The HTML extracted from the resume uploaded by the user.
+    @param job_title: The job title the user is applying for.
+    @return: The prompt.
+    """
+    return textwrap.dedent(
+        f"""You are an expert recruiter and career coach. Critique the resume below for the role the candidate is applying for.
+                - [[{resume_html}]]: the candidate's current resume in raw HTML form.
+                - [[{job_title}]]: the role the candidate is applying for.
+
+                - Critique the resume structure, content, and formatting relative to the target role.
+                - Identify strengths and areas for improvement (e.g., missing keywords, weak bullets, layout issues).
+                - Provide specific, actionable suggestions to optimize each section (summary, experience, skills, education) for the target role and ATS.
+
+                Output the analysis and feedback only, as plain text. Do not rewrite the resume.
+    """
+    )
+
+
+def build_revision_prompt(resume_html: str, job_title: str) -> str:
+    """
+    Build the prompt asking for the revised HTML of a resume only.
+    @param resume_html: The HTML extracted from the resume uploaded by the user.
+    @param job_title: The job title the user is applying for.
+    @return: The prompt.
+    """
+    return textwrap.dedent(
+        f"""You are an expert resume writer. Rewrite the resume below for the role the candidate is applying for.
+                - [[{resume_html}]]: the candidate's current resume in raw HTML form.
+                - [[{job_title}]]: the role the candidate is applying for.
+
+                - Create a complete, professional HTML resume document that includes ALL the candidate's information from the original resume.
+                - Improve the content, structure, and formatting to better match the target role requirements.
+                - Include proper CSS styling in the <head> section for a clean, professional appearance.
+                - Preserve all relevant information but enhance it for the target role.
+                - Make sure the HTML is complete and functional - include all sections, content, and proper styling.
+
+                Output the HTML document only, from <!DOCTYPE html> to </html>, without explanations or comments.
+    """
+    )
+
+
+def build_section_prompt(section_html: str, job_title: str) -> str:
+    """
+    Build the prompt asking for the critique and the rewrite of one section of a
+    resume.
+    @param section_html: The HTML of the section, its heading included.
+    @param job_title: The job title the user is applying for.
+    @return: The prompt.
+    """
+    return textwrap.dedent(
+        f"""You are an expert recruiter and resume writer. Critique and rewrite the section of a resume below for the role the candidate is applying for. The other sections are revised separately.
+                - [[{section_html}]]: one section of the candidate's resume in raw HTML form.
+                - [[{job_title}]]: the role the candidate is applying for.
+
+                - Critique the content and wording of the section relative to the target role, with specific, actionable suggestions.
+                - Rewrite the section as an HTML fragment: keep its heading and ALL of its information, improve the content for the target role, use only h2, h3, p, ul, li and strong tags, without styling.
+
+                Output format (no extra text):
+
+                <critique of the section>
+                {SECTION_MARKER}
+                <revised HTML fragment of the section>
+    """
+    )
+
+
+def parse_section_response(response: str, section_html: str) -> FeedbackSections:
+    """
+    Split the answer to a section prompt into its critique and its rewrite.
+    @param response: The answer of the AI.
+    @param section_html: The original section, kept when the answer has no rewrite.
+    @return: The critique and the revised HTML fragment.
+    """
+    if SECTION_MARKER in response:
+        feedback_text, revised_html = response.split(SECTION_MARKER, 1)
+        return FeedbackSections(feedback_text.strip(), strip_code_fence(revised_html))
+    response = strip_code_fence(response)
+    if response.startswith("<"):
+        return FeedbackSections("", response)
+    return FeedbackSections(response, section_html)
+
+
+def strip_code_fence(text: str) -> str:
+    """
+    Remove the Markdown code fence models sometimes wrap a document in.
+    """
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+        if text.rstrip().endswith("```"):
+            text = text.rstrip()[:-3]
+    return text.strip()
+
+
+class AsyncOpenAIClient(IAIClient):
+    """
+    Concrete implementation of IAIClient using the async OpenAI client.
+    One instance is shared by the whole process: it owns the pooled HTTP connections,
+    caps the number of concurrent calls, paces the calls with token buckets fed by the
+    rate-limit headers and retries rate-limited and failed calls with jittered backoff.
+    @attribute model: The name of the model generating the feedback.
+    @attribute max_retries: The number of retries after the first attempt.
+    @attribute retry_base_delay: The delay of the first retry, doubled at each attempt.
+    @attribute retry_max_delay: The maximum delay between two attempts.
+    @attribute analysis_max_tokens: The completion budget of the analysis request.
+    @attribute revision_max_tokens: The completion budget of the revision request.
+    """
+
+    def __init__(self, settings: Settings):
+        self.model = settings.OPENAI_MODEL
+        self.analysis_max_tokens = settings.AI_ANALYSIS_MAX_TOKENS
+        self.revision_max_tokens = settings.AI_REVISION_MAX_TOKENS
+        self.max_retries = settings.OPENAI_MAX_RETRIES
+        self.retry_base_delay = settings.OPENAI_RETRY_BASE_DELAY
+        self.retry_max_delay = settings.OPENAI_RETRY_MAX_DELAY
+        self.client = openai.AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            base_url=settings.OPENAI_BASE_URL,
+            timeout=settings.OPENAI_TIMEOUT,
+            # Retries are handled here, to account for them in the rate limiter.
+            max_retries=0,
+            http_client=openai.DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=settings.OPENAI_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.OPENAI_MAX_CONNECTIONS,
+                ),
+            ),
+        )
+        self.rate_limiter = RateLimiter()
+        self._semaphore = asyncio.Semaphore(settings.OPENAI_MAX_CONCURRENCY)
+        self._counters = {
+            "calls": 0,
+            "retries": 0,
+            "errors": 0,
+            "in_flight": 0,
+            "truncated": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+        }
+
+    async def generate_feedback(self, resume_html: str, job_title: str) -> str:
         """
+        Generate feedback and the revised html for a resume.
+        """
+        return await self._complete(build_feedback_prompt(resume_html, job_title))
+
+    async def generate_sections(
+        self, resume_html: str, job_title: str
+    ) -> FeedbackSections:
+        """
+        Generate the analysis and the revised html with two concurrent requests. The
+        latency is that of the longer one, the revised html, instead of the sum of both.
+        """
+        analysis = asyncio.create_task(
+            self._complete(
+                build_analysis_prompt(resume_html, job_title), self.analysis_max_tokens
+            )
         )
-        response = openai.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}],
+        revision = asyncio.create_task(
+            self._complete(
+                build_revision_prompt(resume_html, job_title), self.revision_max_tokens
+            )
         )
-        return response.choices[0].message.content
+        try:
+            feedback_text, revised_html = await asyncio.gather(analysis, revision)
+        except BaseException:
+            # The first failure is raised as is; the other request is cancelled
+            # rather than left spending its tokens on a result thrown away.
+            analysis.cancel()
+            revision.cancel()
+            raise
+        return FeedbackSections(feedback_text.strip(), strip_code_fence(revised_html))
+
+    async def revise_section(
+        self, section_html: str, job_title: str, max_tokens: Optional[int] = None
+    ) -> FeedbackSections:
+        """
+        Revise a section, retrying with a larger budget when the completion is cut at
+        its limit: a truncated fragment would lose the end of the section.
+        """
+        prompt = build_section_prompt(section_html, job_title)
+        for attempt in range(SECTION_TRUNCATION_RETRIES + 1):
+            choice = await self._choice(prompt, max_tokens)
+            if choice.finish_reason != "length":
+                return parse_section_response(
+                    choice.message.content or "", section_html
+                )
+            self._counters["truncated"] += 1
+            if max_tokens is None or attempt == SECTION_TRUNCATION_RETRIES:
+                break
+            max_tokens *= 2
+        raise TruncatedCompletionError(
+            f"The revision of a section exceeded {max_tokens} completion tokens"
+        )
+
+    async def stream_feedback(
+        self, resume_html: str, job_title: str
+    ) -> AsyncIterator[str]:
+        """
+        Stream feedback and the revised html for a resume.
+        Only the opening of the stream is retried. The stream is closed when the
+        iteration stops early, so the abandoned completion does not hold its
+        connection.
+        """
+        prompt = build_feedback_prompt(resume_html, job_title)
+        async with self._semaphore:
+            self._counters["in_flight"] += 1
+            try:
+                stream = await self._call(
+                    lambda: self.client.chat.completions.with_raw_response.create(
+                        model=self.model,
+                        messages=[{"role": "user", "content": prompt}],
+                        stream=True,
+                        # The usage comes in a last chunk without choices.
+                        stream_options={"include_usage": True},
+                    ),
+                    prompt,
+                )
+                async with stream:
+                    async for chunk in stream:
+                        if chunk.usage:
+                            self._count_usage(chunk.usage)
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            yield chunk.choices[0].delta.content
+            finally:
+                self._counters["in_flight"] -= 1
+
+    async def _complete(self, prompt: str, max_tokens: Optional[int] = None) -> str:
+        return (await self._choice(prompt, max_tokens)).message.content
+
+    async def _choice(self, prompt: str, max_tokens: Optional[int] = None):
+        options = {"max_completion_tokens": max_tokens} if max_tokens else {}
+        async with self._semaphore:
+            self._counters["in_flight"] += 1
+            try:
+                response = await self._call(
+                    lambda: self.client.chat.completions.with_raw_response.create(
+                        model=self.model,
+                        messages=[{"role": "user", "content": prompt}],
+                        **options,
+                    ),
+                    prompt,
+                )
+            finally:
+                self._counters["in_flight"] -= 1
+        self._count_usage(response.usage)
+        return response.choices[0]
+
+    def _count_usage(self, usage) -> None:
+        if usage is not None:
+            self._counters["prompt_tokens"] += usage.prompt_tokens
+            self._counters["completion_tokens"] += usage.completion_tokens
+
+    async def aclose(self) -> None:
+        await self.client.close()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            **self._counters,
+            "throttled": self.rate_limiter.requests.throttled
+            + self.rate_limiter.tokens.throttled,
+        }
+
+    async def _call(self, create: Callable[[], Awaitable], prompt: str):
+        estimated_tokens = estimate_tokens(prompt)
+        attempt = 0
+        while True:
+            await self.rate_limiter.acquire(estimated_tokens)
+            self._counters["calls"] += 1
+            try:
+                raw = await create()
+            except RETRYABLE_ERRORS as e:
+                response = getattr(e, "response", None)
+                headers = response.headers if response is not None else None
+                if headers:
+                    self.rate_limiter.update(headers)
+                if attempt >= self.max_retries:
+                    self._counters["errors"] += 1
+                    raise
+                self._counters["retries"] += 1
+                await asyncio.sleep(
+                    retry_delay(
+                        attempt, headers, self.retry_base_delay, self.retry_max_delay
+                    )
+                )
+                attempt += 1
+                continue
+            except openai.OpenAIError:
+                self._counters["errors"] += 1
+                raise
+            self.rate_limiter.update(raw.headers)
+            return raw.parse()
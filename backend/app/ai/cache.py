@@ -0,0 +1,216 @@
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from contextlib import aclosing
+from concurrent.futures import Future
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple
+from app.ai.ai_client import PROMPT_VERSION, FeedbackSections, IAIClient
+
+
+def normalize_resume_html(resume_html: str) -> str:
+    return " ".join(resume_html.split())
+
+
+def normalize_job_title(job_title: str) -> str:
+    return " ".join(job_title.split()).casefold()
+
+
+def feedback_cache_key(
+    resume_html: str, job_title: str, model: str, variant: str = ""
+) -> str:
+    """
+    Compute the key of a feedback, ignoring whitespace differences in the inputs.
+    @param resume_html: The HTML extracted from the resume.
+    @param job_title: The job title the user is applying for.
+    @param model: The name of the model generating the feedback.
+    @param variant: Tells apart the feedbacks generated with other prompts, e.g. the
+    sections generated separately.
+    @return: The hex digest identifying the feedback.
+    """
+    digest = hashlib.sha256()
+    parts = [normalize_resume_html(resume_html), normalize_job_title(job_title)]
+    parts += [model, PROMPT_VERSION, variant] if variant else [model, PROMPT_VERSION]
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class FeedbackCache:
+    """
+    LRU cache with expiring entries that coalesces concurrent computations of the same
+    key: only the first caller computes, the others wait for its result.
+    @attribute max_entries: The maximum number of entries kept.
+    @attribute ttl: Seconds an entry stays valid.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, Tuple[float, str]] = OrderedDict()
+        self._in_flight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "coalesced": 0}
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Return the cached value of a key, or None if missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return entry[1]
+
+    def put(self, key: str, value: str) -> None:
+        with self._lock:
+            self._store(key, value)
+
+    async def get_or_compute(
+        self, key: str, compute: Callable[[], Awaitable[str]]
+    ) -> str:
+        """
+        Return the cached value of a key, computing it if missing or expired.
+        Errors are raised to every waiting caller and are not cached. When the caller
+        computing the value is cancelled, the waiting callers compute it again, one of
+        them for the others.
+        @param key: The key of the value.
+        @param compute: Called to produce the value on a miss.
+        @return: The value.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self._counters["hits"] += 1
+                return entry[1]
+            future = self._in_flight.get(key)
+            if future is not None:
+                self._counters["coalesced"] += 1
+                leader = False
+            else:
+                future = self._in_flight[key] = Future()
+                self._counters["misses"] += 1
+                leader = True
+        if not leader:
+            waiter = asyncio.wrap_future(future)
+            try:
+                # Shielded: a cancelled follower must not cancel the shared future.
+                value = await asyncio.shield(waiter)
+            except asyncio.CancelledError:
+                # Read for the follower gone, not to be reported as never retrieved.
+                waiter.add_done_callback(lambda done: done.exception())
+                raise
+            if value is None:
+                # The leader was cancelled.
+                return await self.get_or_compute(key, compute)
+            return value
+        try:
+            value = await compute()
+        except BaseException as e:
+            with self._lock:
+                del self._in_flight[key]
+            if isinstance(e, asyncio.CancelledError):
+                future.set_result(None)
+            else:
+                future.set_exception(e)
+            raise
+        with self._lock:
+            del self._in_flight[key]
+            self._store(key, value)
+        future.set_result(value)
+        return value
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                **self._counters,
+                "entries": len(self._entries),
+                "in_flight": len(self._in_flight),
+            }
+
+    def _store(self, key: str, value: str) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+class CachingAIClient(IAIClient):
+    """
+    Decorator of IAIClient serving repeated feedback requests from a shared cache.
+    @attribute client: The AI client generating the feedback on a miss.
+    @attribute cache: The cache shared by every request.
+    """
+
+    def __init__(self, client: IAIClient, cache: FeedbackCache):
+        self.client = client
+        self.cache = cache
+        self.model = client.model
+
+    async def generate_feedback(self, resume_html: str, job_title: str) -> str:
+        key = feedback_cache_key(resume_html, job_title, self.model)
+        return await self.cache.get_or_compute(
+            key, lambda: self.client.generate_feedback(resume_html, job_title)
+        )
+
+    async def stream_feedback(
+        self, resume_html: str, job_title: str
+    ) -> AsyncIterator[str]:
+        # A cached feedback is replayed in one chunk; a fresh one is stored once complete.
+        key = feedback_cache_key(resume_html, job_title, self.model)
+        cached = self.cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+        chunks = []
+        # Closed with this one, not when collected, when the caller stops early.
+        async with aclosing(
+            self.client.stream_feedback(resume_html, job_title)
+        ) as stream:
+            async for chunk in stream:
+                chunks.append(chunk)
+                yield chunk
+        self.cache.put(key, "".join(chunks))
+
+    async def generate_sections(
+        self, resume_html: str, job_title: str
+    ) -> FeedbackSections:
+        # Stored as a JSON pair, the cache holding strings.
+        key = feedback_cache_key(resume_html, job_title, self.model, "sections")
+
+        async def compute() -> str:
+            sections = await self.client.generate_sections(resume_html, job_title)
+            return json.dumps([sections.feedback_text, sections.revised_html])
+
+        feedback_text, revised_html = json.loads(
+            await self.cache.get_or_compute(key, compute)
+        )
+        return FeedbackSections(feedback_text, revised_html)
+
+    async def revise_section(
+        self, section_html: str, job_title: str, max_tokens: Optional[int] = None
+    ) -> FeedbackSections:
+        # Keyed on the section, so the sections left unchanged in a new version of a
+        # resume are not revised again, and on its budget, sized on the section alone.
+        # A truncated revision raises, and is not cached.
+        key = feedback_cache_key(
+            section_html, job_title, self.model, f"section:{max_tokens}"
+        )
+
+        async def compute() -> str:
+            sections = await self.client.revise_section(
+                section_html, job_title, max_tokens
+            )
+            return json.dumps([sections.feedback_text, sections.revised_html])
+
+        feedback_text, revised_html = json.loads(
+            await self.cache.get_or_compute(key, compute)
+        )
+        return FeedbackSections(feedback_text, revised_html)
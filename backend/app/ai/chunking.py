@@ -0,0 +1,251 @@
+import asyncio
+import html
+import logging
+import math
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List
+from app.ai.ai_client import FeedbackSections, IAIClient, TruncatedCompletionError
+from app.ai.rate_limit import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# The kind of a section, from the words of its heading. Sections matching none are
+# "other"; the content before the first heading (name, contact) is the "header".
+SECTION_KINDS = {
+    "summary": ("summary", "profile", "objective", "about"),
+    "experience": ("experience", "employment", "work", "career", "positions"),
+    "education": ("education", "degree", "academic", "qualifications"),
+    "publications": ("publication", "paper", "research", "presentation", "talk"),
+    "skills": ("skill", "competenc", "technolog", "tools", "languages"),
+}
+
+_HEADING = re.compile(r"<h([1-6])\b[^>]*>(.*?)</h\1\s*>", re.DOTALL | re.IGNORECASE)
+_BODY = re.compile(r"<body\b[^>]*>(.*?)(?:</body\s*>|$)", re.DOTALL | re.IGNORECASE)
+_TAG = re.compile(r"<[^>]+>")
+
+# The stylesheet of the reassembled document, the sections being rewritten as
+# unstyled fragments.
+DOCUMENT_STYLE = """
+body { font-family: Helvetica, Arial, sans-serif; font-size: 10.5pt; line-height: 1.4;
+       color: #222; margin: 2cm; }
+h1 { font-size: 20pt; margin: 0 0 4pt; }
+h2 { font-size: 13pt; border-bottom: 1px solid #999; margin: 14pt 0 6pt;
+     padding-bottom: 2pt; text-transform: uppercase; letter-spacing: 0.5pt; }
+h3 { font-size: 11pt; margin: 8pt 0 2pt; }
+p { margin: 2pt 0; }
+ul { margin: 2pt 0 6pt; padding-left: 14pt; }
+li { margin: 1pt 0; }
+"""
+
+
+@dataclass
+class ResumeSection:
+    """
+    A part of a resume revised on its own: one or more consecutive sections, the
+    shortest ones being merged with the next.
+    @attribute headings: The text of the headings of the sections.
+    @attribute kind: The kind of the first section (see SECTION_KINDS).
+    @attribute html: The HTML of the sections, their headings included.
+    """
+
+    headings: List[str]
+    kind: str
+    html: str
+    tokens: int = field(init=False)
+
+    def __post_init__(self):
+        self.tokens = estimate_tokens(self.html)
+
+    @property
+    def title(self) -> str:
+        return " / ".join(self.headings) or self.kind.capitalize()
+
+
+def section_kind(heading: str) -> str:
+    words = heading.casefold()
+    for kind, keywords in SECTION_KINDS.items():
+        if any(keyword in words for keyword in keywords):
+            return kind
+    return "other"
+
+
+def split_sections(resume_html: str) -> List[ResumeSection]:
+    """
+    Split a resume at its section headings: the highest heading level used more than
+    once, the name of the candidate usually being the only heading above it. The
+    markup is left as extracted, the AI client compacting it when enabled.
+    @param resume_html: The HTML extracted from the resume.
+    @return: The header then the sections, in order; a single section when the resume
+    has no repeated heading level.
+    """
+    match = _BODY.search(resume_html)
+    body = match.group(1).strip() if match else resume_html
+    headings = list(_HEADING.finditer(body))
+    levels = [match.group(1) for match in headings]
+    repeated = sorted(level for level in set(levels) if levels.count(level) > 1)
+    if not repeated:
+        return [ResumeSection([], "header", body)]
+    starts = [match for match in headings if match.group(1) == repeated[0]]
+    sections = []
+    if starts[0].start() > 0:
+        sections.append(ResumeSection([], "header", body[: starts[0].start()]))
+    for i, match in enumerate(starts):
+        end = starts[i + 1].start() if i + 1 < len(starts) else len(body)
+        heading = html.unescape(_TAG.sub("", match.group(2))).strip()
+        sections.append(
+            ResumeSection([heading], section_kind(heading), body[match.start() : end])
+        )
+    return sections
+
+
+def merge_short_sections(
+    sections: List[ResumeSection], min_tokens: int
+) -> List[ResumeSection]:
+    """
+    Merge the sections shorter than `min_tokens` with the ones after them, the last
+    with the one before, so each request is worth its prompt.
+    """
+    merged: List[ResumeSection] = []
+    pending: List[ResumeSection] = []
+    for section in sections:
+        pending.append(section)
+        if sum(part.tokens for part in pending) >= min_tokens:
+            merged.append(_join(pending))
+            pending = []
+    if pending:
+        if merged:
+            pending.insert(0, merged.pop())
+        merged.append(_join(pending))
+    return merged
+
+
+def _join(sections: List[ResumeSection]) -> ResumeSection:
+    return ResumeSection(
+        [heading for section in sections for heading in section.headings],
+        sections[0].kind,
+        "".join(section.html for section in sections),
+    )
+
+
+def section_budgets(
+    sections: List[ResumeSection],
+    output_ratio: float,
+    critique_tokens: int,
+    min_tokens: int,
+) -> List[int]:
+    """
+    Size the completion budget of each section on its length: its rewrite is about as
+    long as the section, and its critique comes first.
+    @param output_ratio: The budget of the rewrite, per token of the section.
+    @param critique_tokens: The budget of the critique.
+    @param min_tokens: The least budget of a section.
+    @return: The budget of each section.
+    """
+    return [
+        max(min_tokens, math.ceil(output_ratio * section.tokens) + critique_tokens)
+        for section in sections
+    ]
+
+
+def assemble_document(sections: List[FeedbackSections]) -> str:
+    """
+    Put the revised fragments of the sections back into one HTML document.
+    """
+    body = "\n".join(section.revised_html for section in sections)
+    return (
+        '<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8">\n'
+        f"<title>Professional Resume</title>\n<style>{DOCUMENT_STYLE}</style>\n"
+        f"</head>\n<body>\n{body}\n</body>\n</html>"
+    )
+
+
+class SectionedGenerator:
+    """
+    Revises the long resumes section by section, the sections concurrently, instead
+    of in one completion: a whole academic CV in one prompt is slow, and its revised
+    HTML risks being cut at the completion limit. The critiques are joined under the
+    headings of their sections and the fragments reassembled into one document.
+    Through the caching client, the sections unchanged since a previous version of
+    the resume are served from the cache instead of being revised again.
+    @attribute min_resume_tokens: The resumes shorter than this are not split.
+    @attribute output_ratio: The completion tokens of a rewrite, per token of its
+    section.
+    @attribute critique_tokens: The completion tokens of the critique of a section.
+    @attribute min_section_tokens: The sections shorter than this are merged with
+    their neighbour.
+    @attribute min_section_budget: The least completion tokens of a section.
+    """
+
+    def __init__(
+        self,
+        min_resume_tokens: int = 4000,
+        output_ratio: float = 1.5,
+        critique_tokens: int = 600,
+        min_section_tokens: int = 300,
+        min_section_budget: int = 512,
+    ):
+        self.min_resume_tokens = min_resume_tokens
+        self.output_ratio = output_ratio
+        self.critique_tokens = critique_tokens
+        self.min_section_tokens = min_section_tokens
+        self.min_section_budget = min_section_budget
+        self._lock = threading.Lock()
+        self._counters = {"resumes": 0, "sections": 0, "unrevised_sections": 0}
+
+    def split(self, resume_html: str) -> List[ResumeSection]:
+        """
+        Split a resume long enough to be revised section by section.
+        @return: Its sections, or an empty list when it is revised whole.
+        """
+        sections = split_sections(resume_html)
+        if sum(section.tokens for section in sections) < self.min_resume_tokens:
+            return []
+        sections = merge_short_sections(sections, self.min_section_tokens)
+        return sections if len(sections) > 1 else []
+
+    async def generate(
+        self, client: IAIClient, sections: List[ResumeSection], job_title: str
+    ) -> FeedbackSections:
+        """
+        Revise the sections concurrently, each within a budget sized on its length.
+        @param client: The AI client revising each section.
+        @param sections: The sections returned by split.
+        @param job_title: The job title the user is applying for.
+        @return: The critiques of all the sections and the reassembled document.
+        """
+        budgets = section_budgets(
+            sections, self.output_ratio, self.critique_tokens, self.min_section_budget
+        )
+        results = await asyncio.gather(
+            *(
+                self._revise(client, section, job_title, budget)
+                for section, budget in zip(sections, budgets)
+            )
+        )
+        with self._lock:
+            self._counters["resumes"] += 1
+            self._counters["sections"] += len(sections)
+        feedback_text = "\n\n".join(
+            f"{section.title}:\n{result.feedback_text}"
+            for section, result in zip(sections, results)
+            if result.feedback_text
+        )
+        return FeedbackSections(feedback_text, assemble_document(results))
+
+    async def _revise(
+        self, client: IAIClient, section: ResumeSection, job_title: str, budget: int
+    ) -> FeedbackSections:
+        # A section whose rewrite does not fit is kept as it was rather than cut.
+        try:
+            return await client.revise_section(section.html, job_title, budget)
+        except TruncatedCompletionError as e:
+            logger.warning("Keeping the section %s unrevised: %s", section.title, e)
+            with self._lock:
+                self._counters["unrevised_sections"] += 1
+            return FeedbackSections("", section.html)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counters)
@@ -0,0 +1,211 @@
+import logging
+import re
+import threading
+from html import escape, unescape
+from html.parser import HTMLParser
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from app.ai.ai_client import FeedbackSections, IAIClient
+from app.ai.rate_limit import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Tags carrying the structure of a resume. Everything else is unwrapped to its text.
+HEADING_TAGS = {f"h{level}" for level in range(1, 7)}
+KEPT_TAGS = HEADING_TAGS | {"p", "ul", "ol", "li", "table", "thead", "tbody", "tr", "th", "td"}
+VOID_TAGS = {"br"}
+# Tags dropped together with their content.
+DROPPED_TAGS = {"head", "style", "script", "noscript", "template", "svg", "img"}
+KEPT_ATTRIBUTES = {"colspan", "rowspan", "href"}
+# Blocks dropped when empty, and dropped when page furniture: a copy of the block right
+# before them (repeated by the extraction), a copy of one of the first blocks of the
+# document (the name and contact repeated at the top of every page), or a page number.
+# Other repeated blocks, like the same job title at two employers, are content.
+DEDUPLICATED_TAGS = HEADING_TAGS | {"p"}
+DROPPED_WHEN_EMPTY = DEDUPLICATED_TAGS | {"li", "ul", "ol"}
+# The number of blocks opening the document whose later copies are page headers.
+HEADER_BLOCKS = 2
+PAGE_NUMBER = re.compile(r"^(page\s*)?\d{1,3}(\s*(/|of)\s*\d{1,3})?$", re.IGNORECASE)
+# Links whose target only repeats their text are unwrapped to it.
+_LINK_PREFIX = re.compile(r"^(mailto:|tel:|https?://)?(www\.)?", re.IGNORECASE)
+
+_WHITESPACE = re.compile(r"\s+")
+_TAG = re.compile(r"<[^>]+>")
+# The spaces around the block tags; the links are inline.
+_SPACE_AROUND_TAG = re.compile(r"\s*(<(?!/?a[ >])[^>]+>)\s*")
+
+
+class _CompactingParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self._out: List[str] = []
+        self._open: List[Tuple[str, int]] = []
+        self._dropping = 0
+        self._header_blocks: List[str] = []
+        self._last_block: Optional[Tuple[str, str]] = None
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]):
+        if tag in DROPPED_TAGS:
+            if tag != "img":
+                self._dropping += 1
+            return
+        if self._dropping:
+            return
+        if tag in VOID_TAGS:
+            self._out.append(f"<{tag}>")
+        elif tag == "a":
+            href = dict(attrs).get("href") or ""
+            self._open.append((tag, len(self._out)))
+            self._out.append(f'<a href="{escape(href)}">')
+        elif tag in KEPT_TAGS:
+            kept = "".join(
+                f' {name}="{escape(value or "")}"'
+                for name, value in attrs
+                if name in KEPT_ATTRIBUTES
+            )
+            self._open.append((tag, len(self._out)))
+            self._out.append(f"<{tag}{kept}>")
+
+    def handle_startendtag(self, tag: str, attrs):
+        if tag in KEPT_TAGS:
+            return
+        self.handle_starttag(tag, attrs)
+
+    def handle_endtag(self, tag: str):
+        if tag in DROPPED_TAGS:
+            if tag != "img" and self._dropping:
+                self._dropping -= 1
+            return
+        if self._dropping or (tag not in KEPT_TAGS and tag != "a"):
+            return
+        if not any(open_tag == tag for open_tag, _ in self._open):
+            return
+        while self._open:
+            open_tag, start = self._open.pop()
+            self._close(open_tag, start)
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data: str):
+        if not self._dropping:
+            self._out.append(escape(_WHITESPACE.sub(" ", data), quote=False))
+
+    def result(self) -> str:
+        while self._open:
+            self._close(*self._open.pop())
+        return _SPACE_AROUND_TAG.sub(r"\1", "".join(self._out)).strip()
+
+    def _close(self, tag: str, start: int) -> None:
+        text = " ".join(_TAG.sub(" ", "".join(self._out[start:])).split())
+        if tag == "a":
+            self._close_link(start, text)
+            return
+        if tag in DROPPED_WHEN_EMPTY and not text:
+            del self._out[start:]
+            return
+        if tag in DEDUPLICATED_TAGS:
+            if self._is_furniture(tag, text):
+                del self._out[start:]
+                return
+            if len(self._header_blocks) < HEADER_BLOCKS:
+                self._header_blocks.append(text)
+        self._last_block = (tag, text)
+        self._out.append(f"</{tag}>")
+
+    def _is_furniture(self, tag: str, text: str) -> bool:
+        return (
+            self._last_block == (tag, text)
+            or (
+                len(self._header_blocks) == HEADER_BLOCKS
+                and text in self._header_blocks
+            )
+            or bool(PAGE_NUMBER.match(text))
+        )
+
+    def _close_link(self, start: int, text: str) -> None:
+        href = self._out[start][len('<a href="') : -len('">')]
+        target = _LINK_PREFIX.sub("", unescape(href)).rstrip("/")
+        if href.startswith(("#", "javascript:")) or target in ("", text.rstrip("/")):
+            self._out[start] = ""
+        else:
+            self._out.append("</a>")
+
+
+def compact_html(html: str) -> str:
+    """
+    Strip the presentational markup of an extracted resume: styles, scripts, images,
+    attributes and layout wrappers go, whitespace is collapsed and page furniture is
+    dropped. Headings, paragraphs, lists, tables and link targets are kept.
+    @param html: The HTML extracted from the resume.
+    @return: The compacted HTML.
+    """
+    parser = _CompactingParser()
+    parser.feed(html)
+    parser.close()
+    return parser.result()
+
+
+class PromptCompactor:
+    """
+    Compacts the resume HTML sent to the AI and keeps count of the tokens saved.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {"requests": 0, "tokens_before": 0, "tokens_after": 0}
+
+    def compact(self, resume_html: str) -> str:
+        compacted = compact_html(resume_html)
+        before, after = estimate_tokens(resume_html), estimate_tokens(compacted)
+        logger.info(
+            "Compacted the resume HTML from %d to %d tokens (-%.0f%%)",
+            before,
+            after,
+            100 * (before - after) / before if before else 0,
+        )
+        with self._lock:
+            self._counters["requests"] += 1
+            self._counters["tokens_before"] += before
+            self._counters["tokens_after"] += after
+        return compacted
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counters)
+
+
+class CompactingAIClient(IAIClient):
+    """
+    Decorator of IAIClient compacting the resume HTML before it is put in the prompt.
+    @attribute client: The AI client receiving the compacted HTML.
+    @attribute compactor: The compactor shared by every request.
+    """
+
+    def __init__(self, client: IAIClient, compactor: PromptCompactor):
+        self.client = client
+        self.compactor = compactor
+        self.model = client.model
+
+    async def generate_feedback(self, resume_html: str, job_title: str) -> str:
+        return await self.client.generate_feedback(
+            self.compactor.compact(resume_html), job_title
+        )
+
+    def stream_feedback(self, resume_html: str, job_title: str) -> AsyncIterator[str]:
+        return self.client.stream_feedback(
+            self.compactor.compact(resume_html), job_title
+        )
+
+    async def generate_sections(
+        self, resume_html: str, job_title: str
+    ) -> FeedbackSections:
+        # Compacted once for both requests.
+        return await self.client.generate_sections(
+            self.compactor.compact(resume_html), job_title
+        )
+
+    async def revise_section(
+        self, section_html: str, job_title: str, max_tokens: Optional[int] = None
+    ) -> FeedbackSections:
+        return await self.client.revise_section(
+            self.compactor.compact(section_html), job_title, max_tokens
+        )
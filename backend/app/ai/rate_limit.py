@@ -0,0 +1,145 @@
+import asyncio
+import random
+import re
+import time
+from typing import Mapping, Optional
+
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens of a text, about four characters per token.
+    """
+    return (len(text) + 3) // 4
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """
+    Parse the durations of the OpenAI rate-limit headers (e.g. "20ms", "1s", "6m0s").
+    @param value: The header value.
+    @return: The duration in seconds, or None if missing or malformed.
+    """
+    if not value:
+        return None
+    parts = _DURATION.findall(value)
+    if not parts:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return sum(float(amount) * _UNITS[unit] for amount, unit in parts)
+
+
+def _parse_float(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class TokenBucket:
+    """
+    Token bucket whose capacity, level and refill rate follow the rate-limit headers of
+    the upstream API. Until the first update it lets everything through.
+    Waiters are served in arrival order.
+    """
+
+    def __init__(self):
+        self.capacity: Optional[float] = None
+        self.refill_rate = 0.0
+        self._tokens = 0.0
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        self.throttled = 0
+
+    async def acquire(self, cost: float = 1.0) -> None:
+        """
+        Wait until the bucket holds enough tokens, then take them.
+        @param cost: The number of tokens taken. Costs above the capacity are capped.
+        """
+        async with self._lock:
+            while self.capacity is not None:
+                self._refill()
+                needed = min(cost, self.capacity)
+                if self._tokens >= needed:
+                    self._tokens -= needed
+                    return
+                self.throttled += 1
+                rate = self.refill_rate or 1.0
+                await asyncio.sleep(max((needed - self._tokens) / rate, 0.01))
+
+    def update(
+        self,
+        limit: Optional[float],
+        remaining: Optional[float],
+        reset: Optional[float],
+    ) -> None:
+        """
+        Synchronize the bucket with the headers of a response.
+        @param limit: The maximum the bucket can hold.
+        @param remaining: The tokens left upstream.
+        @param reset: Seconds until the upstream bucket is full again.
+        """
+        if limit is None or remaining is None:
+            return
+        self.capacity = limit
+        self._tokens = min(remaining, limit)
+        self._updated = time.monotonic()
+        if reset and limit > remaining:
+            self.refill_rate = (limit - remaining) / reset
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.refill_rate
+        )
+        self._updated = now
+
+
+class RateLimiter:
+    """
+    The request and token buckets of an OpenAI-compatible API, fed from the
+    x-ratelimit-* headers of every response.
+    """
+
+    def __init__(self):
+        self.requests = TokenBucket()
+        self.tokens = TokenBucket()
+
+    async def acquire(self, estimated_tokens: int) -> None:
+        await self.requests.acquire(1)
+        await self.tokens.acquire(estimated_tokens)
+
+    def update(self, headers: Mapping[str, str]) -> None:
+        for kind, bucket in (("requests", self.requests), ("tokens", self.tokens)):
+            bucket.update(
+                _parse_float(headers.get(f"x-ratelimit-limit-{kind}")),
+                _parse_float(headers.get(f"x-ratelimit-remaining-{kind}")),
+                parse_duration(headers.get(f"x-ratelimit-reset-{kind}")),
+            )
+
+
+def retry_delay(
+    attempt: int,
+    headers: Optional[Mapping[str, str]],
+    base: float,
+    cap: float,
+) -> float:
+    """
+    Compute how long to wait before retrying: the delay asked by the server if any,
+    otherwise an exponential backoff with full jitter.
+    @param attempt: The number of attempts already made, starting at 0.
+    @param headers: The headers of the failed response, if any.
+    @param base: The delay of the first retry.
+    @param cap: The maximum delay.
+    """
+    if headers:
+        retry_after = _parse_float(headers.get("retry-after-ms"))
+        if retry_after is not None:
+            return min(retry_after / 1000, cap)
+        retry_after = _parse_float(headers.get("retry-after"))
+        if retry_after is not None:
+            return min(retry_after, cap)
+    return random.uniform(0, min(cap, base * 2**attempt))
@@ -0,0 +1,209 @@
+import hashlib
+import html
+import re
+import struct
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+# One-permutation MinHash over the word shingles of the resume text, banded for LSH:
+# each shingle is hashed once and lands in one of the signature slots, which keeps the
+# minimum of its hashes. Hashing every shingle once per slot, as classic MinHash does,
+# is two orders of magnitude slower in Python. The slots left empty borrow the value
+# of the next filled one (densification), so every slot can be compared.
+MAX_HASH = (1 << 32) - 1
+# Added per slot skipped when borrowing, so a borrowed value differs from its source.
+DENSIFY_OFFSET = 0x9E3779B1
+
+TAG_PATTERN = re.compile(r"<[^>]*>")
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def resume_words(resume_html: str) -> List[str]:
+    """
+    The words of a resume, without its markup, so the same resume extracted from a PDF
+    or a DOCX gives the same words.
+    @param resume_html: The html extracted from the resume.
+    @return: The casefolded words, in order.
+    """
+    text = html.unescape(TAG_PATTERN.sub(" ", resume_html))
+    return WORD_PATTERN.findall(text.casefold())
+
+
+def shingle_hashes(words: Sequence[str], size: int) -> List[int]:
+    """
+    Hash the distinct runs of `size` consecutive words.
+    @return: The 64-bit hashes of the shingles, a single one for shorter texts.
+    """
+    if len(words) <= size:
+        shingles = {" ".join(words)}
+    else:
+        shingles = {" ".join(words[i : i + size]) for i in range(len(words) - size + 1)}
+    return [
+        int.from_bytes(
+            hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little"
+        )
+        for shingle in shingles
+    ]
+
+
+def lsh_bands(
+    threshold: float, num_slots: int, recall: float = 0.95
+) -> Tuple[int, int]:
+    """
+    Choose how to band the signatures: two resumes become candidates when all the rows
+    of one of their bands match, which happens with probability 1 - (1 - s^r)^b at
+    similarity s. The most rows keeping that probability at the threshold above
+    `recall` are used, as fewer candidates are then compared for nothing.
+    @param threshold: The lowest similarity the lookups look for.
+    @param num_slots: The length of the signatures.
+    @param recall: The least probability of finding a resume at the threshold.
+    @return: The number of bands and the number of rows in each.
+    """
+    best = (num_slots, 1)
+    for rows in range(1, num_slots + 1):
+        bands = num_slots // rows
+        if 1 - (1 - threshold**rows) ** bands >= recall:
+            best = (bands, rows)
+    return best
+
+
+@dataclass
+class Fingerprint:
+    """
+    The MinHash signature of a resume and its LSH buckets.
+    @attribute signature: The minimum hash of the shingles in each slot.
+    @attribute buckets: One signed 64-bit hash per band, the band index included, so
+    one indexed column serves every band.
+    """
+
+    signature: Tuple[int, ...]
+    buckets: List[int]
+
+    def packed(self) -> bytes:
+        return struct.pack(f"<{len(self.signature)}I", *self.signature)
+
+
+def unpack_signature(data: bytes) -> Tuple[int, ...]:
+    return struct.unpack(f"<{len(data) // 4}I", data)
+
+
+def signature_similarity(a: Sequence[int], b: Sequence[int]) -> float:
+    """
+    Estimate the Jaccard similarity of two resumes from their signatures.
+    @return: The fraction of slots in which they share the minimum hash.
+    """
+    if len(a) != len(b) or not a:
+        return 0.0
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+@dataclass
+class SimilarResume:
+    """
+    A previous resume close to a new one.
+    @attribute resume_id: The id of the previous resume.
+    @attribute similarity: The estimated Jaccard similarity of their shingles.
+    """
+
+    resume_id: int
+    similarity: float
+
+
+class NearDuplicateDetector:
+    """
+    Finds the resumes already processed that are nearly the same as a new one, e.g.
+    re-uploaded with a typo fixed or in another format, whose exact hashes differ.
+    The fingerprints are stored next to the resumes; a lookup is one indexed query on
+    the LSH buckets, then the candidates are compared on their signatures.
+    @attribute threshold: The similarity from which a previous result is offered as a
+    preliminary answer.
+    @attribute reuse_threshold: The similarity from which a previous result is compared
+    word for word with the new resume, to be reused instead of generating one when
+    their text is the same.
+    @attribute max_age_seconds: Only the results this recent are looked up.
+    @attribute shingle_size: The number of words in a shingle.
+    @attribute bands: The number of LSH bands of a signature.
+    @attribute rows: The number of signature values in a band.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.85,
+        reuse_threshold: float = 0.97,
+        max_age_seconds: float = 30 * 24 * 3600,
+        slots: int = 128,
+        shingle_size: int = 4,
+    ):
+        self.threshold = threshold
+        self.reuse_threshold = reuse_threshold
+        self.max_age_seconds = max_age_seconds
+        self.slots = slots
+        self.shingle_size = shingle_size
+        self.bands, self.rows = lsh_bands(threshold, slots)
+
+    def fingerprint(self, resume_html: str) -> Fingerprint:
+        """
+        Compute the signature and the buckets of a resume. CPU-bound, about a
+        millisecond for a resume.
+        """
+        hashes = shingle_hashes(resume_words(resume_html), self.shingle_size)
+        minimums: List[Optional[int]] = [None] * self.slots
+        for h in hashes:
+            slot, value = h % self.slots, (h // self.slots) & MAX_HASH
+            current = minimums[slot]
+            if current is None or value < current:
+                minimums[slot] = value
+        signature = tuple(self._densify(minimums))
+        buckets = []
+        for band in range(self.bands):
+            values = signature[band * self.rows : (band + 1) * self.rows]
+            digest = hashlib.blake2b(
+                struct.pack(f"<I{len(values)}I", band, *values), digest_size=8
+            ).digest()
+            buckets.append(int.from_bytes(digest, "little", signed=True))
+        return Fingerprint(signature, buckets)
+
+    def _densify(self, minimums: List[Optional[int]]) -> List[int]:
+        # An empty slot takes the value of the next filled one, rotated by the distance.
+        filled = [i for i, value in enumerate(minimums) if value is not None]
+        if not filled:
+            return [0] * self.slots
+        values = []
+        for i, value in enumerate(minimums):
+            if value is None:
+                distance = next(
+                    (j - i for j in filled if j > i), filled[0] + self.slots - i
+                )
+                value = (
+                    minimums[(i + distance) % self.slots] + distance * DENSIFY_OFFSET
+                ) & MAX_HASH
+            values.append(value)
+        return values
+
+    def best_match(
+        self, fingerprint: Fingerprint, candidates: Iterable[Tuple[int, bytes]]
+    ) -> Optional[SimilarResume]:
+        """
+        Pick the most similar of the candidates found in the buckets, if any reaches
+        the threshold.
+        @param fingerprint: The fingerprint of the new resume.
+        @param candidates: The (resume id, packed signature) pairs found.
+        @return: The most similar resume, the most recent one on ties.
+        """
+        best: Optional[SimilarResume] = None
+        for resume_id, packed in candidates:
+            similarity = signature_similarity(
+                fingerprint.signature, unpack_signature(packed)
+            )
+            if similarity < self.threshold:
+                continue
+            if (
+                best is None
+                or similarity > best.similarity
+                or (similarity == best.similarity and resume_id > best.resume_id)
+            ):
+                best = SimilarResume(resume_id, similarity)
+        return best
+
+    def reusable(self, match: Optional[SimilarResume]) -> bool:
+        return match is not None and match.similarity >= self.reuse_threshold
@@ -0,0 +1,95 @@
+from enum import Enum
+from typing import List, Tuple
+
+FEEDBACK_MARKER = "1)"
+REVISED_HTML_MARKER = "2)"
+
+
+class _State(Enum):
+    PREAMBLE = "preamble"
+    FEEDBACK = "feedback"
+    REVISED_HTML = "revised_html"
+
+
+class FeedbackStreamParser:
+    """
+    Incremental parser of the "1) <feedback> 2) <revised html>" response of the AI.
+    The text is fed chunk by chunk as it is generated: the feedback is handed back as
+    soon as it is known not to be part of a section marker, and the revised HTML is
+    buffered for the renderer. Markers split across chunks are handled.
+    """
+
+    def __init__(self):
+        self._state = _State.PREAMBLE
+        self._pending = ""
+        self._preamble: List[str] = []
+        self._feedback: List[str] = []
+        self._revised_html: List[str] = []
+        self._feedback_started = False
+
+    def feed(self, chunk: str) -> str:
+        """
+        Consume the next chunk of the response.
+        @param chunk: The text generated since the previous call.
+        @return: The new feedback text, possibly empty.
+        """
+        if self._state is _State.REVISED_HTML:
+            self._revised_html.append(chunk)
+            return ""
+        text = self._pending + chunk
+        self._pending = ""
+        if self._state is _State.PREAMBLE:
+            index = text.find(FEEDBACK_MARKER)
+            if index < 0:
+                text, self._pending = self._hold_back(text, FEEDBACK_MARKER)
+                self._preamble.append(text)
+                return ""
+            self._state = _State.FEEDBACK
+            text = text[index + len(FEEDBACK_MARKER) :]
+        index = text.find(REVISED_HTML_MARKER)
+        if index >= 0:
+            self._state = _State.REVISED_HTML
+            self._revised_html.append(text[index + len(REVISED_HTML_MARKER) :])
+            return self._emit_feedback(text[:index])
+        text, self._pending = self._hold_back(text, REVISED_HTML_MARKER)
+        return self._emit_feedback(text)
+
+    def close(self) -> str:
+        """
+        Signal the end of the response.
+        @return: The remaining feedback text, possibly empty. When the response has no
+                 section marker at all, the whole response is the feedback.
+        """
+        text, self._pending = self._pending, ""
+        if self._state is _State.PREAMBLE:
+            self._state = _State.FEEDBACK
+            text = "".join(self._preamble) + text
+            self._preamble = []
+        if self._state is _State.FEEDBACK:
+            return self._emit_feedback(text)
+        self._revised_html.append(text)
+        return ""
+
+    @property
+    def feedback_text(self) -> str:
+        return "".join(self._feedback).strip()
+
+    @property
+    def revised_html(self) -> str:
+        return "".join(self._revised_html).strip()
+
+    def _emit_feedback(self, text: str) -> str:
+        if not self._feedback_started:
+            text = text.lstrip()
+            self._feedback_started = bool(text)
+        if text:
+            self._feedback.append(text)
+        return text
+
+    @staticmethod
+    def _hold_back(text: str, marker: str) -> Tuple[str, str]:
+        # Keep the longest suffix that could be the beginning of the marker.
+        for size in range(min(len(marker) - 1, len(text)), 0, -1):
+            if marker.startswith(text[-size:]):
+                return text[:-size], text[-size:]
+        return text, ""
@@ -1,4 +1,5 @@
 from pathlib import Path
+from typing import Dict, Optional
 from pydantic_settings import BaseSettings
 from dotenv import load_dotenv
 
@@ -10,9 +11,80 @@ load_dotenv(ENV_PATH, override=False)
 
 class Settings(BaseSettings):
     DATABASE_URL: str
+    DB_ECHO: bool = False
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_RECYCLE: int = 1800
+    HTML_COMPRESSION_LEVEL: int = 3
     OPENAI_API_KEY: str
+    OPENAI_MODEL: str = "gpt-3.5-turbo"
+    OPENAI_BASE_URL: Optional[str] = None
+    OPENAI_TIMEOUT: float = 120.0
+    OPENAI_MAX_CONNECTIONS: int = 32
+    OPENAI_MAX_CONCURRENCY: int = 16
+    OPENAI_MAX_RETRIES: int = 4
+    OPENAI_RETRY_BASE_DELAY: float = 0.5
+    OPENAI_RETRY_MAX_DELAY: float = 30.0
     UPLOAD_DIR: str
     AI_OUTPUT_DIR: str
+    ARTIFACT_STORE: str = "local"
+    ARTIFACT_TTL_DAYS: float = 30.0
+    ARTIFACT_MAX_BYTES: int = 2 * 1024 * 1024 * 1024
+    ARTIFACT_GC_INTERVAL: float = 3600.0
+    ARTIFACT_S3_BUCKET: Optional[str] = None
+    ARTIFACT_S3_PREFIX: str = "artifacts/"
+    ARTIFACT_S3_ENDPOINT_URL: Optional[str] = None
+    ARTIFACT_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+    UPLOAD_MAX_SIZE: int = 10 * 1024 * 1024
+    UPLOAD_MEMORY_LIMIT: int = 2 * 1024 * 1024
+    PIPELINE_WORKERS: int = 8
+    PIPELINE_QUEUE_SIZE: int = 500
+    ADMISSION_CLIENT_HEADER: Optional[str] = None
+    ADMISSION_CLIENT_MAX_QUEUED: int = 20
+    ADMISSION_CLIENT_MAX_IN_FLIGHT: int = 4
+    ADMISSION_CLIENT_WEIGHTS: Dict[str, float] = {}
+    STAGE_EXTRACT_MAX_CONCURRENCY: int = 4
+    STAGE_GENERATE_MAX_CONCURRENCY: int = 16
+    STAGE_RENDER_MAX_CONCURRENCY: int = 4
+    BATCH_MAX_FILES: int = 50
+    BATCH_MAX_JOB_TITLES: int = 20
+    BATCH_MAX_CONCURRENCY: int = 8
+    FAST_EXTRACTION: bool = True
+    PDF_TEXT_MIN_CHARS_PER_PAGE: int = 200
+    EXTRACTION_CACHE_MEMORY_ENTRIES: int = 256
+    EXTRACTION_CACHE_DIR: Optional[str] = None
+    EXTRACTION_CACHE_DISK_MAX_BYTES: int = 512 * 1024 * 1024
+    EXTRACTION_POOL_SIZE: int = 2
+    EXTRACTION_QUEUE_SIZE: int = 16
+    EXTRACTION_TIMEOUT: float = 120.0
+    EXTRACTION_WORKER_MAX_JOBS: int = 200
+    EXTRACTION_WORKER_MAX_RSS_BYTES: int = 4 * 1024 * 1024 * 1024
+    PDF_RENDER_POOL_SIZE: int = 2
+    PDF_RENDER_QUEUE_SIZE: int = 16
+    PDF_RENDER_TIMEOUT: float = 60.0
+    PDF_RENDER_WORKER_MAX_JOBS: int = 500
+    PDF_RENDER_WORKER_MAX_RSS_BYTES: int = 1024 * 1024 * 1024
+    PREFORK_POOLS: bool = False
+    PROMPT_COMPACTION: bool = True
+    AI_CACHE_MAX_ENTRIES: int = 512
+    AI_CACHE_TTL: float = 3600.0
+    AI_PARALLEL_GENERATION: bool = False
+    AI_ANALYSIS_MAX_TOKENS: int = 1500
+    AI_REVISION_MAX_TOKENS: int = 4000
+    AI_SECTIONED_GENERATION: bool = False
+    AI_SECTIONED_MIN_RESUME_TOKENS: int = 4000
+    AI_SECTIONED_OUTPUT_RATIO: float = 1.5
+    AI_SECTIONED_CRITIQUE_TOKENS: int = 600
+    AI_SECTIONED_MIN_SECTION_TOKENS: int = 300
+    NEAR_DUPLICATE_DETECTION: bool = True
+    NEAR_DUPLICATE_THRESHOLD: float = 0.85
+    NEAR_DUPLICATE_REUSE_THRESHOLD: float = 0.97
+    NEAR_DUPLICATE_MAX_AGE_DAYS: float = 30.0
+    PROFILE_REQUESTS: bool = False
+    PROFILE_THRESHOLD_SECONDS: float = 5.0
+    PROFILE_INTERVAL: float = 0.001
+    PROFILE_DIR: str = "profiles"
 
     class Config:
         env_file = ENV_PATH
@@ -0,0 +1,35 @@
+import hashlib
+from typing import Optional
+import zstandard
+
+
+def compress_text(text: Optional[str], level: int = 3) -> Optional[bytes]:
+    """
+    Compress a text with zstd.
+    @param text: The text to compress, or None.
+    @param level: The zstd compression level.
+    @return: The compressed UTF-8 bytes, or None if the text is None.
+    """
+    if text is None:
+        return None
+    return zstandard.ZstdCompressor(level=level).compress(text.encode("utf-8"))
+
+
+def decompress_text(blob: Optional[bytes]) -> Optional[str]:
+    """
+    Decompress a text compressed by compress_text.
+    @param blob: The compressed bytes, or None.
+    @return: The text, or None if the blob is None.
+    """
+    if blob is None:
+        return None
+    return zstandard.ZstdDecompressor().decompress(blob).decode("utf-8")
+
+
+def text_digest(text: str) -> str:
+    """
+    Hash a text, to tell whether it changed without loading it.
+    @param text: The text to hash.
+    @return: The hex SHA-256 of its UTF-8 bytes.
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
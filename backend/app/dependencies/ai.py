@@ -1,11 +1,75 @@
-from typing import Annotated
+from functools import lru_cache
+from typing import Annotated, Optional
 from fastapi import Depends
-from app.ai.ai_client import IAIClient, OpenAIClient
-from app.dependencies.settings import SettingsDep
+from app.ai.ai_client import AsyncOpenAIClient, IAIClient
+from app.ai.chunking import SectionedGenerator
+from app.ai.cache import CachingAIClient, FeedbackCache
+from app.ai.compaction import CompactingAIClient, PromptCompactor
+from app.ai.similarity import NearDuplicateDetector
+from app.dependencies.settings import get_settings
 
 
-def get_ai_client(settings: SettingsDep) -> IAIClient:
-    return OpenAIClient(settings)
+@lru_cache
+def get_feedback_cache() -> FeedbackCache:
+    # Shared by every request and pipeline worker of the process.
+    settings = get_settings()
+    return FeedbackCache(settings.AI_CACHE_MAX_ENTRIES, settings.AI_CACHE_TTL)
+
+
+@lru_cache
+def get_openai_client() -> AsyncOpenAIClient:
+    # Long-lived: its connection pool, concurrency limit and rate limiter are shared.
+    return AsyncOpenAIClient(get_settings())
+
+
+@lru_cache
+def get_prompt_compactor() -> PromptCompactor:
+    return PromptCompactor()
+
+
+@lru_cache
+def get_near_duplicate_detector() -> Optional[NearDuplicateDetector]:
+    # None when NEAR_DUPLICATE_DETECTION is off. A reuse threshold above 1 keeps the
+    # lookups but never reuses a result.
+    settings = get_settings()
+    if not settings.NEAR_DUPLICATE_DETECTION:
+        return None
+    return NearDuplicateDetector(
+        settings.NEAR_DUPLICATE_THRESHOLD,
+        settings.NEAR_DUPLICATE_REUSE_THRESHOLD,
+        settings.NEAR_DUPLICATE_MAX_AGE_DAYS * 24 * 3600,
+    )
+
+
+@lru_cache
+def get_sectioned_generator() -> Optional[SectionedGenerator]:
+    # None when AI_SECTIONED_GENERATION is off: every resume is revised whole.
+    settings = get_settings()
+    if not settings.AI_SECTIONED_GENERATION:
+        return None
+    return SectionedGenerator(
+        settings.AI_SECTIONED_MIN_RESUME_TOKENS,
+        settings.AI_SECTIONED_OUTPUT_RATIO,
+        settings.AI_SECTIONED_CRITIQUE_TOKENS,
+        settings.AI_SECTIONED_MIN_SECTION_TOKENS,
+    )
+
+
+def get_ai_client() -> IAIClient:
+    client: IAIClient = CachingAIClient(get_openai_client(), get_feedback_cache())
+    if get_settings().PROMPT_COMPACTION:
+        # Compacting first lets resumes differing only in markup share a cache entry.
+        client = CompactingAIClient(client, get_prompt_compactor())
+    return client
 
 
 AIClientDep = Annotated[IAIClient, Depends(get_ai_client)]
+FeedbackCacheDep = Annotated[FeedbackCache, Depends(get_feedback_cache)]
+PromptCompactorDep = Annotated[PromptCompactor, Depends(get_prompt_compactor)]
+OpenAIClientDep = Annotated[AsyncOpenAIClient, Depends(get_openai_client)]
+NearDuplicateDetectorDep = Annotated[
+    Optional[NearDuplicateDetector], Depends(get_near_duplicate_detector)
+]
+SectionedGeneratorDep = Annotated[
+    Optional[SectionedGenerator], Depends(get_sectioned_generator)
+]
@@ -1,12 +1,17 @@
 from app.db.session import engine
-from sqlmodel import Session
-from typing import Annotated
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import Annotated, AsyncIterator
 from fastapi import Depends
 
 
-def get_session():
-    with Session(engine) as session:
+def open_session() -> AsyncSession:
+    # Objects stay loaded after a commit, so writes need no refresh round-trip.
+    return AsyncSession(engine, expire_on_commit=False)
+
+
+async def get_session() -> AsyncIterator[AsyncSession]:
+    async with open_session() as session:
         yield session
 
 
-SessionDep = Annotated[Session, Depends(get_session)]
+SessionDep = Annotated[AsyncSession, Depends(get_session)]
@@ -0,0 +1,92 @@
+from functools import lru_cache
+from typing import Annotated, Optional
+from fastapi import Depends
+from app.dependencies.settings import get_settings
+from app.extractors.cache import ExtractionCache
+from app.extractors.docling_extractor import (
+    DoclingExtractor,
+    convert_to_html,
+    converter_fingerprint,
+    warm_converter,
+)
+from app.extractors.fast_extractors import (
+    DocxExtractor,
+    HtmlExtractor,
+    MarkdownExtractor,
+    PdfTextExtractor,
+    TextExtractor,
+)
+from app.extractors.registry import ExtractorRegistry
+from app.extractors.sniff import FileFormat
+from app.workers.process_pool import WarmProcessPool
+
+
+@lru_cache
+def get_extraction_cache() -> ExtractionCache:
+    # Shared by every request and pipeline worker of the process.
+    settings = get_settings()
+    return ExtractionCache(
+        converter_fingerprint(),
+        settings.EXTRACTION_CACHE_MEMORY_ENTRIES,
+        settings.EXTRACTION_CACHE_DIR,
+        settings.EXTRACTION_CACHE_DISK_MAX_BYTES,
+    )
+
+
+ExtractionCacheDep = Annotated[ExtractionCache, Depends(get_extraction_cache)]
+
+
+@lru_cache
+def get_extraction_pool() -> Optional[WarmProcessPool]:
+    # None when EXTRACTION_POOL_SIZE is 0: conversions then run in the API process.
+    settings = get_settings()
+    if settings.EXTRACTION_POOL_SIZE <= 0:
+        return None
+    return WarmProcessPool(
+        "extraction",
+        warm_converter,
+        convert_to_html,
+        settings.EXTRACTION_POOL_SIZE,
+        settings.EXTRACTION_QUEUE_SIZE,
+        settings.EXTRACTION_TIMEOUT,
+        max_jobs_per_worker=settings.EXTRACTION_WORKER_MAX_JOBS,
+        max_worker_rss=settings.EXTRACTION_WORKER_MAX_RSS_BYTES,
+    )
+
+
+ExtractionPoolDep = Annotated[Optional[WarmProcessPool], Depends(get_extraction_pool)]
+
+
+def build_extractor_registry(
+    cache: Optional[ExtractionCache] = None,
+    pool: Optional[WarmProcessPool] = None,
+    fast: bool = True,
+    pdf_min_chars_per_page: int = 200,
+) -> ExtractorRegistry:
+    """
+    Route each format to its fast path when there is one, Docling taking the rest and
+    the files the fast paths give up on.
+    @param fast: Whether to use the fast paths. HTML is read directly regardless.
+    """
+    registry = ExtractorRegistry(DoclingExtractor(cache, pool))
+    registry.register(FileFormat.HTML, HtmlExtractor())
+    if fast:
+        registry.register(FileFormat.PDF, PdfTextExtractor(pdf_min_chars_per_page))
+        registry.register(FileFormat.DOCX, DocxExtractor())
+        registry.register(FileFormat.MARKDOWN, MarkdownExtractor())
+        registry.register(FileFormat.TEXT, TextExtractor())
+    return registry
+
+
+@lru_cache
+def get_extractor_registry() -> ExtractorRegistry:
+    settings = get_settings()
+    return build_extractor_registry(
+        get_extraction_cache(),
+        get_extraction_pool(),
+        settings.FAST_EXTRACTION,
+        settings.PDF_TEXT_MIN_CHARS_PER_PAGE,
+    )
+
+
+ExtractorRegistryDep = Annotated[ExtractorRegistry, Depends(get_extractor_registry)]
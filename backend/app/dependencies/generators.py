@@ -0,0 +1,33 @@
+from functools import lru_cache
+from typing import Annotated
+from fastapi import Depends
+from app.dependencies.settings import get_settings
+from app.generators.pdf_weasy_generator import (
+    PdfRenderEngine,
+    get_renderer,
+    render_pdf,
+)
+from app.workers.process_pool import WarmProcessPool
+
+
+@lru_cache
+def get_pdf_render_engine() -> PdfRenderEngine:
+    # Renders run in the API process when PDF_RENDER_POOL_SIZE is 0.
+    settings = get_settings()
+    if settings.PDF_RENDER_POOL_SIZE <= 0:
+        return PdfRenderEngine()
+    return PdfRenderEngine(
+        WarmProcessPool(
+            "pdf-render",
+            get_renderer,
+            render_pdf,
+            settings.PDF_RENDER_POOL_SIZE,
+            settings.PDF_RENDER_QUEUE_SIZE,
+            settings.PDF_RENDER_TIMEOUT,
+            max_jobs_per_worker=settings.PDF_RENDER_WORKER_MAX_JOBS,
+            max_worker_rss=settings.PDF_RENDER_WORKER_MAX_RSS_BYTES,
+        )
+    )
+
+
+PdfRenderEngineDep = Annotated[PdfRenderEngine, Depends(get_pdf_render_engine)]
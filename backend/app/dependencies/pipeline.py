@@ -0,0 +1,42 @@
+from functools import lru_cache
+from typing import Annotated
+from fastapi import Depends, Request
+from app.dependencies.settings import SettingsDep, get_settings
+from app.workers.admission import StageLimiter
+from app.workers.pipeline import ResumePipeline
+
+
+def get_resume_pipeline(request: Request) -> ResumePipeline:
+    return request.app.state.resume_pipeline
+
+
+ResumePipelineDep = Annotated[ResumePipeline, Depends(get_resume_pipeline)]
+
+
+def get_client_id(request: Request, settings: SettingsDep) -> str:
+    # The header set by the gateway in front of the API (an API key, a user id...)
+    # when there is one, as every client would otherwise share its address.
+    if settings.ADMISSION_CLIENT_HEADER:
+        client_id = request.headers.get(settings.ADMISSION_CLIENT_HEADER)
+        if client_id:
+            return client_id
+    return request.client.host if request.client else ""
+
+
+ClientIdDep = Annotated[str, Depends(get_client_id)]
+
+
+@lru_cache
+def get_stage_limiter() -> StageLimiter:
+    # Shared by every request and pipeline worker of the process.
+    settings = get_settings()
+    return StageLimiter(
+        {
+            "extract": settings.STAGE_EXTRACT_MAX_CONCURRENCY,
+            "generate": settings.STAGE_GENERATE_MAX_CONCURRENCY,
+            "render": settings.STAGE_RENDER_MAX_CONCURRENCY,
+        }
+    )
+
+
+StageLimiterDep = Annotated[StageLimiter, Depends(get_stage_limiter)]
@@ -1,11 +1,16 @@
 from typing import Annotated
 from fastapi import Depends
 from app.dependencies.database import SessionDep
+from app.dependencies.settings import SettingsDep
 from app.repositories.resume import IResumeRepository, ResumeRepository
 
 
-def get_resume_repository(session: SessionDep) -> IResumeRepository:
-    return ResumeRepository(db=session)
+def get_resume_repository(
+    session: SessionDep, settings: SettingsDep
+) -> IResumeRepository:
+    return ResumeRepository(
+        db=session, compression_level=settings.HTML_COMPRESSION_LEVEL
+    )
 
 
 ResumeRepositoryDep = Annotated[IResumeRepository, Depends(get_resume_repository)]
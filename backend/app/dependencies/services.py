@@ -1,9 +1,23 @@
-from typing import Annotated
-from app.dependencies.database import SessionDep
-from app.dependencies.ai import AIClientDep
+from contextlib import asynccontextmanager
+from typing import Annotated, AsyncIterator
+from app.dependencies.database import SessionDep, open_session
+from app.dependencies.ai import (
+    AIClientDep,
+    NearDuplicateDetectorDep,
+    SectionedGeneratorDep,
+    get_ai_client,
+    get_near_duplicate_detector,
+    get_sectioned_generator,
+)
+from app.dependencies.extractors import ExtractorRegistryDep, get_extractor_registry
+from app.dependencies.generators import PdfRenderEngineDep, get_pdf_render_engine
+from app.dependencies.pipeline import StageLimiterDep, get_stage_limiter
 from app.dependencies.repositories import ResumeRepositoryDep
+from app.dependencies.storage import ArtifactStoreDep, get_artifact_store
+from app.repositories.resume import ResumeRepository
 from fastapi import Depends
 from app.services.resume import IResumeService, ResumeService, MockResumeService
+from app.config import Settings
 from app.dependencies.settings import SettingsDep
 
 
@@ -12,16 +26,49 @@ def get_resume_service(
     session: SessionDep,
     ai: AIClientDep,
     settings: SettingsDep,
+    extractors: ExtractorRegistryDep,
+    pdf_engine: PdfRenderEngineDep,
+    artifacts: ArtifactStoreDep,
+    duplicates: NearDuplicateDetectorDep,
+    stage_limiter: StageLimiterDep,
+    sectioned: SectionedGeneratorDep,
 ) -> IResumeService:
     return ResumeService(
         repo,
         session,
         ai,
-        settings.UPLOAD_DIR,
-        settings.AI_OUTPUT_DIR,
+        artifacts,
+        extractors,
+        pdf_engine,
+        settings.AI_PARALLEL_GENERATION,
+        duplicates,
+        stage_limiter,
+        sectioned,
     )
 
 
+@asynccontextmanager
+async def resume_service_scope(settings: Settings) -> AsyncIterator[IResumeService]:
+    """
+    Build a resume service with its own session, for work done outside a request.
+    """
+    async with open_session() as session:
+        yield ResumeService(
+            ResumeRepository(
+                db=session, compression_level=settings.HTML_COMPRESSION_LEVEL
+            ),
+            session,
+            get_ai_client(),
+            get_artifact_store(),
+            get_extractor_registry(),
+            get_pdf_render_engine(),
+            settings.AI_PARALLEL_GENERATION,
+            get_near_duplicate_detector(),
+            get_stage_limiter(),
+            get_sectioned_generator(),
+        )
+
+
 def get_mock_resume_service() -> IResumeService:
     return MockResumeService()
 
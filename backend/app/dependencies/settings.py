@@ -1,9 +1,12 @@
+from functools import lru_cache
 from typing import Annotated
 from app.config import Settings
 from fastapi import Depends
 
 
+@lru_cache
 def get_settings() -> Settings:
+    # Read once: building Settings parses the environment and the .env file again.
     return Settings()
 
 
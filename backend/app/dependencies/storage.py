@@ -0,0 +1,48 @@
+import os
+from functools import lru_cache
+from typing import Annotated
+from fastapi import Depends
+from app.dependencies.settings import get_settings
+from app.storage.artifacts import IArtifactStore, LocalArtifactStore, S3ArtifactStore
+
+
+@lru_cache
+def get_artifact_store() -> IArtifactStore:
+    # The artifacts are sharded under AI_OUTPUT_DIR, or kept there as the local copies
+    # of the S3 bucket. They are staged in a directory of their own under UPLOAD_DIR:
+    # the collector sweeps it, and the uploads spilled to UPLOAD_DIR may wait in the
+    # pipeline queue for longer than the staging files live.
+    settings = get_settings()
+    staging_dir = os.path.join(settings.UPLOAD_DIR, ".staging")
+    ttl_seconds = settings.ARTIFACT_TTL_DAYS * 24 * 3600
+    if settings.ARTIFACT_STORE == "local":
+        return LocalArtifactStore(
+            settings.AI_OUTPUT_DIR,
+            staging_dir,
+            ttl_seconds,
+            settings.ARTIFACT_MAX_BYTES,
+        )
+    if settings.ARTIFACT_STORE != "s3":
+        raise ValueError(f"Unknown ARTIFACT_STORE {settings.ARTIFACT_STORE!r}")
+    if not settings.ARTIFACT_S3_BUCKET:
+        raise ValueError("ARTIFACT_S3_BUCKET is required with ARTIFACT_STORE=s3")
+    # Only needed with this backend; the credentials and the region come from the
+    # usual AWS environment variables.
+    import boto3
+
+    return S3ArtifactStore(
+        boto3.client("s3", endpoint_url=settings.ARTIFACT_S3_ENDPOINT_URL),
+        settings.ARTIFACT_S3_BUCKET,
+        LocalArtifactStore(
+            settings.AI_OUTPUT_DIR,
+            staging_dir,
+            ttl_seconds,
+            settings.ARTIFACT_CACHE_MAX_BYTES,
+        ),
+        settings.ARTIFACT_S3_PREFIX,
+        ttl_seconds,
+        settings.ARTIFACT_MAX_BYTES,
+    )
+
+
+ArtifactStoreDep = Annotated[IArtifactStore, Depends(get_artifact_store)]
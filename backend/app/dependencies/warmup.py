@@ -0,0 +1,10 @@
+from typing import Annotated
+from fastapi import Depends, Request
+from app.workers.warmup import Warmup
+
+
+def get_warmup(request: Request) -> Warmup:
+    return request.app.state.warmup
+
+
+WarmupDep = Annotated[Warmup, Depends(get_warmup)]
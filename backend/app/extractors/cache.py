@@ -0,0 +1,156 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+# Bump when the post-processing of the extracted HTML changes, to invalidate old entries.
+EXTRACTION_CACHE_VERSION = "1"
+
+
+class ExtractionCache:
+    """
+    Content-addressed cache of extracted HTML, with an in-memory LRU tier in front of
+    an optional on-disk tier capped in size. Entries are keyed by the SHA-256 of the
+    file bytes and of the extractor fingerprint (Docling version and converter options).
+    @attribute fingerprint: Identifies the extractor configuration producing the HTML.
+    @attribute memory_entries: The maximum number of entries kept in memory.
+    @attribute cache_dir: The directory of the disk tier, or None to disable it.
+    @attribute disk_max_bytes: The maximum size of the disk tier.
+    """
+
+    def __init__(
+        self,
+        fingerprint: str,
+        memory_entries: int,
+        cache_dir: Optional[str] = None,
+        disk_max_bytes: int = 0,
+    ):
+        self.fingerprint = fingerprint
+        self.memory_entries = memory_entries
+        self.cache_dir = cache_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._memory: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes = 0
+        self._hits = {"memory": 0, "disk": 0}
+        self._misses = 0
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._disk_bytes = sum(size for _, size, _ in self._disk_entries())
+
+    def key(self, content_hash: str) -> str:
+        """
+        Compute the cache key of a file.
+        @param content_hash: The SHA-256 hex digest of the bytes of the file.
+        @return: The hex digest identifying the file and the extractor configuration.
+        """
+        digest = hashlib.sha256(content_hash.encode("ascii"))
+        digest.update(b"\0")
+        digest.update(self.fingerprint.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up an entry, promoting disk hits to memory.
+        @param key: The key returned by key().
+        @return: The cached HTML or None on a miss.
+        """
+        with self._lock:
+            html = self._memory.get(key)
+            if html is not None:
+                self._memory.move_to_end(key)
+                self._hits["memory"] += 1
+                return html
+        html = self._read_disk(key)
+        with self._lock:
+            if html is None:
+                self._misses += 1
+                return None
+            self._hits["disk"] += 1
+            self._put_memory(key, html)
+        return html
+
+    def put(self, key: str, html: str) -> None:
+        """
+        Store an entry in both tiers.
+        @param key: The key returned by key().
+        @param html: The extracted HTML.
+        """
+        with self._lock:
+            self._put_memory(key, html)
+        self._write_disk(key, html)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "memory_hits": self._hits["memory"],
+                "disk_hits": self._hits["disk"],
+                "misses": self._misses,
+                "memory_entries": len(self._memory),
+                "disk_bytes": self._disk_bytes,
+            }
+
+    def _put_memory(self, key: str, html: str) -> None:
+        self._memory[key] = html
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.html")
+
+    def _read_disk(self, key: str) -> Optional[str]:
+        if not self.cache_dir:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                html = f.read()
+        except FileNotFoundError:
+            return None
+        # The modification time doubles as the last access time for eviction.
+        os.utime(path)
+        return html
+
+    def _write_disk(self, key: str, html: str) -> None:
+        if not self.cache_dir:
+            return
+        data = html.encode("utf-8")
+        if len(data) > self.disk_max_bytes:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        previous = os.path.getsize(path) if os.path.exists(path) else 0
+        os.replace(tmp, path)
+        with self._lock:
+            self._disk_bytes += len(data) - previous
+            if self._disk_bytes > self.disk_max_bytes:
+                self._evict_disk()
+
+    def _disk_entries(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".html"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def _evict_disk(self) -> None:
+        # Drop the least recently used files until the tier is back under 90% of its cap.
+        target = self.disk_max_bytes * 0.9
+        for path, size, _ in sorted(self._disk_entries(), key=lambda e: e[2]):
+            if self._disk_bytes <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            self._disk_bytes -= size
@@ -1,31 +1,176 @@
-from docling.document_converter import DocumentConverter
+import logging
+from functools import lru_cache
+from importlib.metadata import PackageNotFoundError, version
+from io import BytesIO
+from typing import TYPE_CHECKING, Optional, Tuple, Union
+from app.extractors.cache import EXTRACTION_CACHE_VERSION, ExtractionCache
+from app.extractors.registry import IExtractor
+from app.observability.metrics import EXTRACTION_FALLBACKS
+from app.observability.tracing import timed_load
+from app.utils.file_utils import IngestedFile
+from app.workers.process_pool import PoolBusyError, PoolTimeoutError, WarmProcessPool
 import os
 
-converter = DocumentConverter()
+if TYPE_CHECKING:
+    from docling.document_converter import DocumentConverter
 
+logger = logging.getLogger(__name__)
 
-def extract_html_from_file(file_path: str) -> str:
+# The packages whose versions decide the HTML Docling produces: the converter, its
+# document model, its PDF parser and its layout and table models.
+DOCLING_PACKAGES = ("docling", "docling-core", "docling-parse", "docling-ibm-models")
+
+
+@lru_cache
+def get_converter() -> "DocumentConverter":
+    """
+    The converter of the current process, built on first use. Docling is imported here
+    rather than with the module: it takes seconds, and most processes importing the
+    module (the API with an extraction pool, alembic) never convert anything.
+    """
+    with timed_load("docling"):
+        from docling.document_converter import DocumentConverter
+    with timed_load("docling", "init"):
+        return DocumentConverter()
+
+
+@lru_cache
+def warm_converter() -> "DocumentConverter":
+    """
+    The converter of the current process with its PDF pipeline initialized, i.e. its
+    layout and OCR models loaded, which would otherwise happen on the first conversion.
+    The initializer of the extraction pool workers.
+    """
+    from docling.datamodel.base_models import InputFormat
+
+    converter = get_converter()
+    with timed_load("docling", "models"):
+        converter.initialize_pipeline(InputFormat.PDF)
+    return converter
+
+
+def convert_to_html(
+    converter: "DocumentConverter", source: Union[str, Tuple[str, bytes]]
+) -> str:
+    """
+    Convert a file with the given converter. Used in-process and as the handler of the
+    extraction pool, whose workers each build their own converter with warm_converter.
+    @param source: The path to the file, or its name and content.
+    """
+    if isinstance(source, tuple):
+        from docling.datamodel.base_models import DocumentStream
+
+        name, data = source
+        source = DocumentStream(name=name, stream=BytesIO(data))
+    result = converter.convert(source)
+    return result.document.export_to_html()
+
+
+def converter_fingerprint() -> str:
+    """
+    Describe the versions of Docling and of the packages doing its parsing and layout
+    analysis, which together decide the HTML produced for a given file. Read from the
+    package metadata, without importing Docling or building a converter: the API
+    process checks the cache before sending a conversion to the extraction pool.
+    The converter is built with the default options of those versions; bump
+    EXTRACTION_CACHE_VERSION when configuring others.
+    """
+    versions = []
+    for package in DOCLING_PACKAGES:
+        try:
+            versions.append(f"{package}={version(package)}")
+        except PackageNotFoundError:
+            versions.append(f"{package}=none")
+    return "|".join([*versions, f"cache={EXTRACTION_CACHE_VERSION}"])
+
+
+def extract_html_from_file(
+    file_path: str,
+    cache: Optional[ExtractionCache] = None,
+    pool: Optional[WarmProcessPool] = None,
+) -> str:
     """
     Use Docling to convert the given file_path (PDF/DOCX/etc.) into an HTML string.
-    If the file is already HTML, read it directly.
+    See extract_html.
     """
-    file_ext = os.path.splitext(file_path)[1].lower()
+    return extract_html(IngestedFile.from_path(file_path), cache, pool)
 
-    if file_ext == ".html":
-        with open(file_path, "r", encoding="utf-8") as f:
-            return f.read()
+
+def extract_html(
+    file: IngestedFile,
+    cache: Optional[ExtractionCache] = None,
+    pool: Optional[WarmProcessPool] = None,
+) -> str:
+    """
+    Use Docling to convert the given file (PDF/DOCX/etc.) into an HTML string.
+    If the file is already HTML, read it directly. See docling_html.
+    """
+    if file.extension == ".html":
+        return file.read_bytes().decode("utf-8")
+    return docling_html(file, cache, pool)
+
+
+def docling_html(
+    file: IngestedFile,
+    cache: Optional[ExtractionCache] = None,
+    pool: Optional[WarmProcessPool] = None,
+) -> str:
+    """
+    Use Docling to convert the given file into an HTML string, whatever its name.
+    Files kept in memory are handed to Docling as a stream, without touching the disk.
+    If a cache is given, a file already converted is served from it without running Docling.
+    If a pool is given, the conversion runs in one of its worker processes.
+    """
+    key = None
+    if cache is not None:
+        key = cache.key(file.content_hash)
+        html = cache.get(key)
+        if html is not None:
+            return html
+    source = file.path if file.data is None else (file.filename, file.data)
     try:
-        result = converter.convert(file_path)
-        html = result.document.export_to_html()
+        if pool is not None:
+            html = pool.submit(source)
+        else:
+            html = convert_to_html(get_converter(), source)
+        if key is not None:
+            cache.put(key, html)
         return html
+    except (PoolBusyError, PoolTimeoutError):
+        # Saturation and hung conversions fail the stage instead of falling back. A
+        # conversion failing in the worker (WorkerJobError) falls back like one failing
+        # here.
+        raise
     except Exception as e:
-        print(f"Warning: Docling extraction failed for {file_path}: {e}")
+        logger.warning("Docling extraction failed for %s: %s", file.filename, e)
+        EXTRACTION_FALLBACKS.inc()
         try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                content = f.read()
-                return f"<html><body><pre>{content}</pre></body></html>"
+            content = file.read_bytes().decode("utf-8")
+            return f"<html><body><pre>{content}</pre></body></html>"
         except:
-            return f"<html><body><p>Error: Could not extract content from {file_path}</p></body></html>"
+            return f"<html><body><p>Error: Could not extract content from {file.filename}</p></body></html>"
+
+
+class DoclingExtractor(IExtractor):
+    """
+    The extractor of last resort, reading every format Docling supports with its
+    layout and OCR models. See docling_html.
+    @attribute cache: The cache of converted files, or None to always convert.
+    @attribute pool: The worker processes running Docling, or None to run it here.
+    """
+
+    name = "docling"
+
+    def __init__(
+        self,
+        cache: Optional[ExtractionCache] = None,
+        pool: Optional[WarmProcessPool] = None,
+    ):
+        self.cache = cache
+        self.pool = pool
+
+    def extract(self, file: IngestedFile) -> Optional[str]:
+        return docling_html(file, self.cache, self.pool)
 
 
 def save_html_to_disk(html_content: str, output_path: str) -> None:
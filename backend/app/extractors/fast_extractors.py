@@ -0,0 +1,248 @@
+import html
+import re
+import threading
+from typing import Iterable, Iterator, List, Optional, Tuple
+from app.extractors.registry import IExtractor
+from app.utils.file_utils import IngestedFile
+
+# Bullets seen at the start of the lines of text extracted from resumes.
+BULLET = re.compile(r"^\s*(?:[-*+•▪●◦‣⁃]|\d+[.)])\s+")
+HEADING = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+
+# The content of the text boxes anchored in a paragraph. Word writes each text box
+# twice, as a drawing and as its VML fallback for older readers.
+TEXT_BOX_XPATH = (
+    ".//*[local-name()='txbxContent'][not(ancestor::*[local-name()='Fallback'])]"
+)
+
+# (tag, text) pairs, the tag being h1-h6, li, p or pre.
+Block = Tuple[str, str]
+
+
+def blocks_to_html(blocks: Iterable[Block]) -> str:
+    """
+    Assemble an HTML document from blocks of text, wrapping runs of list items in ul.
+    """
+    parts = ["<html><body>"]
+    in_list = False
+    for tag, text in blocks:
+        if (tag == "li") != in_list:
+            parts.append("<ul>" if not in_list else "</ul>")
+            in_list = not in_list
+        parts.append(f"<{tag}>{html.escape(text)}</{tag}>")
+    if in_list:
+        parts.append("</ul>")
+    parts.append("</body></html>")
+    return "".join(parts)
+
+
+def text_blocks(text: str) -> List[Block]:
+    """
+    Split text laid out as in a resume into blocks: one per line, bullets as list items
+    and short upper-case lines (SKILLS, EXPERIENCE...) as headings.
+    """
+    blocks = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if BULLET.match(line):
+            blocks.append(("li", BULLET.sub("", line)))
+        elif len(line) <= 40 and line.isupper():
+            blocks.append(("h2", line))
+        else:
+            blocks.append(("p", line))
+    return blocks
+
+
+def markdown_blocks(text: str) -> List[Block]:
+    """
+    Split Markdown into blocks: headings, list items, fenced code and paragraphs, the
+    lines of a paragraph being joined. Inline markup is kept as text.
+    """
+    blocks: List[Block] = []
+    paragraph: List[str] = []
+    fence: Optional[List[str]] = None
+
+    def flush() -> None:
+        if paragraph:
+            blocks.append(("p", " ".join(paragraph)))
+            paragraph.clear()
+
+    for line in text.splitlines():
+        if fence is not None:
+            if line.strip().startswith("```"):
+                blocks.append(("pre", "\n".join(fence)))
+                fence = None
+            else:
+                fence.append(line)
+            continue
+        stripped = line.strip()
+        if stripped.startswith("```"):
+            flush()
+            fence = []
+        elif not stripped:
+            flush()
+        elif heading := HEADING.match(stripped):
+            flush()
+            blocks.append((f"h{len(heading.group(1))}", heading.group(2)))
+        elif BULLET.match(stripped):
+            flush()
+            blocks.append(("li", BULLET.sub("", stripped)))
+        else:
+            paragraph.append(stripped)
+    flush()
+    if fence:
+        blocks.append(("pre", "\n".join(fence)))
+    return blocks
+
+
+def _decode(file: IngestedFile) -> str:
+    return file.read_bytes().decode("utf-8-sig", errors="replace")
+
+
+class HtmlExtractor(IExtractor):
+    """
+    Reads an HTML file as it is.
+    """
+
+    name = "html"
+
+    def extract(self, file: IngestedFile) -> Optional[str]:
+        return _decode(file)
+
+
+class TextExtractor(IExtractor):
+    """
+    Converts plain text, line by line.
+    """
+
+    name = "text"
+
+    def extract(self, file: IngestedFile) -> Optional[str]:
+        return blocks_to_html(text_blocks(_decode(file)))
+
+
+class MarkdownExtractor(IExtractor):
+    """
+    Converts the block structure of Markdown.
+    """
+
+    name = "markdown"
+
+    def extract(self, file: IngestedFile) -> Optional[str]:
+        return blocks_to_html(markdown_blocks(_decode(file)))
+
+
+def docx_blocks(container) -> Iterator[Block]:
+    """
+    Walk the paragraphs and tables of a python-docx document, header or cell in their
+    order, the heading and list styles giving the structure. The content of a text box
+    follows the paragraph it is anchored in.
+    """
+    from docx.oxml.ns import qn
+    from docx.table import Table
+    from docx.text.paragraph import Paragraph
+
+    for item in container.iter_inner_content():
+        if isinstance(item, Table):
+            for row in item.rows:
+                cells = [cell.text.strip() for cell in row.cells]
+                # Merged cells are repeated by python-docx.
+                text = " | ".join(dict.fromkeys(cell for cell in cells if cell))
+                if text:
+                    yield ("p", text)
+            continue
+        block = _paragraph_block(item)
+        if block is not None:
+            yield block
+        for text_box in item._p.xpath(TEXT_BOX_XPATH):
+            for paragraph in text_box.iterchildren(qn("w:p")):
+                block = _paragraph_block(Paragraph(paragraph, item))
+                if block is not None:
+                    yield block
+
+
+def _paragraph_block(paragraph) -> Optional[Block]:
+    text = paragraph.text.strip()
+    if not text:
+        return None
+    style = paragraph.style.name if paragraph.style is not None else ""
+    if style == "Title":
+        return ("h1", text)
+    if style.startswith("Heading") and style[-1:].isdigit():
+        return (f"h{min(int(style[-1]) + 1, 6)}", text)
+    if style.startswith("List") or BULLET.match(text):
+        return ("li", BULLET.sub("", text))
+    return ("p", text)
+
+
+class DocxExtractor(IExtractor):
+    """
+    Reads a DOCX with python-docx: its page headers, which often hold the name and
+    contact of the candidate, then its body, text boxes included. See docx_blocks.
+    Gives up on documents without any text, e.g. a scanned page pasted as an image.
+    """
+
+    name = "python-docx"
+
+    def extract(self, file: IngestedFile) -> Optional[str]:
+        import docx
+
+        with file.open() as f:
+            document = docx.Document(f)
+        headers = []
+        for section in document.sections:
+            if section.different_first_page_header_footer:
+                headers.append(section.first_page_header)
+            headers.append(section.header)
+        # Sections without a header of their own share the previous one.
+        blocks: List[Block] = list(
+            dict.fromkeys(
+                block
+                for header in headers
+                if not header.is_linked_to_previous
+                for block in docx_blocks(header)
+            )
+        )
+        blocks.extend(docx_blocks(document))
+        return blocks_to_html(blocks) if blocks else None
+
+
+class PdfTextExtractor(IExtractor):
+    """
+    Reads the text layer of a PDF with pdfium, which Docling already depends on.
+    Scanned and image-only PDFs, or ones whose text layer is too sparse to be trusted,
+    are left to the next extractor.
+    @attribute min_chars_per_page: The characters a page must hold on average for the
+    text layer to be used.
+    """
+
+    name = "pdfium"
+
+    def __init__(self, min_chars_per_page: int = 200):
+        self.min_chars_per_page = min_chars_per_page
+        # pdfium is not thread-safe, and a resume only takes it milliseconds.
+        self._lock = threading.Lock()
+
+    def extract(self, file: IngestedFile) -> Optional[str]:
+        import pypdfium2
+
+        with self._lock:
+            # Raises on encrypted and malformed files, which Docling then gets.
+            document = pypdfium2.PdfDocument(
+                file.data if file.data is not None else file.path
+            )
+            try:
+                pages = []
+                for page in document:
+                    text_page = page.get_textpage()
+                    pages.append(text_page.get_text_bounded())
+                    text_page.close()
+                    page.close()
+            finally:
+                document.close()
+        characters = sum(len("".join(page.split())) for page in pages)
+        if not pages or characters < self.min_chars_per_page * len(pages):
+            return None
+        return blocks_to_html(text_blocks("\n".join(pages)))
@@ -0,0 +1,97 @@
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Protocol
+from app.extractors.sniff import FileFormat, sniff_format
+from app.observability.metrics import EXTRACTION_DURATION
+from app.utils.file_utils import IngestedFile
+
+logger = logging.getLogger(__name__)
+
+
+class IExtractor(Protocol):
+    """
+    Interface for the extractors converting a resume file to HTML.
+    @attribute name: The name of the extractor, recorded with each extraction.
+    """
+
+    name: str
+
+    def extract(self, file: IngestedFile) -> Optional[str]:
+        """
+        Convert a file to HTML. Runs in a worker thread.
+        @param file: The file, of a format the extractor is registered for.
+        @return: The HTML, or None when the extractor cannot handle this file well
+        enough, to let the next one try.
+        """
+        ...
+
+
+@dataclass
+class Extraction:
+    """
+    The HTML extracted from a file and how it was obtained.
+    @attribute html: The HTML.
+    @attribute extractor: The name of the extractor that produced it.
+    @attribute format: The format sniffed from the file.
+    @attribute seconds: The time taken, sniffing and failed attempts included.
+    """
+
+    html: str
+    extractor: str
+    format: FileFormat
+    seconds: float
+
+
+class ExtractorRegistry:
+    """
+    Routes each file to the cheapest extractor able to handle its format, the format
+    being sniffed from the content rather than trusted from the filename. The
+    extractors of a format are tried in the order they were registered until one
+    returns HTML, then the fallback (Docling, with OCR) is tried.
+    @attribute fallback: The extractor tried last for every format, if any.
+    """
+
+    def __init__(self, fallback: Optional[IExtractor] = None):
+        self.fallback = fallback
+        self._extractors: Dict[FileFormat, List[IExtractor]] = {}
+
+    def register(self, file_format: FileFormat, extractor: IExtractor) -> None:
+        self._extractors.setdefault(file_format, []).append(extractor)
+
+    def extract(self, file: IngestedFile) -> Extraction:
+        """
+        Convert a file with the first extractor of its format that can.
+        @param file: The file to convert.
+        @return: The HTML with the path taken to get it.
+        @raise ValueError: If no extractor handles the file.
+        """
+        start = time.perf_counter()
+        file_format = sniff_format(file)
+        extractors = list(self._extractors.get(file_format, []))
+        if self.fallback is not None:
+            extractors.append(self.fallback)
+        for extractor in extractors:
+            try:
+                html = extractor.extract(file)
+            except Exception as e:
+                # A fast path choking on a malformed file leaves it to the next one.
+                if extractor is self.fallback:
+                    raise
+                logger.warning("%s failed on %s: %s", extractor.name, file.filename, e)
+                continue
+            if html is None:
+                continue
+            seconds = time.perf_counter() - start
+            EXTRACTION_DURATION.labels(extractor.name, file_format.value).observe(
+                seconds
+            )
+            logger.info(
+                "Extracted %s (%s) with %s in %.3fs",
+                file.filename,
+                file_format.value,
+                extractor.name,
+                seconds,
+            )
+            return Extraction(html, extractor.name, file_format, seconds)
+        raise ValueError(f"No extractor could read {file.filename}")
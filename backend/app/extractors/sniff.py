@@ -0,0 +1,75 @@
+import os
+import re
+import zipfile
+from enum import Enum
+from typing import Optional
+from app.utils.file_utils import IngestedFile
+
+# The bytes read to recognise a format.
+SNIFF_SIZE = 4096
+
+MARKDOWN_EXTENSIONS = {".md", ".markdown"}
+# A line that only reads as Markdown: an ATX heading, a list item or a fence.
+MARKDOWN_LINE = re.compile(r"^(#{1,6} \S|[-*+] \S|\d+\. \S|```)", re.MULTILINE)
+
+
+class FileFormat(str, Enum):
+    """
+    The formats told apart by sniff_format, each routed to its own extractors.
+    OTHER covers everything else Docling may read: images, PPTX, XLSX...
+    """
+
+    PDF = "pdf"
+    DOCX = "docx"
+    HTML = "html"
+    MARKDOWN = "markdown"
+    TEXT = "text"
+    OTHER = "other"
+
+
+def sniff_format(file: IngestedFile) -> FileFormat:
+    """
+    Recognise the format of a file from its content, the filename only breaking the tie
+    between Markdown and plain text: an upload named .html may well be a PDF.
+    @param file: The file to recognise.
+    @return: Its format, OTHER when it is not one of the known ones.
+    """
+    head = file.head(SNIFF_SIZE)
+    if b"%PDF-" in head[:1024]:
+        return FileFormat.PDF
+    if head.startswith(b"PK\x03\x04"):
+        return FileFormat.DOCX if _is_docx(file) else FileFormat.OTHER
+    text = _decode(head)
+    if text is None:
+        return FileFormat.OTHER
+    start = text.lstrip().lower()
+    if start.startswith(("<!doctype html", "<html")) or "<body" in start:
+        return FileFormat.HTML
+    extension = os.path.splitext(file.filename)[1].lower()
+    if extension in MARKDOWN_EXTENSIONS or MARKDOWN_LINE.search(text):
+        return FileFormat.MARKDOWN
+    return FileFormat.TEXT
+
+
+def _is_docx(file: IngestedFile) -> bool:
+    try:
+        with file.open() as f, zipfile.ZipFile(f) as archive:
+            return "word/document.xml" in archive.namelist()
+    except zipfile.BadZipFile:
+        return False
+
+
+def _decode(head: bytes) -> Optional[str]:
+    # Text when it is UTF-8 without control characters. The head may end in the
+    # middle of a multi-byte character.
+    if b"\x00" in head:
+        return None
+    for cut in range(4):
+        try:
+            text = head[: len(head) - cut].decode("utf-8-sig")
+        except UnicodeDecodeError:
+            continue
+        if any(ord(c) < 32 and c not in "\t\n\r\f" for c in text):
+            return None
+        return text
+    return None
@@ -1,5 +1,136 @@
-from weasyprint import HTML
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from typing import Any, Deque, Dict, Optional
+from app.observability.tracing import timed_load
+from app.utils.memory import current_rss
+from app.workers.process_pool import WarmProcessPool
 
+# Applied under the stylesheet of every document, which can override it.
+BASE_STYLESHEET = """
+@page { size: A4; margin: 1.5cm; }
+body { font-family: sans-serif; font-size: 11pt; line-height: 1.35; }
+"""
 
-def generate_pdf(revised_html: str, output_path: str):
-    HTML(string=revised_html).write_pdf(output_path)
+# Window over which the render throughput is computed, in seconds.
+THROUGHPUT_WINDOW = 60.0
+
+
+class PdfRenderer:
+    """
+    WeasyPrint state kept warm between renders: the font configuration, whose font
+    discovery is the slow part of a cold render, and the parsed base stylesheets.
+    WeasyPrint is only imported when the first renderer is built.
+    """
+
+    def __init__(self):
+        with timed_load("weasyprint"):
+            from weasyprint import CSS
+            from weasyprint.text.fonts import FontConfiguration
+        with timed_load("weasyprint", "init"):
+            self.font_config = FontConfiguration()
+            self.stylesheets = [
+                CSS(string=BASE_STYLESHEET, font_config=self.font_config)
+            ]
+
+    def render(self, revised_html: str, output_path: str) -> Dict[str, float]:
+        """
+        Render an HTML document to a PDF file.
+        @param revised_html: The HTML content to convert to PDF.
+        @param output_path: The path of the PDF file to write.
+        @return: The duration of the render in seconds.
+        """
+        from weasyprint import HTML
+
+        start = time.perf_counter()
+        HTML(string=revised_html).write_pdf(
+            output_path, stylesheets=self.stylesheets, font_config=self.font_config
+        )
+        return {"seconds": time.perf_counter() - start}
+
+
+@lru_cache
+def get_renderer() -> PdfRenderer:
+    """
+    The renderer of the current process, built on first use.
+    """
+    return PdfRenderer()
+
+
+def render_pdf(
+    renderer: PdfRenderer, revised_html: str, output_path: str
+) -> Dict[str, float]:
+    """
+    Render with the given renderer. Used as the handler of the render pool, whose
+    workers each build their own renderer with get_renderer.
+    """
+    return renderer.render(revised_html, output_path)
+
+
+def generate_pdf(revised_html: str, output_path: str) -> Dict[str, float]:
+    return get_renderer().render(revised_html, output_path)
+
+
+class PdfRenderEngine:
+    """
+    Renders PDFs in a pool of warm worker processes, or in the current process when no
+    pool is given, and measures the throughput and memory of the renders. The peak
+    memory of a render is only known in a pool worker, which runs one render at a time;
+    in the current process the renders, extractions and requests share the high-water
+    mark, so only the resident memory a render leaves behind is reported.
+    @attribute pool: The worker processes running WeasyPrint, or None to run it here.
+    """
+
+    def __init__(self, pool: Optional[WarmProcessPool] = None):
+        self.pool = pool
+        self._lock = threading.Lock()
+        self._completed: Deque[float] = deque()
+        self._renders = 0
+        self._total_seconds = 0.0
+        self._last_rss_growth = 0
+
+    def render(self, revised_html: str, output_path: str) -> None:
+        """
+        Render an HTML document to a PDF file, blocking until it is written.
+        @param revised_html: The HTML content to convert to PDF.
+        @param output_path: The path of the PDF file to write.
+        """
+        rss_growth = None
+        if self.pool is not None:
+            result = self.pool.submit(revised_html, output_path)
+        else:
+            rss_before = current_rss()
+            result = generate_pdf(revised_html, output_path)
+            rss_growth = current_rss() - rss_before
+        now = time.monotonic()
+        with self._lock:
+            self._completed.append(now)
+            self._renders += 1
+            self._total_seconds += result["seconds"]
+            if rss_growth is not None:
+                self._last_rss_growth = rss_growth
+
+    def stats(self) -> Dict[str, Any]:
+        # The peaks are None, unavailable, without a pool; the pool measures them in
+        # its workers.
+        pool = self.pool.stats() if self.pool else None
+        with self._lock:
+            horizon = time.monotonic() - THROUGHPUT_WINDOW
+            while self._completed and self._completed[0] < horizon:
+                self._completed.popleft()
+            return {
+                "renders": self._renders,
+                "renders_per_second": len(self._completed) / THROUGHPUT_WINDOW,
+                "mean_render_seconds": (
+                    self._total_seconds / self._renders if self._renders else 0.0
+                ),
+                "last_peak_rss_bytes": (
+                    pool["last_job_peak_rss_bytes"] if pool else None
+                ),
+                "max_peak_rss_bytes": pool["max_job_peak_rss_bytes"] if pool else None,
+                "last_rss_growth_bytes": (
+                    pool["last_job_rss_growth_bytes"] if pool else self._last_rss_growth
+                ),
+                "pool": pool,
+            }
@@ -1,9 +1,160 @@
+from contextlib import asynccontextmanager
+from functools import partial
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from app.db.session import engine
+from app.dependencies.ai import (
+    get_feedback_cache,
+    get_openai_client,
+    get_prompt_compactor,
+    get_sectioned_generator,
+)
+from app.dependencies.extractors import get_extraction_cache, get_extraction_pool
+from app.dependencies.generators import get_pdf_render_engine
+from app.dependencies.pipeline import get_stage_limiter
+from app.dependencies.services import resume_service_scope
+from app.dependencies.settings import get_settings
+from app.dependencies.storage import get_artifact_store
+from app.extractors.docling_extractor import warm_converter
+from app.generators.pdf_weasy_generator import get_renderer
+from app.observability.metrics import STATS_COLLECTOR
+from app.observability.profiling import RequestMetricsMiddleware
+from app.routes.health import router as health_router
+from app.routes.metrics import router as metrics_router
 from app.routes.resume import router as resume_router
+from app.routes.stats import router as stats_router
+from app.workers.garbage_collector import GarbageCollector
+from app.workers.pipeline import ResumePipeline
+from app.workers.process_pool import WarmProcessPool, enable_prefork
+from app.workers.warmup import Warmup
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    settings = get_settings()
+    extraction_pool = get_extraction_pool()
+    render_pool = get_pdf_render_engine().pool
+    pools = [pool for pool in (extraction_pool, render_pool) if pool]
+    if settings.PREFORK_POOLS:
+        enable_prefork(pools)
+    for pool in pools:
+        pool.start()
+    pipeline = ResumePipeline(
+        partial(resume_service_scope, settings),
+        settings.PIPELINE_WORKERS,
+        settings.PIPELINE_QUEUE_SIZE,
+        settings.BATCH_MAX_CONCURRENCY,
+        settings.ADMISSION_CLIENT_MAX_QUEUED,
+        settings.ADMISSION_CLIENT_MAX_IN_FLIGHT,
+        settings.ADMISSION_CLIENT_WEIGHTS,
+    )
+    pipeline.start()
+    app.state.resume_pipeline = pipeline
+    register_stats(pipeline, *pools)
+    garbage_collector = GarbageCollector(
+        get_artifact_store(), settings.ARTIFACT_GC_INTERVAL
+    )
+    garbage_collector.start()
+    # Nothing heavy is loaded before this point, so the server is up within a second;
+    # /health/ready turns green once the warmup is done.
+    warmup = Warmup(
+        {
+            "extractor": (
+                extraction_pool.wait_ready if extraction_pool else warm_converter
+            ),
+            "extraction_cache": register_extraction_cache,
+            "renderer": render_pool.wait_ready if render_pool else get_renderer,
+        }
+    )
+    warmup.start()
+    app.state.warmup = warmup
+    yield
+    await warmup.shutdown()
+    await garbage_collector.shutdown()
+    await pipeline.shutdown()
+    await get_openai_client().aclose()
+    await engine.dispose()
+    for pool in pools:
+        pool.shutdown()
+
+
+def register_stats(pipeline: ResumePipeline, *pools: WarmProcessPool) -> None:
+    # Exported on /metrics at scrape time, next to the stage spans.
+    STATS_COLLECTOR.register(
+        "pipeline",
+        pipeline.stats,
+        gauges=("queued", "in_flight", "clients", "mean_job_seconds", "workers"),
+    )
+    stage_limiter = get_stage_limiter()
+    STATS_COLLECTOR.register(
+        "stage_limits", stage_limiter.stats, gauges=stage_limiter.stats().keys()
+    )
+    STATS_COLLECTOR.register(
+        "artifacts",
+        get_artifact_store().stats,
+        gauges=("entries", "bytes", "cache_entries", "cache_bytes"),
+    )
+    STATS_COLLECTOR.register("openai", get_openai_client().stats, gauges=("in_flight",))
+    STATS_COLLECTOR.register("prompt_compaction", get_prompt_compactor().stats)
+    sectioned = get_sectioned_generator()
+    if sectioned is not None:
+        STATS_COLLECTOR.register("sectioned_generation", sectioned.stats)
+    STATS_COLLECTOR.register(
+        "feedback_cache",
+        get_feedback_cache().stats,
+        gauges=("entries", "in_flight"),
+        hit_ratio=(("hits", "coalesced"), ("misses",)),
+    )
+    STATS_COLLECTOR.register(
+        "pdf_render",
+        get_pdf_render_engine().stats,
+        gauges=(
+            "renders_per_second",
+            "mean_render_seconds",
+            "last_peak_rss_bytes",
+            "max_peak_rss_bytes",
+            "last_rss_growth_bytes",
+        ),
+    )
+    for pool in pools:
+        STATS_COLLECTOR.register(
+            f"{pool.name.replace('-', '_')}_pool",
+            pool.stats,
+            gauges=(
+                "size",
+                "in_flight",
+                "idle",
+                "last_job_peak_rss_bytes",
+                "max_job_peak_rss_bytes",
+                "last_job_rss_growth_bytes",
+                "last_worker_rss_bytes",
+                "max_worker_rss_bytes",
+            ),
+        )
+
 
-app = FastAPI(title="Resume Builder API", description="API for Resume Builder")
+def register_extraction_cache() -> None:
+    # Part of the warmup: the cache key needs the Docling converter.
+    STATS_COLLECTOR.register(
+        "extraction_cache",
+        get_extraction_cache().stats,
+        gauges=("memory_entries", "disk_bytes"),
+        hit_ratio=(("memory_hits", "disk_hits"), ("misses",)),
+    )
 
+
+app = FastAPI(
+    title="Resume Builder API", description="API for Resume Builder", lifespan=lifespan
+)
+
+settings = get_settings()
+app.add_middleware(
+    RequestMetricsMiddleware,
+    profile=settings.PROFILE_REQUESTS,
+    threshold=settings.PROFILE_THRESHOLD_SECONDS,
+    interval=settings.PROFILE_INTERVAL,
+    output_dir=settings.PROFILE_DIR,
+)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  ##! Change to only accept from the frontend
@@ -13,3 +164,6 @@ app.add_middleware(
 )
 
 app.include_router(resume_router)
+app.include_router(stats_router)
+app.include_router(metrics_router)
+app.include_router(health_router)
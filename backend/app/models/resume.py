@@ -1,26 +1,195 @@
 from datetime import datetime, timezone
+from enum import Enum
 from typing import Optional
+from sqlalchemy import BigInteger, Index, LargeBinary
 from sqlmodel import SQLModel, Field
 
 
+def utc_now() -> datetime:
+    """
+    The current UTC time, naive like the timestamp columns it is stored in.
+    """
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class ResumeStatus(str, Enum):
+    """
+    The processing stages a resume goes through after being uploaded. The PDF is
+    rendered later, on its first download.
+    """
+
+    QUEUED = "queued"
+    EXTRACTING = "extracting"
+    GENERATING = "generating"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class ResumeBatch(SQLModel, table=True):
+    """
+    A group of resumes uploaded together, each file against each job title.
+    @attribute id: The id of the batch.
+    @attribute created_at: The date and time the batch was created, in UTC.
+    """
+
+    __tablename__ = "resume_batch"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    created_at: datetime = Field(default_factory=utc_now)
+
+
 class Resume(SQLModel, table=True):
     """
     The entity representing a resume uploaded and its AI feedback.
     @attribute id: The id of the resume.
-    @attribute created_at: The date and time the resume was created.
+    @attribute created_at: The date and time the resume was created, in UTC.
     @attribute original_filename: The original filename of the resume.
     @attribute job_title: The job title of the resume.
-    @attribute resume_html: The html text extracted from the resume.
+    @attribute status: The current processing stage of the resume (see ResumeStatus).
+    @attribute error: The error message if the processing failed.
     @attribute feedback_text: The feedback text of the resume.
-    @attribute revised_html: The html text of the resume after the feedback.
-    @attribute result_pdf_path: The path to the pdf file of the resume generated by the AI.
+    @attribute revised_html_hash: The SHA-256 of the revised html, set once it is saved in
+    ResumeContent.
+    @attribute result_pdf_path: The key of the pdf file of the resume in the artifact
+    store, set once the PDF has been downloaded for the first time. PDFs are stored
+    under the hash of their revised html, so duplicates share one file.
+    @attribute batch_id: The id of the batch the resume was uploaded in, if any.
+    @attribute source_id: The id of the resume this one was retargeted from, if any. Its
+    extracted html was reused instead of uploading the file again.
+    @attribute extractor: The name of the extractor that produced the html (pdfium,
+    python-docx, markdown, text, html or docling), set once it is extracted.
+    @attribute extraction_seconds: The time the extraction took.
+    @attribute similar_to_id: The id of the most similar resume already processed for
+    the same job title, if one was near enough. Its feedback is a preliminary answer
+    while this one is generated.
+    @attribute similarity: The estimated similarity to that resume, between 0 and 1.
+    @attribute feedback_reused: Whether the feedback and revised html were copied from
+    that resume instead of being generated.
     """
 
+    # The history is paged by (created_at, id). The indexes cover the summary columns
+    # so pages are read from the index alone on PostgreSQL.
+    __table_args__ = (
+        Index(
+            "ix_resume_created_at_id",
+            "created_at",
+            "id",
+            postgresql_include=["original_filename", "job_title", "status"],
+        ),
+        Index(
+            "ix_resume_job_title_created_at_id",
+            "job_title",
+            "created_at",
+            "id",
+            postgresql_include=["original_filename", "status"],
+        ),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    created_at: datetime = Field(default_factory=utc_now)
     original_filename: str
     job_title: Optional[str] = None
-    resume_html: Optional[str] = None
+    status: str = Field(default=ResumeStatus.QUEUED.value)
+    error: Optional[str] = None
     feedback_text: Optional[str] = None
-    revised_html: Optional[str] = None
+    revised_html_hash: Optional[str] = None
     result_pdf_path: Optional[str] = None
+    batch_id: Optional[int] = Field(
+        default=None, foreign_key="resume_batch.id", index=True
+    )
+    source_id: Optional[int] = Field(default=None, foreign_key="resume.id", index=True)
+    extractor: Optional[str] = None
+    extraction_seconds: Optional[float] = None
+    similar_to_id: Optional[int] = Field(default=None, foreign_key="resume.id")
+    similarity: Optional[float] = None
+    feedback_reused: bool = False
+
+
+class ResumeSummary(SQLModel):
+    """
+    The metadata of a resume listed in the history.
+    @attribute id: The id of the resume.
+    @attribute created_at: The date and time the resume was created.
+    @attribute original_filename: The original filename of the resume.
+    @attribute job_title: The job title of the resume.
+    @attribute status: The current processing stage of the resume (see ResumeStatus).
+    """
+
+    id: int
+    created_at: datetime
+    original_filename: str
+    job_title: Optional[str] = None
+    status: str
+
+
+class ResumeContent(SQLModel, table=True):
+    """
+    The html payloads of a resume, zstd-compressed and kept apart from the resume table
+    so reading the metadata of a resume never loads them.
+    @attribute resume_id: The id of the resume.
+    @attribute resume_html: The compressed html text extracted from the resume.
+    @attribute revised_html: The compressed html text of the resume after the feedback.
+    """
+
+    __tablename__ = "resume_content"
+
+    resume_id: int = Field(
+        foreign_key="resume.id", primary_key=True, ondelete="CASCADE"
+    )
+    resume_html: Optional[bytes] = Field(default=None, sa_type=LargeBinary)
+    revised_html: Optional[bytes] = Field(default=None, sa_type=LargeBinary)
+
+
+class ResumeHtml(SQLModel):
+    """
+    The decompressed html payloads of a resume.
+    @attribute resume_html: The html text extracted from the resume.
+    @attribute revised_html: The html text of the resume after the feedback.
+    """
+
+    resume_html: Optional[str] = None
+    revised_html: Optional[str] = None
+
+
+class ResumeSignature(SQLModel, table=True):
+    """
+    The MinHash signature of the html extracted from a resume whose feedback was
+    generated, to find the near duplicates of later uploads.
+    @attribute resume_id: The id of the resume.
+    @attribute job_title: The normalized job title of the resume.
+    @attribute created_at: The date and time the signature was saved, in UTC.
+    @attribute signature: The packed signature (see app.ai.similarity).
+    """
+
+    __tablename__ = "resume_signature"
+
+    resume_id: int = Field(
+        foreign_key="resume.id", primary_key=True, ondelete="CASCADE"
+    )
+    job_title: str
+    created_at: datetime = Field(default_factory=utc_now)
+    signature: bytes = Field(sa_type=LargeBinary)
+
+
+class ResumeSignatureBand(SQLModel, table=True):
+    """
+    One LSH bucket of a signature. The resumes sharing a bucket with a new one are its
+    candidate near duplicates.
+    @attribute resume_id: The id of the resume.
+    @attribute band: The index of the band in the signature.
+    @attribute job_title: The normalized job title of the resume, so lookups stay
+    within a job title.
+    @attribute bucket: The hash of the band.
+    """
+
+    __tablename__ = "resume_signature_band"
+    __table_args__ = (
+        Index("ix_resume_signature_band_job_title_bucket", "job_title", "bucket"),
+    )
+
+    resume_id: int = Field(
+        foreign_key="resume.id", primary_key=True, ondelete="CASCADE"
+    )
+    band: int = Field(primary_key=True)
+    job_title: str
+    bucket: int = Field(sa_type=BigInteger)
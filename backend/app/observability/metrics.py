@@ -0,0 +1,164 @@
+from typing import Any, Callable, Dict, Iterable, Iterator, Tuple
+from prometheus_client import REGISTRY, Counter, Gauge, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+NAMESPACE = "resume_builder"
+
+# From a fast cache hit to a slow Docling conversion or OpenAI call.
+STAGE_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    20,
+    40,
+    60,
+    120,
+)
+
+STAGE_DURATION = Histogram(
+    "stage_duration_seconds",
+    "Duration of the processing stages, by outcome.",
+    ["stage", "outcome"],
+    namespace=NAMESPACE,
+    buckets=STAGE_BUCKETS,
+)
+STAGE_IN_FLIGHT = Gauge(
+    "stage_in_flight",
+    "Processing stages currently running.",
+    ["stage"],
+    namespace=NAMESPACE,
+)
+STAGE_ERRORS = Counter(
+    "stage_errors",
+    "Failed processing stages, by error type.",
+    ["stage", "error"],
+    namespace=NAMESPACE,
+)
+EXTRACTION_FALLBACKS = Counter(
+    "extraction_fallbacks",
+    "Docling conversions that failed and fell back to the raw content of the file.",
+    namespace=NAMESPACE,
+)
+EXTRACTION_DURATION = Histogram(
+    "extraction_duration_seconds",
+    "Time taken to extract the HTML of a file, by extractor and sniffed format.",
+    ["extractor", "format"],
+    buckets=STAGE_BUCKETS,
+    namespace=NAMESPACE,
+)
+LOAD_DURATION = Gauge(
+    "load_seconds",
+    "Time this process took to import or initialize a heavy subsystem.",
+    ["subsystem", "phase"],
+    namespace=NAMESPACE,
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Duration of the HTTP requests, response body included.",
+    ["method", "route", "status"],
+    namespace=NAMESPACE,
+    buckets=STAGE_BUCKETS,
+)
+ADMISSION_WAIT = Histogram(
+    "admission_wait_seconds",
+    "Time the pipeline jobs waited in the fair queue before a worker took them.",
+    namespace=NAMESPACE,
+    buckets=STAGE_BUCKETS,
+)
+ADMISSION_REJECTIONS = Counter(
+    "admission_rejections",
+    "Jobs refused with a 429 because a queue was full, by queue.",
+    ["reason"],
+    namespace=NAMESPACE,
+)
+STAGE_SLOT_WAIT = Histogram(
+    "stage_slot_wait_seconds",
+    "Time waited for a slot of a stage capped in flight.",
+    ["stage"],
+    namespace=NAMESPACE,
+    buckets=STAGE_BUCKETS,
+)
+
+# From a small render to a Docling conversion of a long scanned document.
+MEMORY_BUCKETS = tuple(
+    2**20 * mib for mib in (64, 128, 256, 512, 1024, 2048, 4096, 8192)
+)
+WORKER_JOB_PEAK_RSS = Histogram(
+    "worker_job_peak_rss_bytes",
+    "Peak resident memory of the pool workers while running a job, by pool.",
+    ["pool"],
+    namespace=NAMESPACE,
+    buckets=MEMORY_BUCKETS,
+)
+WORKER_RECYCLES = Counter(
+    "worker_recycles",
+    "Pool workers replaced between two jobs, by pool and limit reached.",
+    ["pool", "reason"],
+    namespace=NAMESPACE,
+)
+
+
+class StatsCollector(Collector):
+    """
+    Exports the stats() of the long-lived components (AI client, caches, process
+    pools...) at scrape time, so their counters are not kept twice.
+    """
+
+    def __init__(self):
+        self._sources: Dict[str, Tuple[Callable[[], Dict[str, Any]], set, tuple]] = {}
+
+    def register(
+        self,
+        name: str,
+        stats: Callable[[], Dict[str, Any]],
+        gauges: Iterable[str] = (),
+        hit_ratio: Tuple[Iterable[str], Iterable[str]] = ((), ()),
+    ) -> None:
+        """
+        Export the stats of a component, replacing any registered under the same name.
+        @param name: The name of the component, prefixing its metrics.
+        @param stats: Returns the current stats of the component. Non-numeric values
+        are skipped.
+        @param gauges: The stats that can go down. The others are exported as counters.
+        @param hit_ratio: The stats counting the hits and the ones counting the misses,
+        to also export their ratio.
+        """
+        hits, misses = hit_ratio
+        self._sources[name] = (stats, set(gauges), (tuple(hits), tuple(misses)))
+
+    def collect(self) -> Iterator:
+        for name, (stats, gauges, (hits, misses)) in list(self._sources.items()):
+            values = {
+                key: value
+                for key, value in stats().items()
+                if isinstance(value, (int, float)) and not isinstance(value, bool)
+            }
+            for key, value in values.items():
+                metric = f"{NAMESPACE}_{name}_{key}"
+                if key in gauges:
+                    family = GaugeMetricFamily(metric, f"{name} {key}.")
+                else:
+                    family = CounterMetricFamily(metric, f"{name} {key}.")
+                family.add_metric([], value)
+                yield family
+            if hits:
+                hit_count = sum(values.get(key, 0) for key in hits)
+                total = hit_count + sum(values.get(key, 0) for key in misses)
+                family = GaugeMetricFamily(
+                    f"{NAMESPACE}_{name}_hit_ratio", f"{name} hit ratio."
+                )
+                family.add_metric([], hit_count / total if total else 0.0)
+                yield family
+
+
+STATS_COLLECTOR = StatsCollector()
+REGISTRY.register(STATS_COLLECTOR)
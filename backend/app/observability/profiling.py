@@ -0,0 +1,98 @@
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Optional
+from app.observability.metrics import HTTP_REQUEST_DURATION
+
+logger = logging.getLogger(__name__)
+
+
+class RequestMetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request, streamed bodies included, by route
+    template and status. When profiling is enabled, each request also runs under a
+    sampling profiler (pyinstrument) following its awaits; requests slower than the
+    threshold get their profile dumped as a speedscope flamegraph.
+    @attribute app: The wrapped ASGI application.
+    @attribute profile: Whether the requests are profiled.
+    @attribute threshold: The duration in seconds from which a profile is dumped.
+    @attribute interval: The sampling interval of the profiler, in seconds.
+    @attribute output_dir: The directory the flamegraphs are written to.
+    """
+
+    def __init__(
+        self,
+        app,
+        profile: bool = False,
+        threshold: float = 5.0,
+        interval: float = 0.001,
+        output_dir: str = "profiles",
+    ):
+        self.app = app
+        self.threshold = threshold
+        self.interval = interval
+        self.output_dir = output_dir
+        self.profile = profile and self._profiler_available()
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+
+        async def send_with_status(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        profiler = self._start_profiler() if self.profile else None
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            duration = time.perf_counter() - start
+            # The route template, not the path, keeps the label set bounded.
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_DURATION.labels(scope["method"], route, str(status)).observe(
+                duration
+            )
+            if profiler is not None:
+                self._finish_profiler(profiler, duration, scope["method"], route)
+
+    def _profiler_available(self) -> bool:
+        try:
+            import pyinstrument  # noqa: F401
+        except ImportError:
+            logger.warning("Request profiling is disabled: pyinstrument is missing")
+            return False
+        return True
+
+    def _start_profiler(self) -> Any:
+        from pyinstrument import Profiler
+
+        profiler = Profiler(interval=self.interval, async_mode="enabled")
+        profiler.start()
+        return profiler
+
+    def _finish_profiler(
+        self, profiler: Any, duration: float, method: str, route: str
+    ) -> Optional[str]:
+        profiler.stop()
+        if duration < self.threshold:
+            return None
+        from pyinstrument.renderers import SpeedscopeRenderer
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S.%f")
+        name = route.strip("/").replace("/", "_").replace("{", "").replace("}", "")
+        path = os.path.join(
+            self.output_dir, f"{timestamp}-{method}-{name or 'root'}.speedscope.json"
+        )
+        with open(path, "w") as f:
+            f.write(profiler.output(renderer=SpeedscopeRenderer()))
+        logger.warning(
+            "%s %s took %.2fs, profile written to %s", method, route, duration, path
+        )
+        return path
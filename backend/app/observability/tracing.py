@@ -0,0 +1,119 @@
+import functools
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Dict, Iterator, Optional, Tuple, TypeVar
+from app.observability.metrics import (
+    LOAD_DURATION,
+    STAGE_DURATION,
+    STAGE_ERRORS,
+    STAGE_IN_FLIGHT,
+)
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Stages slower than this are logged as warnings instead of at the info level.
+SLOW_STAGE_SECONDS = 10.0
+
+_resume_ids: ContextVar[Tuple[int, ...]] = ContextVar("resume_ids", default=())
+_stages: ContextVar[Tuple[str, ...]] = ContextVar("stages", default=())
+_load_times: Dict[str, float] = {}
+
+
+@contextmanager
+def resume_context(*resume_ids: int) -> Iterator[None]:
+    """
+    Attach the ids of the resumes being processed to the spans opened inside.
+    Context variables follow the awaits, tasks and asyncio.to_thread calls made within.
+    @param resume_ids: The ids of the resumes.
+    """
+    token = _resume_ids.set(resume_ids)
+    try:
+        yield
+    finally:
+        _resume_ids.reset(token)
+
+
+def current_resume_ids() -> Tuple[int, ...]:
+    return _resume_ids.get()
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """
+    Time a stage: its duration goes to the stage histogram with its outcome, it counts
+    as in flight while running, its errors are counted by type, and it is logged with
+    the resume ids of the context and the stages it is nested in.
+    @param stage: The name of the stage.
+    """
+    token = _stages.set(_stages.get() + (stage,))
+    STAGE_IN_FLIGHT.labels(stage).inc()
+    start = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException as e:
+        outcome = "error"
+        STAGE_ERRORS.labels(stage, type(e).__name__).inc()
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        STAGE_IN_FLIGHT.labels(stage).dec()
+        STAGE_DURATION.labels(stage, outcome).observe(duration)
+        path = "/".join(_stages.get())
+        _stages.reset(token)
+        logger.log(
+            logging.WARNING if duration >= SLOW_STAGE_SECONDS else logging.INFO,
+            "stage=%s resume_ids=%s duration=%.3fs outcome=%s",
+            path,
+            ",".join(map(str, _resume_ids.get())) or "-",
+            duration,
+            outcome,
+        )
+
+
+def traced(
+    stage: Optional[str] = None,
+) -> Callable[[Callable[..., Awaitable[T]]], Callable[..., Awaitable[T]]]:
+    """
+    Decorate a coroutine function to run it in a span.
+    @param stage: The name of the span, the name of the function by default.
+    """
+
+    def decorator(function: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+        name = stage or function.__name__
+
+        @functools.wraps(function)
+        async def wrapper(*args, **kwargs) -> T:
+            with span(name):
+                return await function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+@contextmanager
+def timed_load(subsystem: str, phase: str = "import") -> Iterator[None]:
+    """
+    Time the loading of a heavy subsystem (importing Docling, loading its models...),
+    which happens once per process, to keep track of what the cold start costs.
+    @param subsystem: The name of the subsystem.
+    @param phase: What is being loaded, e.g. import, init or models.
+    """
+    start = time.perf_counter()
+    yield
+    duration = time.perf_counter() - start
+    LOAD_DURATION.labels(subsystem, phase).set(duration)
+    _load_times[f"{subsystem}.{phase}"] = duration
+    logger.info("Loaded %s (%s) in %.2fs", subsystem, phase, duration)
+
+
+def load_times() -> Dict[str, float]:
+    """
+    The loading times measured by timed_load in this process, in seconds.
+    """
+    return dict(_load_times)
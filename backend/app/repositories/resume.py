@@ -1,6 +1,19 @@
-from typing import Dict, Protocol, Optional
-from sqlmodel import Session, select
-from app.models.resume import Resume
+from datetime import datetime
+from typing import Dict, List, Protocol, Optional, Tuple
+from sqlalchemy import tuple_, update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.db.compression import compress_text, decompress_text, text_digest
+from app.models.resume import (
+    Resume,
+    ResumeBatch,
+    ResumeContent,
+    ResumeHtml,
+    ResumeSignature,
+    ResumeSignatureBand,
+    ResumeSummary,
+)
+from app.observability.tracing import traced
 
 
 class IResumeRepository(Protocol):
@@ -8,7 +21,7 @@ class IResumeRepository(Protocol):
     Interface for the resume repository.
     """
 
-    def create(self, resume: Resume) -> Resume:
+    async def create(self, resume: Resume) -> Resume:
         """
         Persist a new resume in the database and return the saved instace.
         @param resume: The resume to save.
@@ -16,7 +29,42 @@ class IResumeRepository(Protocol):
         """
         ...
 
-    def get_by_id(self, resume_id: int) -> Optional[Resume]:
+    async def create_batch(
+        self, batch: ResumeBatch, resumes: List[Resume]
+    ) -> List[Resume]:
+        """
+        Persist a new batch and its resumes.
+        @param batch: The batch to save.
+        @param resumes: The resumes of the batch, linked to it once it is saved.
+        @return: The saved resumes.
+        """
+        ...
+
+    async def get_batch(self, batch_id: int) -> Optional[ResumeBatch]:
+        """
+        Retrieve a batch by its id.
+        @param batch_id: The id of the batch.
+        @return: The batch, or None if not found.
+        """
+        ...
+
+    async def list_batch(self, batch_id: int) -> List[Resume]:
+        """
+        Retrieve the resumes of a batch.
+        @param batch_id: The id of the batch.
+        @return: The resumes of the batch, in creation order.
+        """
+        ...
+
+    async def update_many(self, resume_in: Resume, resume_ids: List[int]) -> None:
+        """
+        Update the same fields of several resumes.
+        @param resume_in: The resume with the updated fields.
+        @param resume_ids: The ids of the resumes to update.
+        """
+        ...
+
+    async def get_by_id(self, resume_id: int) -> Optional[Resume]:
         """
         Retrieve a resume by its id.
         @param resume_id: The id of the resume to get.
@@ -24,44 +72,248 @@ class IResumeRepository(Protocol):
         """
         ...
 
-    def update(self, resume_in: Resume, resume_id: int) -> Optional[Resume]:
+    async def list(
+        self,
+        limit: int,
+        after: Optional[Tuple[datetime, int]] = None,
+        job_title: Optional[str] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+    ) -> List[ResumeSummary]:
+        """
+        List the resumes from the newest, one page at a time.
+        @param limit: The maximum number of resumes to return.
+        @param after: The (created_at, id) of the last resume of the previous page, or
+        None for the first page.
+        @param job_title: Only list the resumes for this job title.
+        @param created_from: Only list the resumes created at or after this time.
+        @param created_to: Only list the resumes created before this time.
+        @return: The summaries of the resumes, newest first.
         """
-        Update the fields of a resume.
+        ...
+
+    async def get_html(self, resume_id: int) -> Optional[ResumeHtml]:
+        """
+        Retrieve the html payloads of a resume.
+        @param resume_id: The id of the resume.
+        @return: The decompressed html, or None if none was saved for the resume.
+        """
+        ...
+
+    async def update(
+        self, resume_in: Resume, resume_id: int, html: Optional[ResumeHtml] = None
+    ) -> Optional[Resume]:
+        """
+        Update the fields of a resume, and optionally save its html payloads along with
+        them.
         @param resume_in: The resume with the updated fields.
         @param resume_id: The id of the resume to update.
+        @param html: The html payloads to save, or None to leave them unchanged.
         @return: The updated resume or None if the resume was not found.
         """
         ...
 
+    async def save_signature(
+        self, signature: ResumeSignature, bands: List[ResumeSignatureBand]
+    ) -> None:
+        """
+        Persist the signature of a resume and its LSH buckets.
+        @param signature: The signature to save.
+        @param bands: Its buckets, one per band.
+        """
+        ...
+
+    async def find_similar(
+        self, job_title: str, buckets: List[int], since: datetime, limit: int = 20
+    ) -> List[Tuple[int, bytes]]:
+        """
+        Find the resumes sharing at least one LSH bucket with a signature.
+        @param job_title: The normalized job title the resumes must have.
+        @param buckets: The buckets of the signature.
+        @param since: Only the signatures saved at or after this time are returned.
+        @param limit: The maximum number of resumes to return.
+        @return: The (resume id, packed signature) pairs, newest first.
+        """
+        ...
+
 
 class ResumeRepository(IResumeRepository):
     """
     Concrete implementation of IResumeRepository using SQLModel / SQLAlchemy.
-    @attribute db: The SQLModel session.
+    Every write is a single statement in its own transaction, apart from the html
+    payloads, which are saved in the transaction of the update they come with. Every
+    call is timed in a db.<method> span.
+    @attribute db: The async SQLModel session, which must not expire on commit.
+    @attribute compression_level: The zstd level the html payloads are compressed with.
     """
 
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession, compression_level: int = 3):
         self.db = db
+        self.compression_level = compression_level
 
-    def create(self, resume: Resume) -> Resume:
+    @traced("db.create")
+    async def create(self, resume: Resume) -> Resume:
+        # The id comes back from the INSERT and the other columns have Python-side
+        # defaults, so the instance needs no refresh.
         self.db.add(resume)
-        self.db.commit()
-        self.db.refresh(resume)
+        await self.db.commit()
         return resume
 
-    def get_by_id(self, resume_id: int) -> Optional[Resume]:
-        return self.db.get(Resume, resume_id)
+    @traced("db.create_batch")
+    async def create_batch(
+        self, batch: ResumeBatch, resumes: List[Resume]
+    ) -> List[Resume]:
+        # The batch is flushed for its id, then the resumes go in as one multi-row
+        # INSERT, all in one transaction.
+        self.db.add(batch)
+        await self.db.flush()
+        for resume in resumes:
+            resume.batch_id = batch.id
+        self.db.add_all(resumes)
+        await self.db.commit()
+        return resumes
+
+    @traced("db.get_batch")
+    async def get_batch(self, batch_id: int) -> Optional[ResumeBatch]:
+        return await self.db.get(ResumeBatch, batch_id)
 
-    def update(self, resume_in: Resume, resume_id: int) -> Optional[Resume]:
-        resume = self.db.get(Resume, resume_id)
-        if not resume:
+    @traced("db.list_batch")
+    async def list_batch(self, batch_id: int) -> List[Resume]:
+        result = await self.db.exec(
+            select(Resume).where(Resume.batch_id == batch_id).order_by(Resume.id)
+        )
+        return list(result.all())
+
+    @traced("db.update_many")
+    async def update_many(self, resume_in: Resume, resume_ids: List[int]) -> None:
+        update_data: Dict = resume_in.model_dump(exclude_unset=True)
+        update_data.pop("id", None)
+        update_data.pop("created_at", None)
+        if not update_data or not resume_ids:
+            return
+        await self.db.exec(
+            update(Resume)
+            .where(Resume.id.in_(resume_ids))
+            .values(**update_data)
+            .execution_options(synchronize_session=False)
+        )
+        await self.db.commit()
+
+    @traced("db.get_by_id")
+    async def get_by_id(self, resume_id: int) -> Optional[Resume]:
+        return await self.db.get(Resume, resume_id)
+
+    @traced("db.list")
+    async def list(
+        self,
+        limit: int,
+        after: Optional[Tuple[datetime, int]] = None,
+        job_title: Optional[str] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+    ) -> List[ResumeSummary]:
+        # Keyset pagination: the page starts right after the previous one in the
+        # (created_at, id) index, so its cost does not grow with the page number as it
+        # does with OFFSET.
+        statement = select(
+            Resume.id,
+            Resume.created_at,
+            Resume.original_filename,
+            Resume.job_title,
+            Resume.status,
+        )
+        if after is not None:
+            statement = statement.where(tuple_(Resume.created_at, Resume.id) < after)
+        if job_title is not None:
+            statement = statement.where(Resume.job_title == job_title)
+        if created_from is not None:
+            statement = statement.where(Resume.created_at >= created_from)
+        if created_to is not None:
+            statement = statement.where(Resume.created_at < created_to)
+        statement = statement.order_by(
+            Resume.created_at.desc(), Resume.id.desc()
+        ).limit(limit)
+        result = await self.db.exec(statement)
+        return [ResumeSummary(**row._asdict()) for row in result]
+
+    @traced("db.get_html")
+    async def get_html(self, resume_id: int) -> Optional[ResumeHtml]:
+        content = await self.db.get(ResumeContent, resume_id)
+        if not content:
             return None
-        update_data = resume_in.model_dump(exclude_unset=True)
+        return ResumeHtml(
+            resume_html=decompress_text(content.resume_html),
+            revised_html=decompress_text(content.revised_html),
+        )
+
+    @traced("db.update")
+    async def update(
+        self, resume_in: Resume, resume_id: int, html: Optional[ResumeHtml] = None
+    ) -> Optional[Resume]:
+        update_data: Dict = resume_in.model_dump(exclude_unset=True)
         update_data.pop("id", None)
         update_data.pop("created_at", None)
-        for field, value in update_data.items():
-            setattr(resume, field, value)
-        self.db.add(resume)
-        self.db.commit()
-        self.db.refresh(resume)
+        if html is not None and html.revised_html:
+            update_data["revised_html_hash"] = text_digest(html.revised_html)
+        if update_data:
+            # UPDATE ... RETURNING instead of a SELECT, an UPDATE and a refresh.
+            result = await self.db.exec(
+                update(Resume)
+                .where(Resume.id == resume_id)
+                .values(**update_data)
+                .returning(Resume)
+                .execution_options(populate_existing=True)
+            )
+            resume = result.scalar_one_or_none()
+        else:
+            resume = await self.get_by_id(resume_id)
+        if resume is None:
+            await self.db.rollback()
+            return None
+        if html is not None:
+            content = await self.db.merge(
+                ResumeContent(
+                    resume_id=resume_id,
+                    resume_html=compress_text(html.resume_html, self.compression_level),
+                    revised_html=compress_text(
+                        html.revised_html, self.compression_level
+                    ),
+                )
+            )
+        await self.db.commit()
+        if html is not None:
+            # The compressed payloads are not needed once written.
+            self.db.expunge(content)
         return resume
+
+    @traced("db.save_signature")
+    async def save_signature(
+        self, signature: ResumeSignature, bands: List[ResumeSignatureBand]
+    ) -> None:
+        self.db.add(signature)
+        self.db.add_all(bands)
+        await self.db.commit()
+        # Only written, never read back from the session.
+        self.db.expunge(signature)
+        for band in bands:
+            self.db.expunge(band)
+
+    @traced("db.find_similar")
+    async def find_similar(
+        self, job_title: str, buckets: List[int], since: datetime, limit: int = 20
+    ) -> List[Tuple[int, bytes]]:
+        # The buckets are looked up in the (job_title, bucket) index; only the
+        # signatures of the matching resumes are read.
+        candidates = (
+            select(ResumeSignatureBand.resume_id)
+            .where(ResumeSignatureBand.job_title == job_title)
+            .where(ResumeSignatureBand.bucket.in_(buckets))
+        )
+        result = await self.db.exec(
+            select(ResumeSignature.resume_id, ResumeSignature.signature)
+            .where(ResumeSignature.resume_id.in_(candidates))
+            .where(ResumeSignature.created_at >= since)
+            .order_by(ResumeSignature.created_at.desc())
+            .limit(limit)
+        )
+        return [(row.resume_id, row.signature) for row in result]
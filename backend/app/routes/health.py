@@ -0,0 +1,25 @@
+from fastapi import APIRouter, Response
+from app.dependencies.warmup import WarmupDep
+from app.observability.tracing import load_times
+
+router = APIRouter(prefix="/health", tags=["health"])
+
+
+@router.get("")
+async def live():
+    # Liveness: the event loop answers, whatever the state of the warmup.
+    return {"status": "ok"}
+
+
+@router.get("/ready")
+async def ready(warmup: WarmupDep, response: Response):
+    """
+    Readiness: 503 until the extractor and the renderer are warm.
+    """
+    if not warmup.ready:
+        response.status_code = 503
+    return {
+        "ready": warmup.ready,
+        "components": warmup.status,
+        "load_seconds": load_times(),
+    }
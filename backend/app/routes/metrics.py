@@ -0,0 +1,10 @@
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", include_in_schema=False)
+def get_metrics() -> Response:
+    # Sync, so the scrape runs in the threadpool instead of blocking the event loop.
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
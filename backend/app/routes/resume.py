@@ -1,48 +1,427 @@
+import base64
+import binascii
+import gzip
+import json
 import os
-from app.dependencies.services import ResumeServiceDep
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Literal, Optional, Tuple
+from app.dependencies.pipeline import ClientIdDep, ResumePipelineDep
+from app.dependencies.services import ResumeServiceDep, resume_service_scope
 from app.dependencies.settings import SettingsDep
-from fastapi import APIRouter, File, Form, HTTPException, UploadFile
-from app.utils.file_utils import store_temp_file
+from app.models.resume import ResumeStatus
+from fastapi import (
+    APIRouter,
+    File,
+    Form,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    UploadFile,
+)
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from app.utils.file_utils import IngestedFile, UploadTooLargeError, ingest_upload
+from app.workers.admission import AdmissionError
+from app.workers.pipeline import (
+    BatchPipelineJob,
+    PipelineJob,
+    RetargetPipelineJob,
+)
 
 router = APIRouter(prefix="/resumes", tags=["resumes"])
 
 
-@router.post("", response_model=int | None)
+def _admission_error(e: AdmissionError) -> HTTPException:
+    # 429 when a retry can succeed later, 422 when the request can never be admitted.
+    if e.retry_after is None:
+        return HTTPException(422, str(e))
+    return HTTPException(429, str(e), headers={"Retry-After": str(e.retry_after)})
+
+
+@router.post("", response_model=int, status_code=202)
 async def upload_resume(
     service: ResumeServiceDep,
+    pipeline: ResumePipelineDep,
     settings: SettingsDep,
+    client: ClientIdDep,
     file: UploadFile = File(...),
     job_title: str = Form(...),
 ):
-    temp = store_temp_file(file, settings)
+    """
+    Upload a resume to be processed in the background. Answers 429 with a Retry-After
+    header when the pipeline, or the share of it left to the client, is full.
+    """
+    try:
+        pipeline.admit(client)
+    except AdmissionError as e:
+        raise _admission_error(e)
     try:
-        resume = service.upload(temp, file.filename, job_title)
-        return resume.id
+        upload = await ingest_upload(file, settings)
+    except UploadTooLargeError as e:
+        raise HTTPException(413, str(e))
+    try:
+        resume = await service.create_initial(file.filename, job_title)
     except Exception as e:
+        upload.discard()
         raise HTTPException(500, str(e))
-    finally:
-        if os.path.exists(temp):
-            os.remove(temp)
+    try:
+        pipeline.submit(PipelineJob(resume.id, upload, job_title), client)
+    except AdmissionError as e:
+        upload.discard()
+        await service.mark_failed(resume.id, str(e))
+        raise _admission_error(e)
+    return resume.id
+
+
+@router.post("/batches", status_code=202)
+async def upload_batch(
+    service: ResumeServiceDep,
+    pipeline: ResumePipelineDep,
+    settings: SettingsDep,
+    client: ClientIdDep,
+    files: List[UploadFile] = File(...),
+    job_titles: List[str] = Form(...),
+):
+    """
+    Upload several resumes, each against several job titles. Every file is extracted
+    once, files with the same content included, and its feedbacks are generated
+    concurrently. Poll `GET /resumes/batches/{batch_id}` for the progress. A batch
+    of more distinct files than a client may have queued (ADMISSION_CLIENT_MAX_QUEUED)
+    is refused with 422, as no retry could admit it.
+    """
+    job_titles = list(dict.fromkeys(title.strip() for title in job_titles))
+    job_titles = [title for title in job_titles if title]
+    if not job_titles:
+        raise HTTPException(422, "At least one job title is required")
+    if len(files) > settings.BATCH_MAX_FILES:
+        raise HTTPException(
+            422, f"Batches are limited to {settings.BATCH_MAX_FILES} files"
+        )
+    if len(job_titles) > settings.BATCH_MAX_JOB_TITLES:
+        raise HTTPException(
+            422, f"Batches are limited to {settings.BATCH_MAX_JOB_TITLES} job titles"
+        )
+    try:
+        pipeline.admit(client)
+    except AdmissionError as e:
+        raise _admission_error(e)
+
+    uploads: List[IngestedFile] = []
+    try:
+        for file in files:
+            uploads.append(await ingest_upload(file, settings))
+    except UploadTooLargeError as e:
+        for upload in uploads:
+            upload.discard()
+        raise HTTPException(413, str(e))
+    # One pipeline job per distinct content; the copies are only kept for their names.
+    distinct: Dict[str, IngestedFile] = {}
+    for upload in uploads:
+        if upload.content_hash in distinct:
+            upload.discard()
+        else:
+            distinct[upload.content_hash] = upload
+    try:
+        pipeline.admit(client, len(distinct))
+    except AdmissionError as e:
+        for upload in distinct.values():
+            upload.discard()
+        raise _admission_error(e)
+
+    try:
+        batch, resumes = await service.create_batch(uploads, job_titles)
+    except Exception as e:
+        for upload in distinct.values():
+            upload.discard()
+        raise HTTPException(500, str(e))
+    targets: Dict[str, List[Tuple[int, str]]] = defaultdict(list)
+    pairs = ((upload, job_title) for upload in uploads for job_title in job_titles)
+    for resume, (upload, job_title) in zip(resumes, pairs):
+        targets[upload.content_hash].append((resume.id, job_title))
+    for content_hash, upload in distinct.items():
+        try:
+            pipeline.submit(BatchPipelineJob(upload, targets[content_hash]), client)
+        except AdmissionError as e:
+            upload.discard()
+            for resume_id, _ in targets[content_hash]:
+                await service.mark_failed(resume_id, str(e))
+
+    return {
+        "batch_id": batch.id,
+        "items": [
+            {
+                "id": resume.id,
+                "original_filename": resume.original_filename,
+                "job_title": resume.job_title,
+            }
+            for resume in resumes
+        ],
+    }
+
+
+@router.get("/batches/{batch_id}")
+async def get_batch(batch_id: int, service: ResumeServiceDep):
+    found = await service.get_batch(batch_id)
+    if not found:
+        raise HTTPException(404, "Batch not found")
+    batch, resumes = found
+    return {
+        "batch_id": batch.id,
+        "created_at": batch.created_at.isoformat(),
+        "total": len(resumes),
+        "counts": Counter(resume.status for resume in resumes),
+        "items": [
+            {
+                "id": resume.id,
+                "status": resume.status,
+                "error": resume.error,
+                "original_filename": resume.original_filename,
+                "job_title": resume.job_title,
+                "download_url": f"/resumes/{resume.id}/download",
+            }
+            for resume in resumes
+        ],
+    }
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/stream")
+async def upload_resume_stream(
+    settings: SettingsDep,
+    pipeline: ResumePipelineDep,
+    client: ClientIdDep,
+    file: UploadFile = File(...),
+    job_title: str = Form(...),
+):
+    """
+    Upload a resume and follow its processing as Server-Sent Events: `created` with the
+    resume id, `feedback` with each chunk of the feedback text as it is generated, then
+    `done` once the result is saved, or `error`. The processing runs in the request,
+    not in the pipeline, but holds one of the client's in-flight slots of the pipeline
+    for as long as it streams, and is refused like an upload when they are all taken.
+    """
+    try:
+        pipeline.admit(client)
+        release = pipeline.hold(client)
+    except AdmissionError as e:
+        raise _admission_error(e)
+    try:
+        upload = await ingest_upload(file, settings)
+    except UploadTooLargeError as e:
+        release()
+        raise HTTPException(413, str(e))
+    except BaseException:
+        release()
+        raise
+
+    async def events():
+        # The request-scoped session is closed before the body is streamed, so the
+        # stream uses its own.
+        try:
+            async with resume_service_scope(settings) as service:
+                resume = await service.create_initial(file.filename, job_title)
+                yield _sse("created", {"id": resume.id})
+                async for feedback in service.stream(resume.id, upload, job_title):
+                    yield _sse("feedback", feedback)
+                yield _sse(
+                    "done",
+                    {"id": resume.id, "download_url": f"/resumes/{resume.id}/download"},
+                )
+        except Exception as e:
+            yield _sse("error", str(e))
+        finally:
+            upload.discard()
+            release()
+
+    # The background task releases the slot too when the stream never starts.
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(release),
+    )
+
+
+def _encode_cursor(created_at: datetime, resume_id: int) -> str:
+    cursor = f"{created_at.isoformat()}|{resume_id}"
+    return base64.urlsafe_b64encode(cursor.encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        created_at, resume_id = (
+            base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|")
+        )
+        return datetime.fromisoformat(created_at), int(resume_id)
+    except (binascii.Error, UnicodeError, ValueError):
+        raise HTTPException(400, "Invalid cursor")
+
+
+def _to_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # Timestamps are stored as naive UTC; naive query values are taken as UTC.
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+@router.get("")
+async def list_resumes(
+    service: ResumeServiceDep,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    job_title: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+):
+    """
+    List the resumes from the newest. Pass the `next_cursor` of a page as `cursor` to
+    get the next one; it is null on the last page.
+    """
+    after = _decode_cursor(cursor) if cursor else None
+    # One extra row tells whether there is a next page.
+    resumes = await service.list_resumes(
+        limit + 1, after, job_title, _to_utc(created_from), _to_utc(created_to)
+    )
+    items = resumes[:limit]
+    next_cursor = (
+        _encode_cursor(items[-1].created_at, items[-1].id)
+        if len(resumes) > limit
+        else None
+    )
+    return {
+        "items": [
+            {
+                "id": resume.id,
+                "status": resume.status,
+                "job_title": resume.job_title,
+                "original_filename": resume.original_filename,
+                "created_at": resume.created_at.isoformat(),
+            }
+            for resume in items
+        ],
+        "next_cursor": next_cursor,
+    }
 
 
 @router.get("/{resume_id}")
-def get_resume(resume_id: int, service: ResumeServiceDep):
-    resume = service.get_resume(resume_id)
+async def get_resume(resume_id: int, service: ResumeServiceDep):
+    """
+    Get a resume. While its feedback is being generated, the feedback of a near
+    duplicate processed before for the same job title, if any, is returned as
+    `preliminary_feedback_text`; `feedback_reused` tells a result copied from it.
+    """
+    resume = await service.get_resume(resume_id)
     if not resume:
         raise HTTPException(404, "Resume not found")
+    preliminary_feedback_text = None
+    if resume.similar_to_id is not None and resume.status not in (
+        ResumeStatus.DONE.value,
+        ResumeStatus.FAILED.value,
+    ):
+        similar = await service.get_resume(resume.similar_to_id)
+        preliminary_feedback_text = similar.feedback_text if similar else None
     return {
         "id": resume.id,
+        "status": resume.status,
+        "error": resume.error,
         "feedback_text": resume.feedback_text,
         "download_url": f"/resumes/{resume.id}/download",
         "job_title": resume.job_title,
         "original_filename": resume.original_filename,
         "created_at": resume.created_at.isoformat(),
+        "source_id": resume.source_id,
+        "extractor": resume.extractor,
+        "extraction_seconds": resume.extraction_seconds,
+        "similar_to_id": resume.similar_to_id,
+        "similarity": resume.similarity,
+        "feedback_reused": resume.feedback_reused,
+        "preliminary_feedback_text": preliminary_feedback_text,
     }
 
 
+@router.post("/{resume_id}/retarget", response_model=int, status_code=202)
+async def retarget_resume(
+    resume_id: int,
+    service: ResumeServiceDep,
+    pipeline: ResumePipelineDep,
+    client: ClientIdDep,
+    job_title: str = Form(...),
+):
+    """
+    Get feedback on a processed resume for another job title, without uploading it
+    again: the html extracted for it is reused and only the generation runs. The new
+    resume is linked to the original one through its `source_id`.
+    """
+    source = await service.get_resume(resume_id)
+    if not source:
+        raise HTTPException(404, "Resume not found")
+    if source.status != ResumeStatus.DONE.value:
+        raise HTTPException(409, "Only a processed resume can be retargeted")
+    try:
+        pipeline.admit(client)
+    except AdmissionError as e:
+        raise _admission_error(e)
+    resume = await service.create_retarget(source, job_title)
+    try:
+        pipeline.submit(RetargetPipelineJob(resume.id, source.id, job_title), client)
+    except AdmissionError as e:
+        await service.mark_failed(resume.id, str(e))
+        raise _admission_error(e)
+    return resume.id
+
+
+def _etag(revised_html_hash: str, variant: str) -> str:
+    return f'"{revised_html_hash[:32]}-{variant}"'
+
+
+def _not_modified(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match", "")
+    return etag in (tag.strip() for tag in if_none_match.split(",")) or (
+        if_none_match.strip() == "*"
+    )
+
+
 @router.get("/{resume_id}/download")
-def download(resume_id: int, service: ResumeServiceDep):
-    resume = service.get_resume(resume_id)
-    if not resume or not resume.revised_html:
+async def download(
+    resume_id: int,
+    request: Request,
+    service: ResumeServiceDep,
+    format: Literal["pdf", "html"] = "pdf",
+):
+    """
+    Download the revised resume. The PDF is rendered on the first download and served
+    from disk afterwards, with Range support. Both variants carry an ETag derived from
+    the revised HTML and answer 304 to a matching If-None-Match; the HTML is gzipped
+    when the client accepts it, under an ETag of its own since its bytes differ.
+    """
+    resume = await service.get_resume(resume_id)
+    if not resume or not resume.revised_html_hash:
+        raise HTTPException(404)
+    gzipped = format == "html" and "gzip" in request.headers.get("accept-encoding", "")
+    etag = _etag(resume.revised_html_hash, f"{format}-gz" if gzipped else format)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if format == "html":
+        headers["Vary"] = "Accept-Encoding"
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    if format == "html":
+        revised_html = await service.get_revised_html(resume_id)
+        if revised_html is None:
+            raise HTTPException(404)
+        body = revised_html.encode("utf-8")
+        if gzipped:
+            body = gzip.compress(body)
+            headers["Content-Encoding"] = "gzip"
+        return Response(body, media_type="text/html; charset=utf-8", headers=headers)
+    pdf_path = await service.get_pdf(resume_id)
+    if pdf_path is None:
         raise HTTPException(404)
-    return {"html": resume.revised_html}
+    filename = f"{os.path.splitext(resume.original_filename)[0]}_revised.pdf"
+    return FileResponse(
+        pdf_path, media_type="application/pdf", filename=filename, headers=headers
+    )
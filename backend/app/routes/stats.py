@@ -0,0 +1,30 @@
+from app.dependencies.ai import FeedbackCacheDep, OpenAIClientDep, PromptCompactorDep
+from app.dependencies.extractors import ExtractionCacheDep, ExtractionPoolDep
+from app.dependencies.generators import PdfRenderEngineDep
+from app.dependencies.pipeline import ResumePipelineDep, StageLimiterDep
+from fastapi import APIRouter
+
+router = APIRouter(prefix="/stats", tags=["stats"])
+
+
+@router.get("")
+def get_stats(
+    extraction_cache: ExtractionCacheDep,
+    extraction_pool: ExtractionPoolDep,
+    feedback_cache: FeedbackCacheDep,
+    openai_client: OpenAIClientDep,
+    prompt_compactor: PromptCompactorDep,
+    pdf_engine: PdfRenderEngineDep,
+    pipeline: ResumePipelineDep,
+    stage_limiter: StageLimiterDep,
+):
+    return {
+        "openai": openai_client.stats(),
+        "prompt_compaction": prompt_compactor.stats(),
+        "feedback_cache": feedback_cache.stats(),
+        "extraction_cache": extraction_cache.stats(),
+        "extraction_pool": extraction_pool.stats() if extraction_pool else None,
+        "pdf_render": pdf_engine.stats(),
+        "pipeline": pipeline.stats(),
+        "stage_limits": stage_limiter.stats(),
+    }
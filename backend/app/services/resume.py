@@ -1,11 +1,41 @@
+import asyncio
+import logging
 import os
-from typing import Dict, Optional, Protocol
+import weakref
+from contextlib import AbstractAsyncContextManager, aclosing, nullcontext
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, List, Optional, Protocol, Set, Tuple
 from app.ai.ai_client import IAIClient
-from app.extractors.docling_extractor import extract_html_from_file
-from app.generators.pdf_weasy_generator import generate_pdf
-from app.models.resume import Resume
+from app.ai.cache import normalize_job_title
+from app.ai.chunking import SectionedGenerator
+from app.ai.similarity import (
+    Fingerprint,
+    NearDuplicateDetector,
+    SimilarResume,
+    resume_words,
+)
+from app.ai.stream_parser import FeedbackStreamParser
+from app.extractors.docling_extractor import DoclingExtractor
+from app.extractors.registry import Extraction, ExtractorRegistry
+from app.generators.pdf_weasy_generator import PdfRenderEngine
+from app.models.resume import (
+    Resume,
+    ResumeBatch,
+    ResumeHtml,
+    ResumeSignature,
+    ResumeSignatureBand,
+    ResumeStatus,
+    ResumeSummary,
+    utc_now,
+)
+from app.observability.tracing import resume_context, span
 from app.repositories.resume import IResumeRepository
-from sqlmodel import Session
+from app.storage.artifacts import IArtifactStore, artifact_key
+from app.utils.file_utils import IngestedFile
+from app.workers.admission import StageLimiter
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+logger = logging.getLogger(__name__)
 
 
 class IResumeService(Protocol):
@@ -13,17 +43,102 @@ class IResumeService(Protocol):
     Interface for business-level operations on resumes.
     """
 
-    def upload(self, file_path: str, original_filename: str, job_title: str) -> Resume:
+    async def upload(self, file: IngestedFile, job_title: str) -> Resume:
         """
-        Upload a new resume.
-        @param file_path: The path to where the resume file will be saved.
-        @param original_filename: The original filename of the resume.
+        Upload a new resume and process it inline.
+        @param file: The uploaded resume file.
         @param job_title: The job title the user is applying for.
         @return: The uploaded resume.
         """
         ...
 
-    def get_resume(self, id: int) -> Resume:
+    async def process(
+        self, resume_id: int, file: IngestedFile, job_title: str
+    ) -> Resume:
+        """
+        Run the extraction and generation stages for an existing resume, recording the
+        current stage on the resume row.
+        @param resume_id: The id of the resume created by create_initial.
+        @param file: The uploaded resume file.
+        @param job_title: The job title the user is applying for.
+        @return: The processed resume.
+        """
+        ...
+
+    async def create_retarget(self, source: Resume, job_title: str) -> Resume:
+        """
+        Create a resume entry for another job title from a processed resume, queued
+        for processing.
+        @param source: The processed resume.
+        @param job_title: The new job title.
+        @return: The created resume, linked to its source.
+        """
+        ...
+
+    async def process_retarget(
+        self, resume_id: int, source_id: int, job_title: str
+    ) -> Resume:
+        """
+        Run the generation stage for a retargeted resume, on the html extracted for its
+        source.
+        @param resume_id: The id of the resume created by create_retarget.
+        @param source_id: The id of the source resume.
+        @param job_title: The new job title.
+        @return: The processed resume.
+        """
+        ...
+
+    async def create_batch(
+        self, files: List[IngestedFile], job_titles: List[str]
+    ) -> Tuple[ResumeBatch, List[Resume]]:
+        """
+        Create a batch with one resume entry per file and job title, queued for
+        processing.
+        @param files: The uploaded resume files.
+        @param job_titles: The job titles every file is applied for.
+        @return: The created batch and its resumes, by file then by job title.
+        """
+        ...
+
+    async def process_batch(
+        self,
+        file: IngestedFile,
+        targets: List[Tuple[int, str]],
+        limit: Optional[asyncio.Semaphore] = None,
+    ) -> None:
+        """
+        Extract a file once, then generate the feedback for each of its resumes
+        concurrently. A failed generation only fails its own resume.
+        @param file: The uploaded resume file.
+        @param targets: The (resume id, job title) pairs created for the file.
+        @param limit: Bounds the generations running at once across all batches.
+        """
+        ...
+
+    async def get_batch(
+        self, batch_id: int
+    ) -> Optional[Tuple[ResumeBatch, List[Resume]]]:
+        """
+        Get a batch and the current state of its resumes.
+        @param batch_id: The id of the batch.
+        @return: The batch and its resumes, or None if not found.
+        """
+        ...
+
+    def stream(
+        self, resume_id: int, file: IngestedFile, job_title: str
+    ) -> AsyncIterator[str]:
+        """
+        Like process, but yield the feedback text as the AI generates it. Everything is
+        saved once the generation ends.
+        @param resume_id: The id of the resume created by create_initial.
+        @param file: The uploaded resume file.
+        @param job_title: The job title the user is applying for.
+        @return: An async iterator over the chunks of the feedback text.
+        """
+        ...
+
+    async def get_resume(self, id: int) -> Resume:
         """
         Get a resume by id.
         @param id: The id of the resume.
@@ -31,15 +146,59 @@ class IResumeService(Protocol):
         """
         ...
 
-    def create_initial(self, original_filename: str, job_title: str) -> Resume:
+    async def list_resumes(
+        self,
+        limit: int,
+        after: Optional[Tuple[datetime, int]] = None,
+        job_title: Optional[str] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+    ) -> List[ResumeSummary]:
+        """
+        List the resumes from the newest, one page at a time.
+        @param limit: The maximum number of resumes to return.
+        @param after: The (created_at, id) of the last resume of the previous page, or
+        None for the first page.
+        @param job_title: Only list the resumes for this job title.
+        @param created_from: Only list the resumes created at or after this UTC time.
+        @param created_to: Only list the resumes created before this UTC time.
+        @return: The summaries of the resumes, newest first.
+        """
+        ...
+
+    async def get_revised_html(self, resume_id: int) -> Optional[str]:
         """
-        Create an initial resume entry in the database.
+        Get the revised html of a resume, decompressed from its separate storage.
+        @param resume_id: The id of the resume.
+        @return: The revised html, or None if the resume has none.
+        """
+        ...
+
+    async def create_initial(self, original_filename: str, job_title: str) -> Resume:
+        """
+        Create an initial resume entry in the database, queued for processing.
         @param original_filename: The original filename of the resume
         @param job_title: The job title the user is applying for
         @return: The created resume
         """
         ...
 
+    async def get_pdf(self, resume_id: int) -> Optional[str]:
+        """
+        Get the PDF of the revised resume, rendering it on the first call.
+        @param resume_id: The id of the resume.
+        @return: A local path to the PDF, or None if the resume has no revised HTML.
+        """
+        ...
+
+    async def mark_failed(self, resume_id: int, error: str) -> None:
+        """
+        Mark a resume as failed.
+        @param resume_id: The id of the resume.
+        @param error: The reason the processing failed.
+        """
+        ...
+
     def parse_ai_response(self, ai_response: str) -> Dict[str, str]:
         """
         Parse the AI response into feedback text and revised HTML.
@@ -48,12 +207,12 @@ class IResumeService(Protocol):
         """
         ...
 
-    def make_pdf(self, revised_html: str, resume_id: int) -> str:
+    def make_pdf(self, revised_html: str, html_hash: str) -> str:
         """
-        Generate a PDF from the revised HTML content.
+        Generate a PDF from the revised HTML content and store it.
         @param revised_html: The HTML content to convert to PDF
-        @param resume_id: The ID of the resume
-        @return: Path to the generated PDF file
+        @param html_hash: The SHA-256 of the HTML, which the PDF is stored under
+        @return: The key of the PDF in the artifact store
         """
         ...
 
@@ -62,66 +221,529 @@ class ResumeService(IResumeService):
     """
     Concrete implementation of the resume service.
     @attribute resume_repository: An instance of the resume repository.
-    @attribute session: An instance of the SQLModel session.
+    @attribute session: An instance of the async SQLModel session.
     @attribute ai_client: An instance of the AI client.
-    @attribute upload_dir: The directory to upload the resumes.
-    @attribute ai_output_dir: The directory to save the AI output.
+    @attribute artifacts: The store of the generated files.
+    @attribute extractors: The extractors of the uploaded files, Docling alone by default.
+    @attribute pdf_engine: The engine rendering the PDFs, in-process by default.
+    @attribute parallel_generation: Whether the analysis and the revised html are
+    requested concurrently rather than in one completion.
+    @attribute duplicates: Finds the near duplicates of a resume among the ones already
+    processed for the same job title, to reuse or offer their result. None disables
+    the lookups.
+    @attribute stage_limiter: Caps the extractions, generations and renders running at
+    once across the process. None leaves them uncapped.
+    @attribute sectioned: Revises the long resumes section by section. None revises
+    every resume whole.
     """
 
+    # One lock per revised html whose PDF is being rendered, so concurrent first
+    # downloads, of the resume or of its duplicates, render it once.
+    _render_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = (
+        weakref.WeakValueDictionary()
+    )
+
     def __init__(
         self,
         resume_repository: IResumeRepository,
-        session: Session,
+        session: AsyncSession,
         ai_client: IAIClient,
-        upload_dir: str,
-        ai_output_dir: str,
+        artifacts: IArtifactStore,
+        extractors: Optional[ExtractorRegistry] = None,
+        pdf_engine: Optional[PdfRenderEngine] = None,
+        parallel_generation: bool = False,
+        duplicates: Optional[NearDuplicateDetector] = None,
+        stage_limiter: Optional[StageLimiter] = None,
+        sectioned: Optional[SectionedGenerator] = None,
     ):
         self.resume_repository = resume_repository
         self.session = session
         self.ai_client = ai_client
-        self.upload_dir = upload_dir
-        self.ai_output_dir = ai_output_dir
-
-    def upload(self, file_path: str, original_filename: str, job_title: str) -> Resume:
-        resume = self.create_initial(original_filename, job_title)
-        resume_html = extract_html_from_file(file_path)
-        ai_response = self.ai_client.generate_feedback(resume_html, job_title)
-        ai_response_dict = self.parse_ai_response(ai_response)
-        result_pdf_path = self.make_pdf(ai_response_dict["revised_html"], resume.id)
-        resume_new = Resume(
-            resume_html=resume_html,
-            feedback_text=ai_response_dict["feedback_text"],
-            revised_html=ai_response_dict["revised_html"],
-            result_pdf_path=result_pdf_path,
+        self.artifacts = artifacts
+        self.extractors = extractors or ExtractorRegistry(DoclingExtractor())
+        self.pdf_engine = pdf_engine or PdfRenderEngine()
+        self.parallel_generation = parallel_generation
+        self.duplicates = duplicates
+        self.stage_limiter = stage_limiter
+        self.sectioned = sectioned
+
+    async def upload(self, file: IngestedFile, job_title: str) -> Resume:
+        resume = await self.create_initial(file.filename, job_title)
+        return await self.process(resume.id, file, job_title)
+
+    async def process(
+        self, resume_id: int, file: IngestedFile, job_title: str
+    ) -> Resume:
+        # The blocking stages (Docling, WeasyPrint) run in threads to keep the event
+        # loop free.
+        try:
+            extraction = await self._extract(resume_id, file)
+            return await self._generate(
+                resume_id, extraction.html, job_title, extraction
+            )
+        except Exception as e:
+            await self.mark_failed(resume_id, str(e))
+            raise
+
+    async def create_retarget(self, source: Resume, job_title: str) -> Resume:
+        resume = Resume(
+            original_filename=source.original_filename,
+            job_title=job_title,
+            source_id=source.id,
+        )
+        return await self.resume_repository.create(resume)
+
+    async def process_retarget(
+        self, resume_id: int, source_id: int, job_title: str
+    ) -> Resume:
+        try:
+            html = await self.resume_repository.get_html(source_id)
+            if html is None or html.resume_html is None:
+                raise ValueError(f"Resume {source_id} has no extracted html")
+            return await self._generate(resume_id, html.resume_html, job_title)
+        except Exception as e:
+            await self.mark_failed(resume_id, str(e))
+            raise
+
+    async def create_batch(
+        self, files: List[IngestedFile], job_titles: List[str]
+    ) -> Tuple[ResumeBatch, List[Resume]]:
+        batch = ResumeBatch()
+        resumes = [
+            Resume(original_filename=file.filename, job_title=job_title)
+            for file in files
+            for job_title in job_titles
+        ]
+        resumes = await self.resume_repository.create_batch(batch, resumes)
+        return batch, resumes
+
+    async def process_batch(
+        self,
+        file: IngestedFile,
+        targets: List[Tuple[int, str]],
+        limit: Optional[asyncio.Semaphore] = None,
+    ) -> None:
+        resume_ids = [resume_id for resume_id, _ in targets]
+        try:
+            await self.resume_repository.update_many(
+                Resume(status=ResumeStatus.EXTRACTING.value), resume_ids
+            )
+            extraction = await self._extract_html(file)
+            resume_html = extraction.html
+            await self.resume_repository.update_many(
+                Resume(
+                    status=ResumeStatus.GENERATING.value,
+                    **_extraction_fields(extraction),
+                ),
+                resume_ids,
+            )
+        except Exception as e:
+            await self.resume_repository.update_many(
+                Resume(status=ResumeStatus.FAILED.value, error=str(e)), resume_ids
+            )
+            raise
+
+        # The near duplicates are looked up first, one target at a time on the session;
+        # the reused results need no generation.
+        fingerprint = self._fingerprint(resume_html)
+        pending: List[Tuple[int, str]] = []
+        for resume_id, job_title in targets:
+            try:
+                similar = await self._find_similar(fingerprint, job_title)
+                if similar is not None:
+                    await self.resume_repository.update(
+                        Resume(**_similarity_fields(similar)), resume_id
+                    )
+                if not await self._reuse(resume_id, resume_html, similar):
+                    pending.append((resume_id, job_title))
+            except Exception as e:
+                await self.mark_failed(resume_id, str(e))
+
+        async def generate(
+            resume_id: int, job_title: str
+        ) -> Tuple[int, Optional[Dict[str, str]], Optional[Exception]]:
+            try:
+                async with limit or nullcontext():
+                    with resume_context(resume_id):
+                        ai_response_dict = await self._request_feedback(
+                            resume_html, job_title
+                        )
+                return resume_id, ai_response_dict, None
+            except Exception as e:
+                return resume_id, None, e
+
+        # The generations run concurrently; the results are saved one at a time as they
+        # arrive, since the session cannot be shared between tasks.
+        tasks = [
+            asyncio.create_task(generate(resume_id, job_title))
+            for resume_id, job_title in pending
+        ]
+        job_titles = dict(pending)
+        finished: Set[int] = set()
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                resume_id, ai_response_dict, error = await next_result
+                if error is not None:
+                    await self.mark_failed(resume_id, str(error))
+                    finished.add(resume_id)
+                    continue
+                # A result failing to save only fails its own resume.
+                try:
+                    await self._complete(
+                        resume_id,
+                        resume_html,
+                        ai_response_dict["feedback_text"],
+                        ai_response_dict["revised_html"],
+                    )
+                    await self._save_fingerprint(
+                        resume_id, job_titles[resume_id], fingerprint
+                    )
+                except Exception as e:
+                    logger.exception(
+                        "Could not save the result of resume %s", resume_id
+                    )
+                    await self.session.rollback()
+                    await self.mark_failed(resume_id, str(e))
+                finished.add(resume_id)
+        finally:
+            for task in tasks:
+                task.cancel()
+            # Stopped early, e.g. cancelled or unable to mark a resume as failed: the
+            # generations never saved are failed instead of left generating forever.
+            unfinished = [
+                resume_id for resume_id, _ in pending if resume_id not in finished
+            ]
+            if unfinished:
+                await self._fail_unfinished(unfinished)
+
+    async def get_batch(
+        self, batch_id: int
+    ) -> Optional[Tuple[ResumeBatch, List[Resume]]]:
+        batch = await self.resume_repository.get_batch(batch_id)
+        if not batch:
+            return None
+        return batch, await self.resume_repository.list_batch(batch_id)
+
+    async def stream(
+        self, resume_id: int, file: IngestedFile, job_title: str
+    ) -> AsyncIterator[str]:
+        try:
+            extraction = await self._extract(resume_id, file)
+            resume_html = extraction.html
+            fingerprint = self._fingerprint(resume_html)
+            similar = await self._find_similar(fingerprint, job_title)
+            await self._set_status(
+                resume_id,
+                ResumeStatus.GENERATING,
+                extraction=extraction,
+                similar=similar,
+            )
+            reused = await self._reuse(resume_id, resume_html, similar)
+            if reused:
+                yield reused.feedback_text
+                return
+            parser = FeedbackStreamParser()
+            async with self._stage("generate"):
+                with span("generate"):
+                    async with aclosing(
+                        self.ai_client.stream_feedback(resume_html, job_title)
+                    ) as chunks:
+                        async for chunk in chunks:
+                            if feedback := parser.feed(chunk):
+                                yield feedback
+            if feedback := parser.close():
+                yield feedback
+            await self._complete(
+                resume_id, resume_html, parser.feedback_text, parser.revised_html
+            )
+            await self._save_fingerprint(resume_id, job_title, fingerprint)
+        except Exception as e:
+            await self.mark_failed(resume_id, str(e))
+            raise
+
+    async def get_resume(self, id: int) -> Optional[Resume]:
+        return await self.resume_repository.get_by_id(id)
+
+    async def list_resumes(
+        self,
+        limit: int,
+        after: Optional[Tuple[datetime, int]] = None,
+        job_title: Optional[str] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+    ) -> List[ResumeSummary]:
+        return await self.resume_repository.list(
+            limit, after, job_title, created_from, created_to
         )
-        self.resume_repository.update(resume_new, resume.id)
-        return resume_new
 
-    def get_resume(self, id: int) -> Optional[Resume]:
-        return self.resume_repository.get_by_id(id)
+    async def get_revised_html(self, resume_id: int) -> Optional[str]:
+        html = await self.resume_repository.get_html(resume_id)
+        return html.revised_html if html else None
 
-    def create_initial(self, original_filename: str, job_title: str) -> Resume:
+    async def create_initial(self, original_filename: str, job_title: str) -> Resume:
         resume = Resume(original_filename=original_filename, job_title=job_title)
-        self.resume_repository.create(resume)
+        return await self.resume_repository.create(resume)
+
+    async def get_pdf(self, resume_id: int) -> Optional[str]:
+        resume = await self.get_resume(resume_id)
+        if not resume or not resume.revised_html_hash:
+            return None
+        html_hash = resume.revised_html_hash
+        key = artifact_key("pdf", html_hash, ".pdf")
+        pdf_path = await asyncio.to_thread(self.artifacts.local_path, key)
+        if pdf_path is None:
+            lock = self._render_locks.setdefault(html_hash, asyncio.Lock())
+            async with lock:
+                pdf_path = await asyncio.to_thread(self.artifacts.local_path, key)
+                if pdf_path is None:
+                    revised_html = await self.get_revised_html(resume_id)
+                    if revised_html is None:
+                        return None
+                    async with self._stage("render"):
+                        with resume_context(resume_id), span("render"):
+                            await asyncio.to_thread(
+                                self.make_pdf, revised_html, html_hash
+                            )
+                    pdf_path = await asyncio.to_thread(self.artifacts.local_path, key)
+        if resume.result_pdf_path != key:
+            await self.resume_repository.update(Resume(result_pdf_path=key), resume_id)
+        return pdf_path
+
+    async def mark_failed(self, resume_id: int, error: str) -> None:
+        await self._set_status(resume_id, ResumeStatus.FAILED, error=error)
+
+    async def _fail_unfinished(self, resume_ids: List[int]) -> None:
+        try:
+            await self.session.rollback()
+            await self.resume_repository.update_many(
+                Resume(
+                    status=ResumeStatus.FAILED.value,
+                    error="The batch stopped before this resume was saved",
+                ),
+                resume_ids,
+            )
+        except Exception:
+            logger.exception("Could not mark resumes %s as failed", resume_ids)
+
+    async def _set_status(
+        self,
+        resume_id: int,
+        status: ResumeStatus,
+        error: Optional[str] = None,
+        extraction: Optional[Extraction] = None,
+        similar: Optional[SimilarResume] = None,
+    ) -> None:
+        resume_in = Resume(
+            status=status.value,
+            error=error,
+            **_extraction_fields(extraction),
+            **_similarity_fields(similar),
+        )
+        await self.resume_repository.update(resume_in, resume_id)
+
+    async def _extract(self, resume_id: int, file: IngestedFile) -> Extraction:
+        await self._set_status(resume_id, ResumeStatus.EXTRACTING)
+        return await self._extract_html(file)
+
+    async def _extract_html(self, file: IngestedFile) -> Extraction:
+        async with self._stage("extract"):
+            with span("extract"):
+                return await asyncio.to_thread(self.extractors.extract, file)
+
+    def _stage(self, stage: str) -> AbstractAsyncContextManager:
+        # A slot of a capped stage, taken before its span so the wait is not counted
+        # in the duration of the stage.
+        if self.stage_limiter is None:
+            return nullcontext()
+        return self.stage_limiter.slot(stage)
+
+    async def _generate(
+        self,
+        resume_id: int,
+        resume_html: str,
+        job_title: str,
+        extraction: Optional[Extraction] = None,
+    ) -> Resume:
+        # The extraction path and the near duplicate are saved with the status change,
+        # not on their own.
+        fingerprint = self._fingerprint(resume_html)
+        similar = await self._find_similar(fingerprint, job_title)
+        await self._set_status(
+            resume_id, ResumeStatus.GENERATING, extraction=extraction, similar=similar
+        )
+        reused = await self._reuse(resume_id, resume_html, similar)
+        if reused:
+            return reused
+        ai_response_dict = await self._request_feedback(resume_html, job_title)
+        resume = await self._complete(
+            resume_id,
+            resume_html,
+            ai_response_dict["feedback_text"],
+            ai_response_dict["revised_html"],
+        )
+        await self._save_fingerprint(resume_id, job_title, fingerprint)
         return resume
 
+    def _fingerprint(self, resume_html: str) -> Optional[Fingerprint]:
+        if self.duplicates is None:
+            return None
+        with span("similarity.fingerprint"):
+            return self.duplicates.fingerprint(resume_html)
+
+    async def _find_similar(
+        self, fingerprint: Optional[Fingerprint], job_title: str
+    ) -> Optional[SimilarResume]:
+        if fingerprint is None:
+            return None
+        since = utc_now() - timedelta(seconds=self.duplicates.max_age_seconds)
+        candidates = await self.resume_repository.find_similar(
+            normalize_job_title(job_title), fingerprint.buckets, since
+        )
+        return self.duplicates.best_match(fingerprint, candidates)
+
+    async def _reuse(
+        self, resume_id: int, resume_html: str, similar: Optional[SimilarResume]
+    ) -> Optional[Resume]:
+        # Copy the result of a previous resume with the same text, re-uploaded or in
+        # another format. None when there is none, and the feedback is generated
+        # instead: a near duplicate only differing by a fixed typo still needs its own
+        # revision, its result being served as a preliminary answer meanwhile.
+        if self.duplicates is None or not self.duplicates.reusable(similar):
+            return None
+        source = await self.resume_repository.get_by_id(similar.resume_id)
+        html = await self.resume_repository.get_html(similar.resume_id)
+        if (
+            source is None
+            or source.status != ResumeStatus.DONE.value
+            or html is None
+            or html.revised_html is None
+            or html.resume_html is None
+            or resume_words(html.resume_html) != resume_words(resume_html)
+        ):
+            return None
+        return await self._complete(
+            resume_id,
+            resume_html,
+            source.feedback_text,
+            html.revised_html,
+            feedback_reused=True,
+        )
+
+    async def _save_fingerprint(
+        self, resume_id: int, job_title: str, fingerprint: Optional[Fingerprint]
+    ) -> None:
+        # Only generated results are indexed: reusing a reused result would let the
+        # feedback drift away from the resume it was written for, one copy at a time.
+        # The resume is done either way, so failing to index it is only logged.
+        if fingerprint is None:
+            return
+        job_title = normalize_job_title(job_title)
+        try:
+            await self.resume_repository.save_signature(
+                ResumeSignature(
+                    resume_id=resume_id,
+                    job_title=job_title,
+                    signature=fingerprint.packed(),
+                ),
+                [
+                    ResumeSignatureBand(
+                        resume_id=resume_id,
+                        band=band,
+                        job_title=job_title,
+                        bucket=bucket,
+                    )
+                    for band, bucket in enumerate(fingerprint.buckets)
+                ],
+            )
+        except Exception:
+            logger.exception("Could not save the signature of resume %s", resume_id)
+            await self.session.rollback()
+
+    async def _request_feedback(
+        self, resume_html: str, job_title: str
+    ) -> Dict[str, str]:
+        async with self._stage("generate"):
+            with span("generate"):
+                return await self._generate_feedback(resume_html, job_title)
+
+    async def _generate_feedback(
+        self, resume_html: str, job_title: str
+    ) -> Dict[str, str]:
+        parts = self.sectioned.split(resume_html) if self.sectioned else []
+        if parts:
+            with span("generate.sectioned"):
+                sections = await self.sectioned.generate(
+                    self.ai_client, parts, job_title
+                )
+            return {
+                "feedback_text": sections.feedback_text,
+                "revised_html": sections.revised_html,
+            }
+        if self.parallel_generation:
+            sections = await self.ai_client.generate_sections(resume_html, job_title)
+            return {
+                "feedback_text": sections.feedback_text,
+                "revised_html": sections.revised_html,
+            }
+        ai_response = await self.ai_client.generate_feedback(resume_html, job_title)
+        return self.parse_ai_response(ai_response)
+
+    async def _complete(
+        self,
+        resume_id: int,
+        resume_html: str,
+        feedback_text: str,
+        revised_html: str,
+        feedback_reused: bool = False,
+    ) -> Resume:
+        # An answer missing its revised resume ("2)") leaves nothing to download: the
+        # resume fails instead of being done with an empty PDF.
+        if not revised_html.strip():
+            raise ValueError("The AI response has no revised resume")
+        resume_new = Resume(
+            status=ResumeStatus.DONE.value,
+            feedback_text=feedback_text,
+            feedback_reused=feedback_reused,
+        )
+        html = ResumeHtml(resume_html=resume_html, revised_html=revised_html)
+        return await self.resume_repository.update(resume_new, resume_id, html)
+
     def parse_ai_response(self, ai_response: str) -> Dict[str, str]:
-        parts = ai_response.split("1)")
-        if len(parts) < 2:
-            return {"feedback_text": ai_response.strip(), "revised_html": ""}
-        after_1 = parts[1]
-        feedback_parts = after_1.split("2)")
-        if len(feedback_parts) < 2:
-            return {"feedback_text": after_1.strip(), "revised_html": ""}
-        feedback_text = feedback_parts[0].strip()
-        revised_html = feedback_parts[1].strip()
-        return {"feedback_text": feedback_text, "revised_html": revised_html}
-
-    def make_pdf(self, revised_html: str, resume_id: int) -> str:
-        os.makedirs(self.ai_output_dir, exist_ok=True)
-        output_path = os.path.join(self.ai_output_dir, f"{resume_id}_revised.pdf")
-        generate_pdf(revised_html, output_path)
-        return output_path
+        parser = FeedbackStreamParser()
+        parser.feed(ai_response)
+        parser.close()
+        return {
+            "feedback_text": parser.feedback_text,
+            "revised_html": parser.revised_html,
+        }
+
+    def make_pdf(self, revised_html: str, html_hash: str) -> str:
+        # Rendered in the staging directory and moved in place, so a partial file is
+        # never served.
+        staging_path = self.artifacts.staging_path(".pdf")
+        try:
+            self.pdf_engine.render(revised_html, staging_path)
+            return self.artifacts.put_file(staging_path, "pdf", html_hash)
+        finally:
+            if os.path.exists(staging_path):
+                os.remove(staging_path)
+
+
+def _extraction_fields(extraction: Optional[Extraction]) -> Dict:
+    # The columns recording how the html of a resume was extracted.
+    if extraction is None:
+        return {}
+    return {
+        "extractor": extraction.extractor,
+        "extraction_seconds": extraction.seconds,
+    }
+
+
+def _similarity_fields(similar: Optional[SimilarResume]) -> Dict:
+    # The columns recording the near duplicate of a resume.
+    if similar is None:
+        return {}
+    return {"similar_to_id": similar.resume_id, "similarity": similar.similarity}
 
 
 class MockResumeService(IResumeService):
@@ -129,18 +751,104 @@ class MockResumeService(IResumeService):
     Mock implementation of the resume service.
     """
 
-    def upload(self, job_title: str) -> Resume:
+    async def upload(self, file: IngestedFile, job_title: str) -> Resume:
         return Resume(
             id=1,
+            status=ResumeStatus.DONE.value,
+            feedback_text="mock_feedback",
+            revised_html_hash="mock_hash",
+            job_title=job_title,
+        )
+
+    async def process(
+        self, resume_id: int, file: IngestedFile, job_title: str
+    ) -> Resume:
+        return Resume(
+            id=resume_id,
+            status=ResumeStatus.DONE.value,
+            feedback_text="mock_feedback",
+            revised_html_hash="mock_hash",
+            job_title=job_title,
+        )
+
+    async def create_retarget(self, source: Resume, job_title: str) -> Resume:
+        return Resume(
+            id=2,
+            original_filename=source.original_filename,
+            job_title=job_title,
+            source_id=source.id,
+        )
+
+    async def process_retarget(
+        self, resume_id: int, source_id: int, job_title: str
+    ) -> Resume:
+        return Resume(
+            id=resume_id,
+            status=ResumeStatus.DONE.value,
             feedback_text="mock_feedback",
-            revised_html="mock_html",
+            revised_html_hash="mock_hash",
             job_title=job_title,
+            source_id=source_id,
         )
 
-    def get_resume(self, id: int) -> Optional[Resume]:
+    async def create_batch(
+        self, files: List[IngestedFile], job_titles: List[str]
+    ) -> Tuple[ResumeBatch, List[Resume]]:
+        resumes = [
+            Resume(
+                id=i + 1,
+                original_filename=file.filename,
+                job_title=job_title,
+                batch_id=1,
+            )
+            for i, (file, job_title) in enumerate(
+                (file, job_title) for file in files for job_title in job_titles
+            )
+        ]
+        return ResumeBatch(id=1), resumes
+
+    async def process_batch(
+        self,
+        file: IngestedFile,
+        targets: List[Tuple[int, str]],
+        limit: Optional[asyncio.Semaphore] = None,
+    ) -> None:
+        pass
+
+    async def get_batch(
+        self, batch_id: int
+    ) -> Optional[Tuple[ResumeBatch, List[Resume]]]:
+        return ResumeBatch(id=batch_id), []
+
+    async def stream(
+        self, resume_id: int, file: IngestedFile, job_title: str
+    ) -> AsyncIterator[str]:
+        yield "mock_feedback"
+
+    async def get_resume(self, id: int) -> Optional[Resume]:
         return Resume(
             id=id,
+            status=ResumeStatus.DONE.value,
             feedback_text="mock_feedback",
-            revised_html="mock_html",
+            revised_html_hash="mock_hash",
             job_title="mock_job_title",
         )
+
+    async def list_resumes(
+        self,
+        limit: int,
+        after: Optional[Tuple[datetime, int]] = None,
+        job_title: Optional[str] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+    ) -> List[ResumeSummary]:
+        return []
+
+    async def get_revised_html(self, resume_id: int) -> Optional[str]:
+        return "mock_html"
+
+    async def get_pdf(self, resume_id: int) -> Optional[str]:
+        return None
+
+    async def mark_failed(self, resume_id: int, error: str) -> None:
+        pass
@@ -0,0 +1,450 @@
+import errno
+import hashlib
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Protocol, Tuple
+
+CHUNK_SIZE = 1024 * 1024
+# A key is the kind of the artifact, then its content address and extension:
+# "pdf/<sha256>.pdf".
+KEY_PATTERN = re.compile(r"^([a-z]+)/([0-9a-f]{64})(\.[a-z0-9]+)?$")
+# Eviction under the quota goes down to this fraction of it, so every put does not
+# trigger one.
+QUOTA_LOW_WATERMARK = 0.9
+# The PDFs written at the root of the output directory, by resume id, before the
+# artifact store. Nothing serves them any more.
+LEGACY_PDF_PATTERN = re.compile(r"^\d+_revised\.pdf$")
+# The S3 API deletes at most this many objects per request.
+S3_DELETE_BATCH = 1000
+
+
+class InvalidArtifactKeyError(ValueError):
+    """
+    Raised when a key does not name an artifact, e.g. a path stored before the artifact
+    store was introduced.
+    """
+
+
+def artifact_key(kind: str, digest: str, extension: str = "") -> str:
+    """
+    Build the key of an artifact.
+    @param kind: The kind of artifact, e.g. "pdf".
+    @param digest: The hex SHA-256 identifying the content.
+    @param extension: The extension of the file, with its dot.
+    """
+    key = f"{kind}/{digest}{extension}"
+    parse_key(key)
+    return key
+
+
+def parse_key(key: str) -> Tuple[str, str, str]:
+    """
+    Split a key into its kind, digest and extension.
+    @raise InvalidArtifactKeyError: If the string is not a key.
+    """
+    match = KEY_PATTERN.match(key or "")
+    if match is None:
+        raise InvalidArtifactKeyError(f"Not an artifact key: {key!r}")
+    kind, digest, extension = match.groups()
+    return kind, digest, extension or ""
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class IArtifactStore(Protocol):
+    """
+    Interface for the storage of the files produced for the resumes. Artifacts are
+    content-addressed: stored under the hash of their content, or of the input that
+    determines it, so an identical output is stored once. They are derived data, which
+    the garbage collector removes when unused for too long or over the disk quota, and
+    the service produces again on demand. The methods block and are called from threads.
+    """
+
+    def staging_path(self, extension: str = "") -> str:
+        """
+        A new path on the local disk to write a file before storing it.
+        @param extension: The extension of the file, with its dot.
+        """
+        ...
+
+    def put_file(self, path: str, kind: str, digest: Optional[str] = None) -> str:
+        """
+        Store a file, moving it into the store. When an artifact with the same key is
+        already stored, the file is dropped instead.
+        @param path: The file to store, e.g. at a staging path.
+        @param kind: The kind of artifact, e.g. "pdf".
+        @param digest: The hex SHA-256 to store it under, by default of its content.
+        @return: The key of the artifact.
+        """
+        ...
+
+    def local_path(self, key: str) -> Optional[str]:
+        """
+        A path on the local disk to read an artifact from, recording the access.
+        @param key: The key of the artifact.
+        @return: The path, or None if the artifact is not stored.
+        """
+        ...
+
+    def delete(self, key: str) -> None:
+        """
+        Remove an artifact, if stored.
+        """
+        ...
+
+    def collect_garbage(self) -> Dict[str, int]:
+        """
+        Remove the artifacts older than the TTL, then the least recently used ones while
+        over the quota, and the abandoned staging files.
+        @return: The number of files removed and the bytes freed.
+        """
+        ...
+
+    def stats(self) -> Dict[str, int]: ...
+
+
+class LocalArtifactStore(IArtifactStore):
+    """
+    Artifact store on the local filesystem, sharded by the first bytes of the hash
+    (<root>/<kind>/ab/cd/abcd....pdf) so no directory grows to millions of entries.
+    The modification time of a file doubles as its last access time. The collection
+    also removes the PDFs left at the root by the versions before the store.
+    @attribute root: The directory of the artifacts.
+    @attribute staging_dir: The directory the files are written to before being stored,
+    on the same filesystem preferably so storing them is a rename. It must hold nothing
+    else: the collector removes the files older than staging_max_age, left behind by a
+    crash.
+    @attribute ttl_seconds: The artifacts not accessed for this long are removed; 0
+    keeps them until the quota needs the space.
+    @attribute max_bytes: The disk quota of the artifacts; 0 for none.
+    @attribute staging_max_age: The staging files older than this are removed.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        staging_dir: Optional[str] = None,
+        ttl_seconds: float = 0.0,
+        max_bytes: int = 0,
+        staging_max_age: float = 24 * 3600,
+    ):
+        self.root = root
+        self.staging_dir = staging_dir or os.path.join(root, "staging")
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.staging_max_age = staging_max_age
+        self._lock = threading.Lock()
+        self._counters = {"puts": 0, "deduplicated": 0, "removed": 0, "freed_bytes": 0}
+        os.makedirs(self.root, exist_ok=True)
+        os.makedirs(self.staging_dir, exist_ok=True)
+        entries = list(self._entries())
+        self._bytes = sum(size for _, size, _ in entries)
+        self._count = len(entries)
+
+    def staging_path(self, extension: str = "") -> str:
+        return os.path.join(self.staging_dir, f"{uuid.uuid4().hex}{extension}")
+
+    def put_file(self, path: str, kind: str, digest: Optional[str] = None) -> str:
+        key = artifact_key(kind, digest or file_digest(path), _extension(path))
+        target = self._path(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        size = os.path.getsize(path)
+        # The check and the move under the lock, so two puts of the same content store
+        # and count it once.
+        with self._lock:
+            self._counters["puts"] += 1
+            exists = os.path.exists(target)
+            if exists:
+                self._counters["deduplicated"] += 1
+            else:
+                _move(path, target)
+                self._bytes += size
+                self._count += 1
+            over_quota = self.max_bytes and self._bytes > self.max_bytes
+        if exists:
+            os.remove(path)
+            # Touched like a read, unless it was evicted meanwhile.
+            self.local_path(key)
+        if over_quota:
+            self._evict()
+        return key
+
+    def local_path(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def delete(self, key: str) -> None:
+        path = self._path(key)
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except FileNotFoundError:
+            return
+        with self._lock:
+            self._bytes -= size
+            self._count -= 1
+
+    def collect_garbage(self) -> Dict[str, int]:
+        now = time.time()
+        removed, freed = 0, 0
+        if self.ttl_seconds > 0:
+            for path, size, mtime in list(self._entries()):
+                if now - mtime > self.ttl_seconds and self._remove(path, size):
+                    removed += 1
+                    freed += size
+        evicted, evicted_bytes = self._evict()
+        removed, freed = removed + evicted, freed + evicted_bytes
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if LEGACY_PDF_PATTERN.match(name) and os.path.isfile(path):
+                try:
+                    size = os.path.getsize(path)
+                    os.remove(path)
+                except FileNotFoundError:
+                    continue
+                removed += 1
+                freed += size
+        for name in os.listdir(self.staging_dir):
+            path = os.path.join(self.staging_dir, name)
+            try:
+                if now - os.path.getmtime(path) > self.staging_max_age:
+                    os.remove(path)
+                    removed += 1
+            except (FileNotFoundError, IsADirectoryError):
+                continue
+        with self._lock:
+            self._counters["removed"] += removed
+            self._counters["freed_bytes"] += freed
+        return {"removed": removed, "freed_bytes": freed}
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._counters, "entries": self._count, "bytes": self._bytes}
+
+    def _path(self, key: str) -> str:
+        kind, digest, extension = parse_key(key)
+        return os.path.join(
+            self.root, kind, digest[:2], digest[2:4], f"{digest}{extension}"
+        )
+
+    def _entries(self) -> Iterator[Tuple[str, int, float]]:
+        staging_dir = os.path.realpath(self.staging_dir)
+        for kind in os.listdir(self.root):
+            directory = os.path.join(self.root, kind)
+            if (
+                not os.path.isdir(directory)
+                or os.path.realpath(directory) == staging_dir
+            ):
+                continue
+            for dirpath, _, files in os.walk(directory):
+                for name in files:
+                    path = os.path.join(dirpath, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    yield path, stat.st_size, stat.st_mtime
+
+    def _evict(self) -> Tuple[int, int]:
+        # The least recently used first, down to the low watermark of the quota.
+        with self._lock:
+            if not self.max_bytes or self._bytes <= self.max_bytes:
+                return 0, 0
+        target = self.max_bytes * QUOTA_LOW_WATERMARK
+        removed, freed = 0, 0
+        for path, size, _ in sorted(self._entries(), key=lambda entry: entry[2]):
+            with self._lock:
+                if self._bytes <= target:
+                    break
+            if self._remove(path, size):
+                removed += 1
+                freed += size
+        return removed, freed
+
+    def _remove(self, path: str, size: int) -> bool:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return False
+        with self._lock:
+            self._bytes -= size
+            self._count -= 1
+        return True
+
+
+class S3ArtifactStore(IArtifactStore):
+    """
+    Artifact store in an S3-compatible bucket, shared by every instance of the service.
+    The artifacts read or written are kept in a local store, which serves them from
+    disk and is garbage collected on its own.
+    In S3 the TTL counts from the upload, as reads do not update the objects; a bucket
+    lifecycle rule can replace the collection.
+    @attribute client: A boto3 S3 client, or any object with the same methods, e.g. a
+    stand-in for tests or a client pointed at a local MinIO.
+    @attribute bucket: The bucket of the artifacts.
+    @attribute prefix: The prefix of the object keys.
+    @attribute cache: The local store of the artifacts read or written.
+    @attribute ttl_seconds: The objects uploaded this long ago are removed; 0 for never.
+    @attribute max_bytes: The quota of the objects under the prefix; 0 for none.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        bucket: str,
+        cache: LocalArtifactStore,
+        prefix: str = "",
+        ttl_seconds: float = 0.0,
+        max_bytes: int = 0,
+    ):
+        self.client = client
+        self.bucket = bucket
+        self.cache = cache
+        self.prefix = prefix
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._counters = {
+            "puts": 0,
+            "deduplicated": 0,
+            "downloads": 0,
+            "removed": 0,
+            "freed_bytes": 0,
+        }
+
+    def staging_path(self, extension: str = "") -> str:
+        return self.cache.staging_path(extension)
+
+    def put_file(self, path: str, kind: str, digest: Optional[str] = None) -> str:
+        key = artifact_key(kind, digest or file_digest(path), _extension(path))
+        exists = self._head(key) is not None
+        if not exists:
+            self.client.upload_file(path, self.bucket, self._object(key))
+        with self._lock:
+            self._counters["puts"] += 1
+            self._counters["deduplicated"] += exists
+        self.cache.put_file(path, kind, parse_key(key)[1])
+        return key
+
+    def local_path(self, key: str) -> Optional[str]:
+        path = self.cache.local_path(key)
+        if path is not None:
+            return path
+        kind, digest, extension = parse_key(key)
+        staging = self.cache.staging_path(extension)
+        try:
+            self.client.download_file(self.bucket, self._object(key), staging)
+        except Exception as e:
+            if _not_found(e):
+                return None
+            raise
+        with self._lock:
+            self._counters["downloads"] += 1
+        return self.cache.local_path(self.cache.put_file(staging, kind, digest))
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self._object(key))
+        self.cache.delete(key)
+
+    def collect_garbage(self) -> Dict[str, int]:
+        collected = self.cache.collect_garbage()
+        if not self.ttl_seconds and not self.max_bytes:
+            return collected
+        now = datetime.now(timezone.utc)
+        objects = sorted(self._objects(), key=lambda o: o["LastModified"])
+        expired = [
+            o
+            for o in objects
+            if self.ttl_seconds
+            and (now - o["LastModified"]).total_seconds() > self.ttl_seconds
+        ]
+        kept = objects[len(expired) :]
+        total = sum(o["Size"] for o in kept)
+        if self.max_bytes and total > self.max_bytes:
+            # The oldest uploads first, down to the low watermark of the quota.
+            target = self.max_bytes * QUOTA_LOW_WATERMARK
+            for o in kept:
+                if total <= target:
+                    break
+                expired.append(o)
+                total -= o["Size"]
+        for start in range(0, len(expired), S3_DELETE_BATCH):
+            batch = expired[start : start + S3_DELETE_BATCH]
+            self.client.delete_objects(
+                Bucket=self.bucket,
+                Delete={"Objects": [{"Key": o["Key"]} for o in batch], "Quiet": True},
+            )
+        freed = sum(o["Size"] for o in expired)
+        with self._lock:
+            self._counters["removed"] += len(expired)
+            self._counters["freed_bytes"] += freed
+        return {
+            "removed": collected["removed"] + len(expired),
+            "freed_bytes": collected["freed_bytes"] + freed,
+        }
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self._counters)
+        cache = self.cache.stats()
+        stats["cache_entries"] = cache["entries"]
+        stats["cache_bytes"] = cache["bytes"]
+        return stats
+
+    def _object(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    def _head(self, key: str) -> Optional[Dict]:
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self._object(key))
+        except Exception as e:
+            if _not_found(e):
+                return None
+            raise
+
+    def _objects(self) -> List[Dict]:
+        objects = []
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            objects.extend(page.get("Contents", []))
+        return objects
+
+
+def _extension(path: str) -> str:
+    return os.path.splitext(path)[1].lower()
+
+
+def _move(source: str, target: str) -> None:
+    # A rename, unless the staging directory is on another filesystem: then a copy
+    # next to the target, renamed in place, so a partial file is never served.
+    try:
+        os.replace(source, target)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        partial = f"{target}.{uuid.uuid4().hex}.partial"
+        shutil.copyfile(source, partial)
+        os.replace(partial, target)
+        os.remove(source)
+
+
+def _not_found(error: Exception) -> bool:
+    # botocore reports a missing object as a ClientError with a 404 or NoSuchKey code.
+    response = getattr(error, "response", None) or {}
+    code = str(response.get("Error", {}).get("Code", ""))
+    return code in ("404", "NoSuchKey", "NotFound")
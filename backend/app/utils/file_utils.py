@@ -1,23 +1,151 @@
+import asyncio
+import hashlib
+import io
 import os
-import shutil
 import uuid
+from dataclasses import dataclass
+from typing import BinaryIO, Optional
 from fastapi import UploadFile
 from app.config import Settings
 
+CHUNK_SIZE = 64 * 1024
 
-def store_temp_file(upload: UploadFile, settings: Settings) -> str:
-    """Store an uploaded file in a temporary location.
+
+class UploadTooLargeError(Exception):
+    """
+    Raised when an upload exceeds the maximum upload size.
+    """
+
+
+@dataclass
+class IngestedFile:
+    """
+    An uploaded file, kept in memory when small enough and spilled to a temporary
+    file otherwise.
+    @attribute filename: The original filename of the upload.
+    @attribute content_hash: The SHA-256 hex digest of the content.
+    @attribute size: The size of the content in bytes.
+    @attribute data: The content, when kept in memory.
+    @attribute path: The path to the file, when on disk.
+    @attribute temporary: Whether the file at path is removed by discard().
+    """
+
+    filename: str
+    content_hash: str
+    size: int
+    data: Optional[bytes] = None
+    path: Optional[str] = None
+    temporary: bool = False
+
+    @property
+    def extension(self) -> str:
+        return os.path.splitext(self.filename)[1].lower()
+
+    @classmethod
+    def from_path(cls, file_path: str) -> "IngestedFile":
+        """
+        Describe a file already on disk, which discard() leaves in place.
+        @param file_path: The path to the file.
+        """
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+        return cls(
+            filename=os.path.basename(file_path),
+            content_hash=digest.hexdigest(),
+            size=os.path.getsize(file_path),
+            path=file_path,
+        )
+
+    def read_bytes(self) -> bytes:
+        if self.data is not None:
+            return self.data
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def head(self, size: int) -> bytes:
+        """
+        The first bytes of the content, without reading a file on disk whole.
+        @param size: The number of bytes to return at most.
+        """
+        if self.data is not None:
+            return self.data[:size]
+        with open(self.path, "rb") as f:
+            return f.read(size)
+
+    def open(self) -> BinaryIO:
+        """
+        A binary file object over the content, to be closed by the caller.
+        """
+        if self.data is not None:
+            return io.BytesIO(self.data)
+        return open(self.path, "rb")
+
+    def discard(self) -> None:
+        """
+        Release the content, removing the file if it is temporary.
+        """
+        self.data = None
+        if self.temporary and self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+async def ingest_upload(upload: UploadFile, settings: Settings) -> IngestedFile:
+    """
+    Read an uploaded file in chunks, hashing it on the fly. Uploads up to
+    UPLOAD_MEMORY_LIMIT stay in memory; larger ones are written to UPLOAD_DIR as they
+    are read.
 
     Args:
         upload: The uploaded file
         settings: Application settings
 
     Returns:
-        str: Path to the stored temporary file
+        IngestedFile: The content of the upload and its hash
+
+    Raises:
+        UploadTooLargeError: If the upload is larger than UPLOAD_MAX_SIZE
     """
-    ext = os.path.splitext(upload.filename)[1]
-    dest = os.path.join(settings.UPLOAD_DIR, f"{uuid.uuid4()}{ext}")
-    os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
-    with open(dest, "wb") as fdst:
-        shutil.copyfileobj(upload.file, fdst)
-    return dest
+    if upload.size is not None and upload.size > settings.UPLOAD_MAX_SIZE:
+        raise UploadTooLargeError(
+            f"Uploads are limited to {settings.UPLOAD_MAX_SIZE} bytes"
+        )
+    digest = hashlib.sha256()
+    buffer = bytearray()
+    size = 0
+    path: Optional[str] = None
+    spill: Optional[BinaryIO] = None
+    try:
+        while chunk := await upload.read(CHUNK_SIZE):
+            size += len(chunk)
+            if size > settings.UPLOAD_MAX_SIZE:
+                raise UploadTooLargeError(
+                    f"Uploads are limited to {settings.UPLOAD_MAX_SIZE} bytes"
+                )
+            digest.update(chunk)
+            if spill is None and size <= settings.UPLOAD_MEMORY_LIMIT:
+                buffer += chunk
+                continue
+            if spill is None:
+                os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+                ext = os.path.splitext(upload.filename)[1]
+                path = os.path.join(settings.UPLOAD_DIR, f"{uuid.uuid4()}{ext}")
+                spill = open(path, "wb")
+                chunk, buffer = bytes(buffer) + chunk, bytearray()
+            await asyncio.to_thread(spill.write, chunk)
+    except BaseException:
+        if spill is not None:
+            spill.close()
+            os.remove(path)
+        raise
+    if spill is not None:
+        spill.close()
+    return IngestedFile(
+        filename=upload.filename,
+        content_hash=digest.hexdigest(),
+        size=size,
+        data=None if path else bytes(buffer),
+        path=path,
+        temporary=path is not None,
+    )
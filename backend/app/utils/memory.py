@@ -0,0 +1,45 @@
+import resource
+import sys
+
+
+def _read_status_kb(field: str) -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(f"{field}:"):
+                return int(line.split()[1])
+    raise KeyError(field)
+
+
+def current_rss() -> int:
+    """
+    Return the resident set size of the current process in bytes.
+    """
+    try:
+        return _read_status_kb("VmRSS") * 1024
+    except (OSError, KeyError):
+        return peak_rss()
+
+
+def peak_rss() -> int:
+    """
+    Return the peak resident set size of the current process in bytes, since it
+    started or since the last reset_peak_rss.
+    """
+    try:
+        return _read_status_kb("VmHWM") * 1024
+    except (OSError, KeyError):
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Kilobytes on Linux, bytes on macOS.
+        return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+def reset_peak_rss() -> None:
+    """
+    Reset the peak resident set size to the current one, so the next peak_rss measures
+    the work done in between. Only supported on Linux; a no-op elsewhere.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
@@ -0,0 +1,318 @@
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import (
+    AsyncIterator,
+    Deque,
+    Dict,
+    Generic,
+    Optional,
+    Set,
+    Tuple,
+    TypeVar,
+)
+from app.observability.metrics import (
+    ADMISSION_REJECTIONS,
+    ADMISSION_WAIT,
+    STAGE_SLOT_WAIT,
+)
+
+T = TypeVar("T")
+
+# The duration assumed for a job until one has been measured, in seconds.
+DEFAULT_JOB_SECONDS = 10.0
+# Weight of the last job in the moving average of the job durations.
+JOB_SECONDS_SMOOTHING = 0.2
+
+
+class AdmissionError(Exception):
+    """
+    Raised when a job is not admitted, the queue of the pipeline or of its client
+    being full, or the jobs being more than the client may ever queue at once.
+    @attribute retry_after: The estimated seconds before a retry can be admitted, or
+    None when no retry can be.
+    @attribute reason: "queue_full", "client_queue_full", "client_busy" or
+    "too_many_jobs".
+    """
+
+    def __init__(self, message: str, retry_after: Optional[int], reason: str):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+@dataclass
+class _ClientQueue(Generic[T]):
+    # The queued jobs of a client, with their finish tags and enqueue times.
+    weight: float
+    jobs: Deque[Tuple[float, float, T]] = field(default_factory=deque)
+    last_finish: float = 0.0
+    in_flight: int = 0
+
+
+class FairQueue(Generic[T]):
+    """
+    Queue of the pipeline jobs shared fairly between the clients, by weighted fair
+    queuing: each job is tagged with the virtual time it would finish at if every
+    client with queued jobs were served at the rate of its weight, and the workers take
+    the job with the smallest tag. A client scripting uploads then only delays its own
+    jobs. Each client is also limited in jobs queued and in jobs running at once.
+    @attribute max_size: The maximum number of jobs queued for all clients.
+    @attribute client_max_queued: The maximum number of jobs queued per client.
+    @attribute client_max_in_flight: The maximum number of jobs run at once per client.
+    @attribute concurrency: The number of workers taking jobs, for the retry estimates.
+    @attribute weights: The weight of each client, 1 for the ones not listed.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        client_max_queued: int,
+        client_max_in_flight: int,
+        concurrency: int,
+        weights: Optional[Dict[str, float]] = None,
+    ):
+        self.max_size = max_size
+        self.client_max_queued = client_max_queued
+        self.client_max_in_flight = client_max_in_flight
+        self.concurrency = concurrency
+        self.weights = weights or {}
+        self._clients: Dict[str, _ClientQueue[T]] = {}
+        self._size = 0
+        self._in_flight = 0
+        self._virtual_time = 0.0
+        self._job_seconds = DEFAULT_JOB_SECONDS
+        self._getters: Set[asyncio.Future] = set()
+        self._counters = {"admitted": 0, "rejected": 0, "completed": 0}
+
+    def qsize(self) -> int:
+        return self._size
+
+    def free_slots(self, client: Optional[str] = None) -> int:
+        """
+        The number of jobs that can still be queued, for everyone or for a client.
+        """
+        free = self.max_size - self._size
+        if client is not None:
+            queue = self._clients.get(client)
+            queued = len(queue.jobs) if queue else 0
+            free = min(free, self.client_max_queued - queued)
+        return max(0, free)
+
+    def check(self, client: str, count: int = 1) -> None:
+        """
+        Check that a client can queue jobs, without queuing them.
+        @param client: The client queuing the jobs.
+        @param count: The number of jobs.
+        @raise AdmissionError: If the queue of the pipeline or of the client is full.
+        """
+        limit = min(self.max_size, self.client_max_queued)
+        if count > limit:
+            self._reject(
+                f"At most {limit} distinct resumes can be processed at once",
+                None,
+                "too_many_jobs",
+            )
+        if self.max_size - self._size < count:
+            self._reject(
+                "Too many resumes are being processed",
+                self.retry_after(),
+                "queue_full",
+            )
+        if self.free_slots(client) < count:
+            self._reject(
+                "Too many of your resumes are being processed",
+                self.retry_after(client),
+                "client_queue_full",
+            )
+
+    def put_nowait(self, item: T, client: str, cost: float = 1.0) -> None:
+        """
+        Queue a job without waiting.
+        @param item: The job.
+        @param client: The client the job is for.
+        @param cost: The work of the job relative to the others, e.g. its number of
+        resumes; a client is served the same cost per unit of weight as the others.
+        @raise AdmissionError: If the queue of the pipeline or of the client is full.
+        """
+        self.check(client)
+        queue = self._clients.get(client)
+        if queue is None:
+            queue = self._clients[client] = _ClientQueue(self.weights.get(client, 1.0))
+        start = max(self._virtual_time, queue.last_finish)
+        queue.last_finish = start + cost / queue.weight
+        queue.jobs.append((queue.last_finish, time.monotonic(), item))
+        self._size += 1
+        self._counters["admitted"] += 1
+        self._wake()
+
+    async def get(self) -> Tuple[str, T]:
+        """
+        Wait for the job to run next: the one with the smallest finish tag among the
+        clients below their in-flight limit. task_done must be called once it ends.
+        @return: The client of the job and the job.
+        """
+        while True:
+            picked = self._pick()
+            if picked is not None:
+                return picked
+            waiter = asyncio.get_running_loop().create_future()
+            self._getters.add(waiter)
+            try:
+                await waiter
+            finally:
+                self._getters.discard(waiter)
+
+    def task_done(self, client: str, seconds: float) -> None:
+        """
+        Record the end of a job taken with get.
+        @param client: The client of the job.
+        @param seconds: The time the job took, for the retry estimates.
+        """
+        self._in_flight -= 1
+        self._counters["completed"] += 1
+        self._job_seconds += JOB_SECONDS_SMOOTHING * (seconds - self._job_seconds)
+        queue = self._clients.get(client)
+        if queue is not None:
+            queue.in_flight -= 1
+            self._forget_if_idle(client, queue)
+        self._wake()
+
+    def hold(self, client: str) -> None:
+        """
+        Count work run outside the queue, like a streamed generation, as a job in flight
+        for a client until release is called: it takes one of the client's slots, so the
+        client's queued jobs wait for it like for any other.
+        @param client: The client running the work.
+        @raise AdmissionError: If the client already runs as many jobs as it may.
+        """
+        queue = self._clients.get(client)
+        if queue is not None and queue.in_flight >= self.client_max_in_flight:
+            self._reject(
+                "Too many of your resumes are being processed",
+                self.retry_after(client),
+                "client_busy",
+            )
+        if queue is None:
+            queue = self._clients[client] = _ClientQueue(self.weights.get(client, 1.0))
+        queue.in_flight += 1
+        self._counters["admitted"] += 1
+
+    def release(self, client: str) -> None:
+        """
+        End the work counted by hold.
+        """
+        queue = self._clients.get(client)
+        if queue is not None:
+            queue.in_flight -= 1
+            self._forget_if_idle(client, queue)
+        self._wake()
+
+    def retry_after(self, client: Optional[str] = None) -> int:
+        """
+        Estimate when a queue slot frees up: a job starts about every mean job
+        duration divided by the jobs run at once, all the workers for the pipeline,
+        the in-flight limit for a client.
+        @param client: The client, or None for the queue of the pipeline.
+        @return: The whole seconds to wait, at least 1.
+        """
+        concurrency = self.concurrency
+        if client is not None:
+            concurrency = min(concurrency, self.client_max_in_flight)
+        return max(1, math.ceil(self._job_seconds / max(1, concurrency)))
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            **self._counters,
+            "queued": self._size,
+            "in_flight": self._in_flight,
+            "clients": len(self._clients),
+            "mean_job_seconds": self._job_seconds,
+        }
+
+    def _reject(self, message: str, retry_after: Optional[int], reason: str) -> None:
+        self._counters["rejected"] += 1
+        ADMISSION_REJECTIONS.labels(reason).inc()
+        raise AdmissionError(message, retry_after, reason)
+
+    def _pick(self) -> Optional[Tuple[str, T]]:
+        best: Optional[Tuple[float, str]] = None
+        for client, queue in self._clients.items():
+            if not queue.jobs or queue.in_flight >= self.client_max_in_flight:
+                continue
+            finish = queue.jobs[0][0]
+            if best is None or finish < best[0]:
+                best = (finish, client)
+        if best is None:
+            return None
+        finish, client = best
+        queue = self._clients[client]
+        _, enqueued_at, item = queue.jobs.popleft()
+        queue.in_flight += 1
+        self._size -= 1
+        self._in_flight += 1
+        self._virtual_time = finish
+        ADMISSION_WAIT.observe(time.monotonic() - enqueued_at)
+        return client, item
+
+    def _forget_if_idle(self, client: str, queue: _ClientQueue[T]) -> None:
+        # A client coming back later starts at the current virtual time anyway.
+        if not queue.jobs and queue.in_flight <= 0:
+            del self._clients[client]
+
+    def _wake(self) -> None:
+        for waiter in self._getters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+
+class StageLimiter:
+    """
+    Caps the resumes in each processing stage at once across the process, so a burst
+    in one stage (Docling, OpenAI, WeasyPrint) cannot take every worker.
+    @attribute limits: The maximum in flight for each capped stage. The other stages,
+    and the ones capped at 0, are not limited.
+    """
+
+    def __init__(self, limits: Dict[str, int]):
+        self.limits = {stage: limit for stage, limit in limits.items() if limit > 0}
+        self._semaphores = {
+            stage: asyncio.Semaphore(limit) for stage, limit in self.limits.items()
+        }
+        self._waiting = dict.fromkeys(self.limits, 0)
+        self._in_flight = dict.fromkeys(self.limits, 0)
+
+    @asynccontextmanager
+    async def slot(self, stage: str) -> AsyncIterator[None]:
+        """
+        Hold a slot of a stage for the duration of the block, waiting for one if the
+        stage is at its cap.
+        @param stage: The name of the stage.
+        """
+        semaphore = self._semaphores.get(stage)
+        if semaphore is None:
+            yield
+            return
+        self._waiting[stage] += 1
+        started = time.monotonic()
+        try:
+            await semaphore.acquire()
+        finally:
+            self._waiting[stage] -= 1
+        STAGE_SLOT_WAIT.labels(stage).observe(time.monotonic() - started)
+        self._in_flight[stage] += 1
+        try:
+            yield
+        finally:
+            self._in_flight[stage] -= 1
+            semaphore.release()
+
+    def stats(self) -> Dict[str, int]:
+        stats = {}
+        for stage in self.limits:
+            stats[f"{stage}_in_flight"] = self._in_flight[stage]
+            stats[f"{stage}_waiting"] = self._waiting[stage]
+        return stats
@@ -0,0 +1,46 @@
+import asyncio
+import logging
+from typing import Optional
+from app.storage.artifacts import IArtifactStore
+
+logger = logging.getLogger(__name__)
+
+
+class GarbageCollector:
+    """
+    Collects the garbage of the artifact store in the background: once at startup,
+    then every interval, in a thread as it walks the store.
+    @attribute store: The artifact store.
+    @attribute interval: The seconds between two collections.
+    """
+
+    def __init__(self, store: IArtifactStore, interval: float):
+        self.store = store
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run(), name="artifact-gc")
+
+    async def shutdown(self) -> None:
+        """
+        Stop collecting. A collection already running finishes in its thread.
+        """
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                collected = await asyncio.to_thread(self.store.collect_garbage)
+            except Exception:
+                logger.exception("Collecting the artifacts failed")
+            else:
+                if collected["removed"]:
+                    logger.info(
+                        "Removed %d artifacts, freeing %d bytes",
+                        collected["removed"],
+                        collected["freed_bytes"],
+                    )
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,246 @@
+import asyncio
+import logging
+import time
+from contextlib import AbstractAsyncContextManager
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Protocol, Tuple
+from app.observability.tracing import resume_context, span
+from app.services.resume import IResumeService
+from app.utils.file_utils import IngestedFile
+from app.workers.admission import FairQueue
+
+logger = logging.getLogger(__name__)
+
+
+class IPipelineJob(Protocol):
+    """
+    Interface for the jobs run by the pipeline.
+    """
+
+    @property
+    def resume_ids(self) -> List[int]:
+        """
+        The ids of the resumes the job processes.
+        """
+        ...
+
+    async def run(
+        self, service: IResumeService, batch_limit: Optional[asyncio.Semaphore]
+    ) -> None:
+        """
+        Process the resumes of the job.
+        @param service: The service of the job, with its own database session.
+        @param batch_limit: Bounds the generations run at once by the batch jobs.
+        """
+        ...
+
+    def discard(self) -> None:
+        """
+        Release what the job holds once it ends, whatever its outcome.
+        """
+        ...
+
+
+@dataclass
+class PipelineJob(IPipelineJob):
+    """
+    A resume waiting to be processed by the pipeline.
+    @attribute resume_id: The id of the resume row created for the upload.
+    @attribute file: The uploaded file. Discarded once the job ends.
+    @attribute job_title: The job title the user is applying for.
+    """
+
+    resume_id: int
+    file: IngestedFile
+    job_title: str
+
+    @property
+    def resume_ids(self) -> List[int]:
+        return [self.resume_id]
+
+    async def run(
+        self, service: IResumeService, batch_limit: Optional[asyncio.Semaphore]
+    ) -> None:
+        await service.process(self.resume_id, self.file, self.job_title)
+
+    def discard(self) -> None:
+        self.file.discard()
+
+
+@dataclass
+class BatchPipelineJob(IPipelineJob):
+    """
+    A file of a batch waiting to be processed by the pipeline, for all of its job
+    titles at once.
+    @attribute file: The uploaded file. Discarded once the job ends.
+    @attribute targets: The (resume id, job title) pairs created for the file.
+    """
+
+    file: IngestedFile
+    targets: List[Tuple[int, str]]
+
+    @property
+    def resume_ids(self) -> List[int]:
+        return [resume_id for resume_id, _ in self.targets]
+
+    async def run(
+        self, service: IResumeService, batch_limit: Optional[asyncio.Semaphore]
+    ) -> None:
+        await service.process_batch(self.file, self.targets, batch_limit)
+
+    def discard(self) -> None:
+        self.file.discard()
+
+
+@dataclass
+class RetargetPipelineJob(IPipelineJob):
+    """
+    A resume created from an existing one for another job title, waiting for its
+    feedback. The extracted html of the source is reused, so there is no file.
+    @attribute resume_id: The id of the resume row created for the new job title.
+    @attribute source_id: The id of the resume whose extracted html is reused.
+    @attribute job_title: The new job title.
+    """
+
+    resume_id: int
+    source_id: int
+    job_title: str
+
+    @property
+    def resume_ids(self) -> List[int]:
+        return [self.resume_id]
+
+    async def run(
+        self, service: IResumeService, batch_limit: Optional[asyncio.Semaphore]
+    ) -> None:
+        await service.process_retarget(self.resume_id, self.source_id, self.job_title)
+
+    def discard(self) -> None:
+        pass
+
+
+class ResumePipeline:
+    """
+    Bounded pool of background workers processing uploaded resumes.
+    Jobs are queued and the request returns immediately; each worker opens its own
+    service (and database session) per job and records the stage on the resume row.
+    The queue is shared fairly between the clients (see FairQueue), each job costing
+    its number of resumes.
+    @attribute service_factory: Callable returning an async context manager yielding a service.
+    @attribute workers: The number of jobs processed concurrently.
+    @attribute queue_size: The maximum number of jobs waiting to be processed.
+    @attribute batch_concurrency: The maximum number of generations run at once for all
+    the batches together, so that batches leave room for single uploads.
+    @attribute client_max_queued: The maximum number of jobs waiting per client.
+    @attribute client_max_in_flight: The maximum number of jobs processed concurrently
+    per client.
+    @attribute client_weights: The share of the workers of each client, relative to the
+    others; 1 for the ones not listed.
+    """
+
+    def __init__(
+        self,
+        service_factory: Callable[[], AbstractAsyncContextManager[IResumeService]],
+        workers: int,
+        queue_size: int,
+        batch_concurrency: int,
+        client_max_queued: Optional[int] = None,
+        client_max_in_flight: Optional[int] = None,
+        client_weights: Optional[Dict[str, float]] = None,
+    ):
+        self.service_factory = service_factory
+        self.workers = workers
+        self.queue_size = queue_size
+        self.batch_concurrency = batch_concurrency
+        self.client_max_queued = client_max_queued or queue_size
+        self.client_max_in_flight = client_max_in_flight or workers
+        self.client_weights = client_weights or {}
+        self._queue: FairQueue[IPipelineJob] = FairQueue(
+            queue_size,
+            self.client_max_queued,
+            self.client_max_in_flight,
+            workers,
+            self.client_weights,
+        )
+        self._tasks: List[asyncio.Task] = []
+        self._batch_limit: Optional[asyncio.Semaphore] = None
+
+    def start(self) -> None:
+        """
+        Spawn the worker tasks on the running event loop.
+        """
+        self._batch_limit = asyncio.Semaphore(self.batch_concurrency)
+        for i in range(self.workers):
+            self._tasks.append(
+                asyncio.create_task(self._worker(), name=f"resume-pipeline-{i}")
+            )
+
+    async def shutdown(self) -> None:
+        """
+        Cancel the workers. Jobs still queued are dropped and stay in their last status.
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def submit(self, job: IPipelineJob, client: str = "") -> None:
+        """
+        Queue a job without waiting.
+        @param job: The job to queue.
+        @param client: The client the job is for.
+        @raise AdmissionError: If the queue of the pipeline or of the client is full.
+        """
+        self._queue.put_nowait(job, client, len(job.resume_ids))
+
+    def admit(self, client: str = "", jobs: int = 1) -> None:
+        """
+        Check that jobs of a client would be queued, before doing the work of creating
+        them.
+        @param client: The client the jobs are for.
+        @param jobs: The number of jobs.
+        @raise AdmissionError: If the queue of the pipeline or of the client is full.
+        """
+        self._queue.check(client, jobs)
+
+    def hold(self, client: str = "") -> Callable[[], None]:
+        """
+        Take one of the client's in-flight slots for work run outside the pipeline,
+        like a streamed generation.
+        @param client: The client running the work.
+        @return: Releases the slot; calling it again does nothing.
+        @raise AdmissionError: If the client already runs as many jobs as it may.
+        """
+        self._queue.hold(client)
+        released = False
+
+        def release() -> None:
+            nonlocal released
+            if not released:
+                released = True
+                self._queue.release(client)
+
+        return release
+
+    def qsize(self) -> int:
+        return self._queue.qsize()
+
+    def free_slots(self, client: Optional[str] = None) -> int:
+        return self._queue.free_slots(client)
+
+    def stats(self) -> Dict[str, float]:
+        return {**self._queue.stats(), "workers": self.workers}
+
+    async def _worker(self) -> None:
+        while True:
+            client, job = await self._queue.get()
+            started = time.monotonic()
+            try:
+                with resume_context(*job.resume_ids), span("pipeline"):
+                    async with self.service_factory() as service:
+                        await job.run(service, self._batch_limit)
+            except Exception:
+                logger.exception("Processing of resumes %s failed", job.resume_ids)
+            finally:
+                job.discard()
+                self._queue.task_done(client, time.monotonic() - started)
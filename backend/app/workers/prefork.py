@@ -0,0 +1,25 @@
+"""
+Preloaded by the fork server of the pre-fork mode (see enable_prefork): importing it
+runs the initializers of the worker pools once in the server, so the workers forked
+from it inherit their state instead of each building it.
+"""
+
+import logging
+import os
+from importlib import import_module
+from app.workers.process_pool import PREFORK_ENV
+
+logger = logging.getLogger(__name__)
+
+
+def preload() -> None:
+    for target in filter(None, os.environ.get(PREFORK_ENV, "").split(",")):
+        module, name = target.split(":")
+        try:
+            getattr(import_module(module), name)()
+        except Exception:
+            # The workers then build the state themselves, as without pre-forking.
+            logger.exception("Could not preload %s", target)
+
+
+preload()
@@ -0,0 +1,368 @@
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from multiprocessing.connection import Connection
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from app.observability.metrics import WORKER_JOB_PEAK_RSS, WORKER_RECYCLES
+from app.utils.memory import current_rss, peak_rss, reset_peak_rss
+
+logger = logging.getLogger(__name__)
+
+# The module preloaded by the fork server of the pre-fork mode, and the environment
+# variable telling it which initializers to run.
+PREFORK_MODULE = "app.workers.prefork"
+PREFORK_ENV = "RESUME_BUILDER_PREFORK_INITIALIZERS"
+
+
+class PoolError(Exception):
+    """
+    Base class of the errors raised by WarmProcessPool.
+    """
+
+
+class PoolBusyError(PoolError):
+    """
+    Raised when the submission queue stays full for longer than the queue timeout.
+    """
+
+
+class PoolTimeoutError(PoolError):
+    """
+    Raised when a job runs longer than the job timeout. The worker is killed and respawned.
+    """
+
+
+class WorkerJobError(PoolError):
+    """
+    Raised when a job fails inside the worker, or the worker dies while running it.
+    """
+
+
+def _worker_main(
+    conn: Connection,
+    initializer: Callable[[], Any],
+    handler: Callable[..., Any],
+    warm: Any,
+) -> None:
+    state = initializer()
+    warm.set()
+    conn.send(("ready", None, None))
+    while True:
+        try:
+            args = conn.recv()
+        except EOFError:
+            return
+        if args is None:
+            return
+        # The memory of the worker around each job: the peak reached while it ran and
+        # the resident memory it left behind.
+        rss_before = current_rss()
+        reset_peak_rss()
+        try:
+            status, value = "ok", handler(state, *args)
+        except Exception as e:
+            status, value = "error", f"{type(e).__name__}: {e}"
+        rss = current_rss()
+        memory = {"rss": rss, "peak_rss": peak_rss(), "rss_growth": rss - rss_before}
+        conn.send((status, value, memory))
+
+
+class _Worker:
+    def __init__(self, process: multiprocessing.Process, conn: Connection, warm: Any):
+        self.process = process
+        self.conn = conn
+        # Set by the worker once its state is built, readable without touching conn.
+        self.warm = warm
+        self.ready = False
+        self.jobs = 0
+
+
+class WarmProcessPool:
+    """
+    Pool of pre-started worker processes. Each worker runs the initializer once to
+    build its warm state (e.g. a loaded model) and then runs handler(state, *args)
+    for every job it receives. Submitting blocks the calling thread until the job ends.
+    @attribute name: The name of the pool, used for logging and process names.
+    @attribute initializer: Importable function building the state of a worker.
+    @attribute handler: Importable function running a job against the worker state.
+    @attribute size: The number of worker processes.
+    @attribute queue_size: The number of jobs allowed to wait for a free worker.
+    @attribute job_timeout: Seconds a job may run before its worker is killed.
+    @attribute queue_timeout: Seconds a submission waits for room in the queue.
+    @attribute startup_timeout: Seconds a new worker may take to run the initializer.
+    @attribute max_jobs_per_worker: The jobs after which a worker is recycled; 0 for no
+    limit.
+    @attribute max_worker_rss: The resident bytes above which a worker is recycled once
+    its job ends, as the heaps of Docling and WeasyPrint only grow; 0 for no limit.
+    Recycling replaces the worker by a new one between two jobs instead of waiting for
+    the OOM killer to take it in the middle of one.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initializer: Callable[[], Any],
+        handler: Callable[..., Any],
+        size: int,
+        queue_size: int,
+        job_timeout: float,
+        queue_timeout: float = 30.0,
+        startup_timeout: float = 600.0,
+        max_jobs_per_worker: int = 0,
+        max_worker_rss: int = 0,
+    ):
+        self.name = name
+        self.initializer = initializer
+        self.handler = handler
+        self.size = size
+        self.queue_size = queue_size
+        self.job_timeout = job_timeout
+        self.queue_timeout = queue_timeout
+        self.startup_timeout = startup_timeout
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.max_worker_rss = max_worker_rss
+        # Spawned rather than forked: the parent may hold threads and native state
+        # (torch, cairo) that must not be duplicated into the children. enable_prefork
+        # forks them from a clean server instead.
+        self._context = multiprocessing.get_context("spawn")
+        self._slots = threading.BoundedSemaphore(size + queue_size)
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._workers: List[_Worker] = []
+        self._lock = threading.Lock()
+        self._started = False
+        self._counters = {
+            "completed": 0,
+            "failed": 0,
+            "timeouts": 0,
+            "restarts": 0,
+            "recycled_max_jobs": 0,
+            "recycled_max_rss": 0,
+        }
+        self._memory = {
+            "last_job_peak_rss_bytes": 0,
+            "max_job_peak_rss_bytes": 0,
+            "last_job_rss_growth_bytes": 0,
+            "last_worker_rss_bytes": 0,
+            "max_worker_rss_bytes": 0,
+        }
+        self._in_flight = 0
+
+    def start(self) -> None:
+        """
+        Spawn the workers. They warm up in the background; calling it again is a no-op.
+        """
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            for _ in range(self.size):
+                self._idle.put(self._spawn())
+
+    def shutdown(self) -> None:
+        """
+        Ask the workers to exit and wait for them, killing those that do not.
+        """
+        with self._lock:
+            workers, self._workers = self._workers, []
+            self._started = False
+        for worker in workers:
+            try:
+                worker.conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for worker in workers:
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                worker.process.kill()
+                worker.process.join()
+            worker.conn.close()
+        self._idle = queue.Queue()
+
+    def wait_ready(self, timeout: Optional[float] = None) -> None:
+        """
+        Start the pool if needed and wait for every worker to have built its warm state.
+        @param timeout: Seconds to wait, startup_timeout by default.
+        @raise PoolTimeoutError: If a worker is still starting after the timeout.
+        """
+        self.start()
+        deadline = time.monotonic() + (
+            self.startup_timeout if timeout is None else timeout
+        )
+        with self._lock:
+            workers = list(self._workers)
+        for worker in workers:
+            if not worker.warm.wait(max(0.0, deadline - time.monotonic())):
+                raise PoolTimeoutError(f"The {self.name} workers did not start in time")
+
+    def submit(self, *args: Any) -> Any:
+        """
+        Run a job on a warm worker, waiting for a free one if needed.
+        @param args: The arguments passed to the handler after the worker state.
+        @return: The value returned by the handler.
+        @raise PoolBusyError: If the queue is full for longer than queue_timeout.
+        @raise PoolTimeoutError: If the job runs longer than job_timeout.
+        @raise WorkerJobError: If the job raised or the worker died.
+        """
+        self.start()
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise PoolBusyError(f"The {self.name} pool is saturated")
+        try:
+            worker = self._idle.get()
+            with self._lock:
+                self._in_flight += 1
+            try:
+                return self._run(worker, args)
+            finally:
+                with self._lock:
+                    self._in_flight -= 1
+        finally:
+            self._slots.release()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "size": self.size,
+                "in_flight": self._in_flight,
+                "idle": self._idle.qsize(),
+                **self._counters,
+                **self._memory,
+            }
+
+    def _run(self, worker: _Worker, args: tuple) -> Any:
+        try:
+            if not worker.ready:
+                if not worker.conn.poll(self.startup_timeout):
+                    raise TimeoutError("worker did not start in time")
+                worker.conn.recv()
+                worker.ready = True
+            worker.conn.send(args)
+            if not worker.conn.poll(self.job_timeout):
+                self._replace(worker, "timeouts")
+                raise PoolTimeoutError(
+                    f"The {self.name} job did not finish in {self.job_timeout}s"
+                )
+            status, value, memory = worker.conn.recv()
+        except PoolTimeoutError:
+            raise
+        except (EOFError, OSError, TimeoutError) as e:
+            self._replace(worker, "failed")
+            raise WorkerJobError(f"The {self.name} worker died: {e}")
+        worker.jobs += 1
+        self._record_memory(memory)
+        reason = self._recycle_reason(worker, memory)
+        if reason:
+            self._recycle(worker, reason, memory)
+        else:
+            self._idle.put(worker)
+        with self._lock:
+            if status == "ok":
+                self._counters["completed"] += 1
+                return value
+            self._counters["failed"] += 1
+        raise WorkerJobError(value)
+
+    def _record_memory(self, memory: Dict[str, int]) -> None:
+        WORKER_JOB_PEAK_RSS.labels(self.name).observe(memory["peak_rss"])
+        with self._lock:
+            stats = self._memory
+            stats["last_job_peak_rss_bytes"] = memory["peak_rss"]
+            stats["last_job_rss_growth_bytes"] = memory["rss_growth"]
+            stats["last_worker_rss_bytes"] = memory["rss"]
+            stats["max_job_peak_rss_bytes"] = max(
+                stats["max_job_peak_rss_bytes"], memory["peak_rss"]
+            )
+            stats["max_worker_rss_bytes"] = max(
+                stats["max_worker_rss_bytes"], memory["rss"]
+            )
+
+    def _recycle_reason(self, worker: _Worker, memory: Dict[str, int]) -> str:
+        if self.max_worker_rss and memory["rss"] > self.max_worker_rss:
+            return "max_rss"
+        if self.max_jobs_per_worker and worker.jobs >= self.max_jobs_per_worker:
+            return "max_jobs"
+        return ""
+
+    def _recycle(self, worker: _Worker, reason: str, memory: Dict[str, int]) -> None:
+        # The replacement starts warming up at once; the old worker is idle and exits
+        # on its own, in the background so the job result is not held back.
+        logger.info(
+            "Recycling a %s worker after %d jobs at %d MiB resident (%s)",
+            self.name,
+            worker.jobs,
+            memory["rss"] // 2**20,
+            reason,
+        )
+        WORKER_RECYCLES.labels(self.name, reason).inc()
+        with self._lock:
+            self._counters[f"recycled_{reason}"] += 1
+            if worker in self._workers:
+                self._workers.remove(worker)
+            replacement = self._spawn()
+        self._idle.put(replacement)
+        threading.Thread(
+            target=self._retire, args=(worker,), name=f"{self.name}-retire", daemon=True
+        ).start()
+
+    @staticmethod
+    def _retire(worker: _Worker) -> None:
+        try:
+            worker.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        worker.process.join(timeout=5)
+        if worker.process.is_alive():
+            worker.process.kill()
+            worker.process.join()
+        worker.conn.close()
+
+    def _spawn(self) -> _Worker:
+        parent_conn, child_conn = self._context.Pipe()
+        warm = self._context.Event()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(child_conn, self.initializer, self.handler, warm),
+            name=f"{self.name}-worker",
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        worker = _Worker(process, parent_conn, warm)
+        self._workers.append(worker)
+        return worker
+
+    def _replace(self, worker: _Worker, counter: str) -> None:
+        logger.warning("Restarting a %s worker (%s)", self.name, counter)
+        worker.process.kill()
+        worker.process.join()
+        worker.conn.close()
+        with self._lock:
+            self._counters[counter] += 1
+            self._counters["restarts"] += 1
+            if worker in self._workers:
+                self._workers.remove(worker)
+            replacement = self._spawn()
+        self._idle.put(replacement)
+
+
+def enable_prefork(pools: Iterable[WarmProcessPool]) -> None:
+    """
+    Start the workers of the pools from a fork server instead of spawning them. The
+    server runs the initializers of the pools once, and every worker forked from it
+    then shares their state (e.g. the loaded models) copy-on-write instead of building
+    its own, which cuts the startup time and memory of each worker. Forking from the
+    server rather than from the API process keeps its threads out of the workers.
+    Unix only; must be called before any of the pools starts.
+    @param pools: The pools whose workers are forked from the server.
+    """
+    pools = list(pools)
+    os.environ[PREFORK_ENV] = ",".join(
+        f"{pool.initializer.__module__}:{pool.initializer.__qualname__}"
+        for pool in pools
+    )
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload([PREFORK_MODULE])
+    for pool in pools:
+        pool._context = context
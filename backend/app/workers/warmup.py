@@ -0,0 +1,52 @@
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Warmup:
+    """
+    Loads the heavy subsystems (Docling and its models, WeasyPrint, the worker pools)
+    in the background once the server is up, so the process starts accepting
+    connections right away and the readiness probe holds traffic back until the first
+    requests no longer pay for the loading.
+    @attribute steps: The function loading each subsystem, by name. They run one after
+    the other in a thread.
+    @attribute status: The status of each subsystem: pending, loading, ready or failed.
+    """
+
+    def __init__(self, steps: Dict[str, Callable[[], Any]]):
+        self.steps = steps
+        self.status: Dict[str, str] = dict.fromkeys(steps, "pending")
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        return all(status == "ready" for status in self.status.values())
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run(), name="warmup")
+
+    async def shutdown(self) -> None:
+        """
+        Stop the warmup. A step already running finishes in its thread.
+        """
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def _run(self) -> None:
+        for name, step in self.steps.items():
+            self.status[name] = "loading"
+            start = time.perf_counter()
+            try:
+                await asyncio.to_thread(step)
+            except Exception:
+                # Left unready: the probe keeps failing and the error is in the logs.
+                self.status[name] = "failed"
+                logger.exception("Warming up %s failed", name)
+                continue
+            self.status[name] = "ready"
+            logger.info("Warmed up %s in %.2fs", name, time.perf_counter() - start)
@@ -0,0 +1,228 @@
+import html
+import io
+import os
+import zipfile
+import zlib
+from typing import Dict, List, Tuple
+
+# The resume every fixture is built from, so the formats can be compared with each
+# other. Extra positions make the resume longer without changing its shape.
+NAME = "Jordan Example"
+CONTACT = "jordan@example.com | +1 555 0100 | Lisbon, Portugal"
+SUMMARY = (
+    "Backend engineer with eight years of experience building APIs, data pipelines "
+    "and internal tooling. Comfortable owning services from design to on-call."
+)
+POSITION = [
+    "Senior Software Engineer, Example Corp, 2021 - present",
+    "- Led the migration of the billing services to an event-driven architecture.",
+    "- Cut the p95 latency of the public API from 480 ms to 120 ms.",
+    "- Mentored four engineers and ran the backend hiring loop.",
+]
+EDUCATION = ["BSc Computer Science, University of Example, 2016"]
+SKILLS = ["Python, FastAPI, PostgreSQL, Redis, Kafka, Docker, Kubernetes, AWS"]
+
+# The kinds of fixture built by build_corpus.
+KINDS = ("html", "pdf", "docx", "scanned")
+
+
+def resume_sections(positions: int = 3) -> List[Tuple[str, List[str]]]:
+    """
+    The sections of the fixture resume.
+    @param positions: The number of positions listed in the experience section.
+    @return: (heading, lines) pairs, the first one holding the name and contact.
+    """
+    return [
+        (NAME, [CONTACT]),
+        ("Summary", [SUMMARY]),
+        ("Experience", POSITION * positions),
+        ("Education", EDUCATION),
+        ("Skills", SKILLS),
+    ]
+
+
+def resume_html(positions: int = 3) -> str:
+    """
+    The fixture resume as HTML.
+    """
+    parts = ["<html><head><title>Resume</title></head><body>"]
+    for i, (heading, lines) in enumerate(resume_sections(positions)):
+        tag = "h1" if i == 0 else "h2"
+        parts.append(f"<{tag}>{html.escape(heading)}</{tag}>")
+        items = [line for line in lines if line.startswith("- ")]
+        for line in lines:
+            if not line.startswith("- "):
+                parts.append(f"<p>{html.escape(line)}</p>")
+        if items:
+            parts.append(
+                "<ul>"
+                + "".join(f"<li>{html.escape(item[2:])}</li>" for item in items)
+                + "</ul>"
+            )
+    parts.append("</body></html>")
+    return "".join(parts)
+
+
+def _pdf(pages: List[bytes], resources: bytes, xobjects: List[bytes] = ()) -> bytes:
+    # A minimal PDF: catalog, page tree, one Helvetica font, the XObjects, then a
+    # page and a content stream per page.
+    objects: List[bytes] = []
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    first_page = 4 + len(xobjects)
+    kids = " ".join(f"{first_page + 2 * i} 0 R" for i in range(len(pages)))
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>".encode())
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    objects.extend(xobjects)
+    for i, content in enumerate(pages):
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources "
+            + resources
+            + f" /Contents {first_page + 2 * i + 1} 0 R >>".encode()
+        )
+        objects.append(
+            f"<< /Length {len(content)} >>\nstream\n".encode()
+            + content
+            + b"\nendstream"
+        )
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode()
+    out += (
+        f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n"
+        f"startxref\n{xref}\n%%EOF\n"
+    ).encode()
+    return bytes(out)
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def resume_pdf(positions: int = 3) -> bytes:
+    """
+    The fixture resume as a PDF with a text layer, 48 lines per page.
+    """
+    lines = []
+    for heading, section in resume_sections(positions):
+        lines.extend(["", heading.upper(), *section])
+    pages = []
+    for start in range(0, len(lines), 48):
+        commands = ["BT", "/F1 10 Tf", "14 TL", "56 740 Td"]
+        for line in lines[start : start + 48]:
+            commands.append(f"({_pdf_escape(line)}) Tj T*")
+        commands.append("ET")
+        pages.append("\n".join(commands).encode("latin-1"))
+    return _pdf(pages, b"<< /Font << /F1 3 0 R >> >>")
+
+
+def scanned_pdf(width: int = 1275, height: int = 1650) -> bytes:
+    """
+    An image-only PDF standing for a scanned resume: a grayscale page at 150 dpi with
+    dark bars where the lines of text would be, so the OCR path runs.
+    """
+    rows = []
+    for y in range(height):
+        in_line = 150 <= y < height - 150 and (y // 12) % 2 == 0
+        row = bytearray(b"\xff" * width)
+        if in_line:
+            line_length = 700 + (y // 24 * 97) % 400
+            row[120 : 120 + line_length] = b"\x20" * line_length
+        rows.append(b"\x00" + bytes(row))  # PNG predictor byte per row: none.
+    data = zlib.compress(b"".join(rows), 6)
+    image = (
+        (
+            f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} "
+            f"/ColorSpace /DeviceGray /BitsPerComponent 8 /Filter /FlateDecode "
+            f"/DecodeParms << /Predictor 15 /Columns {width} >> /Length {len(data)} >>"
+            "\nstream\n"
+        ).encode()
+        + data
+        + b"\nendstream"
+    )
+    content = b"q 612 0 0 792 0 0 cm /Im1 Do Q"
+    return _pdf([content], b"<< /XObject << /Im1 4 0 R >> >>", [image])
+
+
+def resume_docx(positions: int = 3) -> bytes:
+    """
+    The fixture resume as a minimal DOCX, headings using the built-in styles.
+    """
+    paragraphs = []
+    for i, (heading, lines) in enumerate(resume_sections(positions)):
+        style = "Title" if i == 0 else "Heading1"
+        paragraphs.append(
+            f'<w:p><w:pPr><w:pStyle w:val="{style}"/></w:pPr>'
+            f"<w:r><w:t>{html.escape(heading)}</w:t></w:r></w:p>"
+        )
+        for line in lines:
+            paragraphs.append(
+                f'<w:p><w:r><w:t xml:space="preserve">{html.escape(line)}</w:t></w:r></w:p>'
+            )
+    document = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+        f"<w:body>{''.join(paragraphs)}</w:body></w:document>"
+    )
+    content_types = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+        "</Types>"
+    )
+    rels = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="word/document.xml"/>'
+        "</Relationships>"
+    )
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", content_types)
+        archive.writestr("_rels/.rels", rels)
+        archive.writestr("word/document.xml", document)
+    return buffer.getvalue()
+
+
+def build_corpus(directory: str, positions: int = 3) -> Dict[str, str]:
+    """
+    Write the fixture resumes to a directory. The files are generated, so the corpus
+    is the same on every machine without binaries in the repository.
+    @param directory: The directory to write the fixtures to.
+    @param positions: The number of positions listed in each resume.
+    @return: The path of each fixture, by kind.
+    """
+    os.makedirs(directory, exist_ok=True)
+    fixtures = {
+        "html": ("resume.html", resume_html(positions).encode("utf-8")),
+        "pdf": ("resume.pdf", resume_pdf(positions)),
+        "docx": ("resume.docx", resume_docx(positions)),
+        "scanned": ("resume_scanned.pdf", scanned_pdf()),
+    }
+    paths = {}
+    for kind, (filename, data) in fixtures.items():
+        path = os.path.join(directory, filename)
+        with open(path, "wb") as f:
+            f.write(data)
+        paths[kind] = path
+    return paths
+
+
+def load_corpus(directory: str) -> Dict[str, str]:
+    """
+    Use the resumes of a directory as the corpus instead, e.g. real, anonymised ones.
+    @param directory: The directory holding the resumes.
+    @return: The path of each resume, by file name.
+    """
+    return {
+        filename: os.path.join(directory, filename)
+        for filename in sorted(os.listdir(directory))
+        if os.path.isfile(os.path.join(directory, filename))
+    }
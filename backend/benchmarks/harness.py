@@ -0,0 +1,181 @@
+import asyncio
+import inspect
+import math
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List
+from app.utils.memory import peak_rss, reset_peak_rss
+
+
+@dataclass
+class StageResult:
+    """
+    The measurements of one benchmarked stage.
+    @attribute name: The name of the stage.
+    @attribute iterations: The number of measured calls, warmup excluded.
+    @attribute concurrency: The number of calls run at once.
+    @attribute p50: The median latency of a call, in seconds.
+    @attribute p95: The 95th percentile latency, in seconds.
+    @attribute p99: The 99th percentile latency, in seconds.
+    @attribute mean: The mean latency, in seconds.
+    @attribute throughput: The calls completed per second of wall time.
+    @attribute peak_rss: The peak resident set size of the process during the stage,
+    in bytes.
+    """
+
+    name: str
+    iterations: int
+    concurrency: int
+    p50: float
+    p95: float
+    p99: float
+    mean: float
+    throughput: float
+    peak_rss: int
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def summarize(
+    name: str,
+    samples: List[float],
+    elapsed: float,
+    concurrency: int = 1,
+    peak_rss: int = 0,
+) -> StageResult:
+    """
+    Build the result of a stage from its latency samples.
+    @param elapsed: The wall time taken by all the samples, in seconds.
+    """
+    return StageResult(
+        name=name,
+        iterations=len(samples),
+        concurrency=concurrency,
+        p50=percentile(samples, 0.50),
+        p95=percentile(samples, 0.95),
+        p99=percentile(samples, 0.99),
+        mean=sum(samples) / len(samples),
+        throughput=len(samples) / elapsed if elapsed > 0 else math.inf,
+        peak_rss=peak_rss,
+    )
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    """
+    The nearest-rank percentile of a list of samples.
+    @param samples: The samples, in any order.
+    @param fraction: The percentile, between 0 and 1.
+    @return: The smallest sample greater than or equal to that fraction of them.
+    """
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(fraction * len(ordered)))
+    return ordered[rank - 1]
+
+
+async def measure(
+    name: str,
+    call: Callable[[int], Any],
+    iterations: int,
+    warmup: int = 1,
+    concurrency: int = 1,
+) -> StageResult:
+    """
+    Time the calls to a stage. Coroutine functions are awaited, `concurrency` of them
+    at a time; plain functions are called one after the other on the event loop
+    thread, as their own latency is what is measured.
+    @param name: The name of the stage.
+    @param call: The stage, called with the index of the iteration.
+    @param iterations: The number of measured calls.
+    @param warmup: The number of calls made first and left out of the results.
+    @param concurrency: The number of coroutines run at once.
+    @return: The latency percentiles, throughput and peak RSS of the stage.
+    """
+    is_async = inspect.iscoroutinefunction(call)
+
+    async def timed(index: int) -> float:
+        started = time.perf_counter()
+        if is_async:
+            await call(index)
+        else:
+            call(index)
+        return time.perf_counter() - started
+
+    for index in range(warmup):
+        await timed(-1 - index)
+
+    reset_peak_rss()
+    started = time.perf_counter()
+    if is_async and concurrency > 1:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def bounded(index: int) -> float:
+            async with semaphore:
+                return await timed(index)
+
+        samples = list(await asyncio.gather(*(bounded(i) for i in range(iterations))))
+    else:
+        samples = [await timed(i) for i in range(iterations)]
+    elapsed = time.perf_counter() - started
+    return summarize(name, samples, elapsed, concurrency if is_async else 1, peak_rss())
+
+
+@dataclass
+class Regression:
+    """
+    A metric of a stage that got worse than the baseline by more than the threshold.
+    @attribute stage: The name of the stage.
+    @attribute metric: The name of the metric.
+    @attribute baseline: The value in the baseline.
+    @attribute current: The value in the current run.
+    @attribute change: The relative change, positive when worse.
+    """
+
+    stage: str
+    metric: str
+    baseline: float
+    current: float
+    change: float
+
+
+LATENCY_METRICS = ("p50", "p95", "p99")
+# The compared metrics, with whether a higher value is worse.
+COMPARED_METRICS = {**dict.fromkeys(LATENCY_METRICS, True), "throughput": False}
+
+
+def compare(
+    baseline: Dict[str, Dict[str, Any]],
+    current: Dict[str, Dict[str, Any]],
+    threshold: float,
+    memory_threshold: float,
+    noise_floor: float = 0.001,
+) -> List[Regression]:
+    """
+    Compare the stages of a run with a baseline. Stages missing from either side are
+    skipped.
+    @param baseline: The stage results of the baseline, by name.
+    @param current: The stage results of the current run, by name.
+    @param threshold: The tolerated relative change of the latencies and throughput.
+    @param memory_threshold: The tolerated relative change of the peak RSS.
+    @param noise_floor: Latencies growing by less than this many seconds are not
+    regressions, whatever their relative change, as sub-millisecond stages are noisy.
+    @return: The regressions found.
+    """
+    regressions = []
+    for name, result in current.items():
+        if name not in baseline:
+            continue
+        metrics = dict(COMPARED_METRICS, peak_rss=True)
+        for metric, higher_is_worse in metrics.items():
+            before, after = baseline[name][metric], result[metric]
+            if not before:
+                continue
+            if metric in LATENCY_METRICS and after - before < noise_floor:
+                continue
+            change = (after - before) / before
+            if not higher_is_worse:
+                change = -change
+            limit = memory_threshold if metric == "peak_rss" else threshold
+            if change > limit:
+                regressions.append(Regression(name, metric, before, after, change))
+    return regressions
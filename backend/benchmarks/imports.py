@@ -0,0 +1,64 @@
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List
+from benchmarks.harness import StageResult, summarize
+
+# The packages reported by the import stage, whether or not a run imports them, so a
+# heavy dependency coming back to the import path shows up against the baseline.
+SUBSYSTEMS = (
+    "app",
+    "fastapi",
+    "starlette",
+    "pydantic",
+    "sqlalchemy",
+    "sqlmodel",
+    "openai",
+    "httpx",
+    "prometheus_client",
+    "docling",
+    "torch",
+    "weasyprint",
+)
+
+
+def import_times(module: str) -> Dict[str, float]:
+    """
+    Import a module in a fresh interpreter under -X importtime, and add up the time
+    spent in the modules of each top-level package.
+    @param module: The module to import, e.g. app.main.
+    @return: The seconds spent in each package, only counting the code of its own
+    modules, and the whole import under "total".
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times: Dict[str, float] = defaultdict(float)
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:") :].split("|")
+        times[name.strip().split(".")[0]] += int(self_us) / 1_000_000
+    times["total"] = sum(times.values())
+    return times
+
+
+def measure_imports(module: str, iterations: int) -> List[StageResult]:
+    """
+    Time the cold import of a module, in total and by subsystem.
+    @param module: The module to import.
+    @param iterations: The number of fresh interpreters to import it in.
+    @return: One result per subsystem, named import.<package>.
+    """
+    samples: Dict[str, List[float]] = defaultdict(list)
+    for _ in range(iterations):
+        times = import_times(module)
+        for name in (*SUBSYSTEMS, "total"):
+            samples[name].append(times.get(name, 0.0))
+    return [
+        summarize(f"import.{name}", values, sum(values))
+        for name, values in samples.items()
+    ]
@@ -0,0 +1,398 @@
+"""
+Per-stage benchmarks of the resume pipeline, against a generated corpus of resumes and
+a local stub of the OpenAI API.
+
+    cd backend
+    python -m benchmarks.run --output benchmarks/baseline.json
+    python -m benchmarks.run --compare benchmarks/baseline.json --threshold 0.15
+
+Each stage reports its p50/p95/p99 latency, throughput and peak RSS. The import stage
+times `import app.main` in fresh interpreters, broken down by package, to keep the
+heavy dependencies off the startup path. With --output the
+results are saved as JSON; with --compare they are checked against such a file and the
+exit status is 1 when a stage regressed by more than the threshold. Baselines are only
+comparable on the same machine.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import tempfile
+from datetime import datetime, timezone
+from importlib.metadata import PackageNotFoundError, version
+from typing import Dict, List
+from benchmarks.corpus import build_corpus, load_corpus, resume_html
+from benchmarks.harness import StageResult, compare, measure
+from benchmarks.imports import measure_imports
+from benchmarks.stub_openai import StubOpenAIServer, stub_completion
+
+STAGES = (
+    "imports",
+    "extract",
+    "prompt",
+    "parse",
+    "similarity",
+    "generate",
+    "sectioned",
+    "pdf",
+    "repository",
+    "end_to_end",
+)
+JOB_TITLE = "Senior Backend Engineer"
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.run", description=__doc__.split("\n\n")[0]
+    )
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="uploads run at once in the end-to-end stage",
+    )
+    parser.add_argument(
+        "--corpus", help="directory of resumes to use instead of the generated ones"
+    )
+    parser.add_argument(
+        "--positions",
+        type=int,
+        default=3,
+        help="positions listed in the generated resumes, to scale their length",
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.5, help="delay of the OpenAI stub (s)"
+    )
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument(
+        "--tokens-per-second",
+        type=float,
+        default=0.0,
+        help="generation speed of the OpenAI stub, 0 to answer at once; the generate "
+        "stage needs it to tell the single and parallel modes apart",
+    )
+    parser.add_argument(
+        "--database-url", help="database of the repository stages; a temporary SQLite"
+    )
+    parser.add_argument("--output", help="save the results to this JSON file")
+    parser.add_argument("--compare", help="compare the results to this JSON baseline")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.15,
+        help="tolerated relative regression of the latencies and throughput",
+    )
+    parser.add_argument(
+        "--memory-threshold",
+        type=float,
+        default=0.25,
+        help="tolerated relative regression of the peak RSS",
+    )
+    parser.add_argument(
+        "--noise-floor",
+        type=float,
+        default=0.001,
+        help="latency increases below this many seconds are ignored",
+    )
+    return parser.parse_args(argv)
+
+
+def configure(args: argparse.Namespace, workdir: str, stub: StubOpenAIServer) -> None:
+    """
+    Point the settings at the stub and the working directory. Must run before the
+    application is imported, as the database engine is created on import.
+    """
+    database_url = args.database_url or f"sqlite:///{workdir}/benchmark.db"
+    os.environ.update(
+        DATABASE_URL=database_url,
+        DB_ECHO="false",
+        OPENAI_API_KEY="benchmark",
+        OPENAI_BASE_URL=stub.base_url,
+        UPLOAD_DIR=os.path.join(workdir, "uploads"),
+        AI_OUTPUT_DIR=os.path.join(workdir, "output"),
+    )
+
+
+def package_version(name: str) -> str:
+    try:
+        return version(name)
+    except PackageNotFoundError:
+        return "missing"
+
+
+async def run_stages(
+    args: argparse.Namespace, corpus: Dict[str, str], workdir: str
+) -> List[StageResult]:
+    from sqlmodel import SQLModel, create_engine
+    from app.ai.ai_client import AsyncOpenAIClient, build_feedback_prompt
+    from app.ai.chunking import SectionedGenerator
+    from app.ai.compaction import compact_html
+    from app.ai.similarity import NearDuplicateDetector
+    from app.db.session import engine
+    from app.dependencies.database import open_session
+    from app.dependencies.settings import get_settings
+    from app.dependencies.extractors import build_extractor_registry
+    from app.extractors.docling_extractor import docling_html
+    from app.generators.pdf_weasy_generator import PdfRenderEngine, generate_pdf
+    from app.models.resume import Resume, ResumeHtml
+    from app.repositories.resume import ResumeRepository
+    from app.services.resume import ResumeService
+    from app.storage.artifacts import LocalArtifactStore
+    from app.utils.file_utils import IngestedFile
+
+    settings = get_settings()
+    os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+    os.makedirs(settings.AI_OUTPUT_DIR, exist_ok=True)
+    SQLModel.metadata.create_all(create_engine(settings.DATABASE_URL))
+
+    html = resume_html(args.positions)
+    completion = stub_completion(args.positions)
+    ai_client = AsyncOpenAIClient(settings)
+    # Every cache is left out, so each call pays for the whole stage.
+    pdf_engine = PdfRenderEngine()
+    artifacts = LocalArtifactStore(settings.AI_OUTPUT_DIR, settings.UPLOAD_DIR)
+    extractors = build_extractor_registry(
+        fast=settings.FAST_EXTRACTION,
+        pdf_min_chars_per_page=settings.PDF_TEXT_MIN_CHARS_PER_PAGE,
+    )
+
+    def service(session) -> ResumeService:
+        return ResumeService(
+            ResumeRepository(session, settings.HTML_COMPRESSION_LEVEL),
+            session,
+            ai_client,
+            artifacts,
+            extractors,
+            pdf_engine,
+            settings.AI_PARALLEL_GENERATION,
+        )
+
+    results = []
+    n, warmup = args.iterations, args.warmup
+
+    if "imports" in args.stages:
+        results.extend(measure_imports("app.main", n))
+
+    if "extract" in args.stages:
+        # Each file through the registry, as uploads are, then through Docling alone
+        # for reference.
+        for name, path in corpus.items():
+            file = IngestedFile.from_path(path)
+            results.append(
+                await measure(
+                    f"extract.{name}",
+                    lambda _, file=file: extractors.extract(file),
+                    n,
+                    warmup,
+                )
+            )
+            results.append(
+                await measure(
+                    f"extract.{name}.docling",
+                    lambda _, file=file: docling_html(file),
+                    n,
+                    warmup,
+                )
+            )
+
+    if "prompt" in args.stages:
+        results.append(
+            await measure(
+                "prompt.build",
+                lambda _: build_feedback_prompt(html, JOB_TITLE),
+                n,
+                warmup,
+            )
+        )
+        results.append(
+            await measure("prompt.compact", lambda _: compact_html(html), n, warmup)
+        )
+
+    if "parse" in args.stages:
+        parser = service(None)
+        results.append(
+            await measure(
+                "parse", lambda _: parser.parse_ai_response(completion), n, warmup
+            )
+        )
+
+    if "similarity" in args.stages:
+        # The fingerprint computed on every upload, on the event loop.
+        detector = NearDuplicateDetector()
+        results.append(
+            await measure(
+                "similarity.fingerprint",
+                lambda _: detector.fingerprint(html),
+                n,
+                warmup,
+            )
+        )
+
+    if "generate" in args.stages:
+        # One completion holding both sections, then the two sections requested at
+        # once, against the stub generating at --tokens-per-second.
+        async def single(_: int) -> None:
+            service(None).parse_ai_response(
+                await ai_client.generate_feedback(html, JOB_TITLE)
+            )
+
+        async def parallel(_: int) -> None:
+            await ai_client.generate_sections(html, JOB_TITLE)
+
+        results.append(await measure("generate.single", single, n, warmup))
+        results.append(await measure("generate.parallel", parallel, n, warmup))
+
+    if "sectioned" in args.stages:
+        # The fixture resume split at every heading, however short, and its sections
+        # revised at once; against generate.single with --tokens-per-second.
+        sectioned = SectionedGenerator(min_resume_tokens=0, min_section_tokens=0)
+        sections = sectioned.split(html)
+
+        async def revise_sections(_: int) -> None:
+            await sectioned.generate(ai_client, sections, JOB_TITLE)
+
+        results.append(
+            await measure("sectioned.split", lambda _: sectioned.split(html), n, warmup)
+        )
+        results.append(await measure("sectioned.generate", revise_sections, n, warmup))
+
+    if "pdf" in args.stages:
+        pdf_path = os.path.join(workdir, "benchmark.pdf")
+        results.append(
+            await measure("pdf", lambda _: generate_pdf(html, pdf_path), n, warmup)
+        )
+
+    if "repository" in args.stages:
+        created: List[int] = []
+
+        async def create(_: int) -> None:
+            async with open_session() as session:
+                resume = await ResumeRepository(session).create(
+                    Resume(original_filename="resume.pdf", job_title=JOB_TITLE)
+                )
+                created.append(resume.id)
+
+        async def complete(index: int) -> None:
+            async with open_session() as session:
+                await ResumeRepository(session, settings.HTML_COMPRESSION_LEVEL).update(
+                    Resume(status="done", feedback_text=completion),
+                    created[index % len(created)],
+                    ResumeHtml(resume_html=html, revised_html=html),
+                )
+
+        results.append(await measure("repository.create", create, n, warmup))
+        results.append(await measure("repository.update", complete, n, warmup))
+
+    if "end_to_end" in args.stages:
+        paths = list(corpus.values())
+
+        async def upload(index: int) -> None:
+            async with open_session() as session:
+                resume_service = service(session)
+                path = paths[index % len(paths)]
+                resume = await resume_service.upload(
+                    IngestedFile.from_path(path), JOB_TITLE
+                )
+                await resume_service.get_pdf(resume.id)
+
+        results.append(
+            await measure("end_to_end", upload, n, warmup, concurrency=args.concurrency)
+        )
+
+    await ai_client.aclose()
+    await engine.dispose()
+    return results
+
+
+def print_results(results: List[StageResult]) -> None:
+    print(
+        f"{'stage':<24}{'n':>5}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+        f"{'ops/s':>10}{'peak MiB':>10}"
+    )
+    for result in results:
+        print(
+            f"{result.name:<24}{result.iterations:>5}"
+            f"{result.p50 * 1000:>10.1f}{result.p95 * 1000:>10.1f}"
+            f"{result.p99 * 1000:>10.1f}{result.throughput:>10.2f}"
+            f"{result.peak_rss / 2**20:>10.1f}"
+        )
+
+
+def main(argv: List[str]) -> int:
+    args = parse_args(argv)
+    stub = StubOpenAIServer(
+        args.latency,
+        args.jitter,
+        stub_completion(args.positions),
+        tokens_per_second=args.tokens_per_second,
+    )
+    stub.start()
+    try:
+        with tempfile.TemporaryDirectory(prefix="resume-benchmark-") as workdir:
+            configure(args, workdir, stub)
+            corpus = (
+                load_corpus(args.corpus)
+                if args.corpus
+                else build_corpus(os.path.join(workdir, "corpus"), args.positions)
+            )
+            results = asyncio.run(run_stages(args, corpus, workdir))
+    finally:
+        stub.stop()
+
+    print_results(results)
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "docling": package_version("docling"),
+            "weasyprint": package_version("weasyprint"),
+        },
+        "parameters": {
+            "iterations": args.iterations,
+            "warmup": args.warmup,
+            "concurrency": args.concurrency,
+            "positions": args.positions,
+            "latency": args.latency,
+            "tokens_per_second": args.tokens_per_second,
+            "corpus": args.corpus,
+        },
+        "stages": {result.name: result.to_dict() for result in results},
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(
+            baseline["stages"],
+            report["stages"],
+            args.threshold,
+            args.memory_threshold,
+            args.noise_floor,
+        )
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against {args.compare}:")
+            for regression in regressions:
+                print(
+                    f"  {regression.stage} {regression.metric}: "
+                    f"{regression.baseline:.4g} -> {regression.current:.4g} "
+                    f"({regression.change:+.0%})"
+                )
+            return 1
+        print(f"\nNo regression against {args.compare}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
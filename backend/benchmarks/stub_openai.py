@@ -0,0 +1,174 @@
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from app.ai.ai_client import SECTION_MARKER
+from benchmarks.corpus import resume_html
+
+FEEDBACK = (
+    "The resume is clear and well structured. Quantify the impact of each position, "
+    "move the skills closer to the top and cut the summary to two sentences."
+)
+
+
+def stub_completion(positions: int = 3) -> str:
+    """
+    The answer of the stub, in the format the feedback prompt asks for.
+    """
+    return f"1)\n{FEEDBACK}\n2)\n{resume_html(positions)}"
+
+
+def section_of(completion: str, prompt: str) -> str:
+    """
+    The part of the completion a prompt asks for: the focused prompts of the parallel
+    generation get their own section, the combined prompt the whole completion. A
+    section prompt gets the feedback and its section back unchanged.
+    """
+    if SECTION_MARKER in prompt:
+        section_html = prompt.split("[[", 1)[1].split("]]", 1)[0]
+        return f"{FEEDBACK}\n{SECTION_MARKER}\n{section_html}"
+    if "1)" not in completion or "2)" not in completion:
+        return completion
+    feedback, revised_html = completion.split("2)", 1)
+    if "Rewrite the resume below" in prompt:
+        return revised_html.strip()
+    if "Critique the resume below" in prompt:
+        return feedback.replace("1)", "", 1).strip()
+    return completion
+
+
+class StubOpenAIServer:
+    """
+    Local server answering the OpenAI chat completions API with a fixed completion
+    after a configurable delay, so the AI stage can be benchmarked without the network.
+    Streamed completions are supported.
+    @attribute latency: The mean delay before answering, in seconds.
+    @attribute jitter: The delay varies uniformly by up to this many seconds either way.
+    @attribute completion: The text of every completion.
+    @attribute tokens_per_second: When set, the delay also grows with the length of the
+    answer, as the generation of a real model does.
+    @attribute requests: The number of requests answered.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.5,
+        jitter: float = 0.0,
+        completion: Optional[str] = None,
+        port: int = 0,
+        tokens_per_second: Optional[float] = None,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.completion = completion or stub_completion()
+        self.tokens_per_second = tokens_per_second
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "StubOpenAIServer":
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="stub-openai", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _delay(self, text: str) -> float:
+        delay = self.latency + random.uniform(-self.jitter, self.jitter)
+        if self.tokens_per_second:
+            delay += len(text) / 4 / self.tokens_per_second
+        return max(0.0, delay)
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with stub._lock:
+                    stub.requests += 1
+                prompt = body["messages"][-1]["content"]
+                text = section_of(stub.completion, prompt)
+                time.sleep(stub._delay(text))
+                model = body.get("model", "stub")
+                if body.get("stream"):
+                    self._stream(model, text)
+                else:
+                    self._complete(model, text)
+
+            def _complete(self, model: str, text: str):
+                data = json.dumps(
+                    {
+                        "id": "chatcmpl-stub",
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": model,
+                        "choices": [
+                            {
+                                "index": 0,
+                                "message": {
+                                    "role": "assistant",
+                                    "content": text,
+                                },
+                                "finish_reason": "stop",
+                            }
+                        ],
+                        "usage": {
+                            "prompt_tokens": 0,
+                            "completion_tokens": 0,
+                            "total_tokens": 0,
+                        },
+                    }
+                ).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _stream(self, model: str, text: str):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for start in range(0, len(text), 16):
+                    chunk = {
+                        "id": "chatcmpl-stub",
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": model,
+                        "choices": [
+                            {
+                                "index": 0,
+                                "delta": {"content": text[start : start + 16]},
+                                "finish_reason": None,
+                            }
+                        ],
+                    }
+                    self._write_chunk(f"data: {json.dumps(chunk)}\n\n")
+                self._write_chunk("data: [DONE]\n\n")
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _write_chunk(self, event: str):
+                data = event.encode("utf-8")
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+
+        return Handler
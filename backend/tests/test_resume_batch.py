@@ -0,0 +1,67 @@
+import asyncio
+from typing import Dict, List, Optional
+from app.dependencies.extractors import build_extractor_registry
+from app.models.resume import Resume, ResumeHtml, ResumeStatus
+from app.services.resume import ResumeService
+from app.utils.file_utils import IngestedFile
+
+TERMINAL = {ResumeStatus.DONE.value, ResumeStatus.FAILED.value}
+
+
+class FakeRepository:
+    """
+    Keeps the status of each resume, failing to save the result of one of them.
+    """
+
+    def __init__(self, failing_id: int):
+        self.failing_id = failing_id
+        self.statuses: Dict[int, str] = {}
+
+    async def update_many(self, resume_in: Resume, resume_ids: List[int]) -> None:
+        for resume_id in resume_ids:
+            self.statuses[resume_id] = resume_in.status
+
+    async def update(
+        self, resume_in: Resume, resume_id: int, html: Optional[ResumeHtml] = None
+    ) -> Optional[Resume]:
+        if html is not None and resume_id == self.failing_id:
+            raise RuntimeError("database unavailable")
+        if "status" in resume_in.model_fields_set:
+            self.statuses[resume_id] = resume_in.status
+        return resume_in
+
+
+class FakeSession:
+    async def rollback(self) -> None:
+        pass
+
+
+class FakeAIClient:
+    model = "fake"
+
+    async def generate_feedback(self, resume_html: str, job_title: str) -> str:
+        await asyncio.sleep(0.01)
+        return "1)\nGood\n2)\n<html><body><p>Revised</p></body></html>"
+
+
+def test_batch_item_failing_to_save_fails_alone():
+    repository = FakeRepository(failing_id=2)
+    service = ResumeService(
+        repository,
+        FakeSession(),
+        FakeAIClient(),
+        artifacts=None,
+        extractors=build_extractor_registry(),
+        pdf_engine=object(),
+    )
+    data = b"<html><body><p>Jane Doe</p></body></html>"
+    file = IngestedFile("cv.html", "0" * 64, len(data), data=data)
+    targets = [(1, "Engineer"), (2, "Manager"), (3, "Designer"), (4, "Analyst")]
+
+    asyncio.run(service.process_batch(file, targets))
+
+    assert repository.statuses[2] == ResumeStatus.FAILED.value
+    assert all(repository.statuses[resume_id] in TERMINAL for resume_id, _ in targets)
+    assert [repository.statuses[resume_id] for resume_id in (1, 3, 4)] == [
+        ResumeStatus.DONE.value
+    ] * 3